@@ -22,6 +22,7 @@ from simulator.vehicle import *
 from simulator.charger import *
 from simulator.demand import *
 from simulator.simulator import *
+from simulator.vector import *
 
 from scheduler.policies import *
 
@@ -36,22 +37,42 @@ if __name__ == "__main__":
     parser.add_argument("-p", "--policy", help="EIGHTYTWENTY or DNN")
     parser.add_argument("-w", "--weights", help="Path to policy weights for DNN")
     parser.add_argument("--epochs", type=int, help="Number of epochs (training)")
+    parser.add_argument(
+        "--envs", type=int, default=1, help="Number of fleets to train on at once"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time each phase of the simulator steps and print a report",
+    )
     args = parser.parse_args()
 
     config = {}
     with open(args.config, "r") as fp:
         config = yaml.safe_load(fp.read())
+    if args.profile:
+        config['profile'] = True
 
     datalogger = DataLogger(args.output)
 
-    if args.action.lower() == 'TRAIN':
-        env = TaxiFleetSimulator(config)
-        env.reset()
+    if args.action.lower() == 'train':
+        if args.envs > 1:
+            env = VectorEnvAdapter(TaxiFleetVectorEnv(config, args.envs))
+        else:
+            env = TaxiFleetSimulator(config)
+            env.reset()
         model = PPO("MlpPolicy", env, verbose=1)
         model.learn(total_timesteps=args.epochs)
         torch.save(model.policy, "ppo_policy.pt")
+        if args.profile:
+            # Vector environments profile each of their fleets separately
+            profilers = env.get_attr('profiler') if args.envs > 1 else [env.profiler]
+            profiler = StepProfiler()
+            for other in profilers:
+                profiler.merge(other)
+            print(profiler.report())
 
-    elif args.action.lower() == 'EVAL':
+    elif args.action.lower() == 'eval':
         policy = None
         if args.policy.lower() == "eightytwenty":
             policy = EightyTwentyPolicy()
@@ -70,6 +91,8 @@ if __name__ == "__main__":
             observation, reward, done, _, info = environment.step(action)
 
         datalogger.close()
+        if args.profile:
+            print(environment.profiler.report())
 
     else:
         print('Must choose TRAIN or EVAL')
@@ -26,6 +26,8 @@ from simulator.simulator import *
 import stable_baselines3
 import torch
 
+from stable_baselines3.common.vec_env import VecEnv
+
 
 class SchedulePolicy:
     """Abstract Policy Class."""
@@ -49,7 +51,7 @@ class EightyTwentyPolicy(SchedulePolicy):
 
     def schedule(self, observation: numpy.array, info: Dict) -> numpy.array:
         action = numpy.zeros((50, 2))
-        for v in range(len(info["fleet"])):
+        for v in range(len(observation)):
             if observation[v, 1] < 0.2:
                 action[v, 0] = 72.1
                 action[v, 1] = 72.1
@@ -83,30 +85,20 @@ class DataLogger:
         self.csvfile.write(",")
         self.csvfile.write(",".join([f"status{i}" for i in range(50)]))
         self.csvfile.write("\n")
-        self.p_old = [72.1] * 50
-        self.retired = [0] * 50
+        self.p_old = numpy.full(50, 72.1)
+        self.retired = numpy.zeros(50, dtype=int)
 
     def write(self, info):
-        total_power = 0
-        p_curr = []
-        soh_curr = []
-        state = []
-        for v in range(50):
-            p_curr.append(info["fleet"][v]["battery"]["soc"] * 72.1)
-            total_power += max(0, p_curr[-1] - self.p_old[v])
-            if info["fleet"][v]["battery"]["actual_capacity"] / 72.1 <= 0.8:
-                self.retired[v] = 1
-            soh_curr.append(
-                info["fleet"][v]["battery"]["actual_capacity"]
-                / info["fleet"][v]["battery"]["initial_capacity"]
-            )
-            state.append(1 if info["fleet"][v]["status"] == "RECOVERY" else 0)
+        fleet = info["fleet_array"][:50]
+        p_curr = fleet["soc"] * 72.1
+        total_power = numpy.maximum(0, p_curr - self.p_old).sum()
+        self.retired[fleet["actual_capacity"] / 72.1 <= 0.8] = 1
+        soh_curr = fleet["actual_capacity"] / fleet["initial_capacity"]
+        state = (fleet["status"] == VehicleStatus.RECOVERY.value).astype(int)
         self.p_old = p_curr
 
-        profit = 0
-        for j in info["inprogress"]:
-            if self.retired[j["vehicle"]] < 1:
-                profit += j["fare"]
+        jobs = info["inprogress_array"]
+        profit = jobs["fare"][self.retired[jobs["vehicle"]] < 1].sum()
 
         entry = f"{profit},{total_power},"
         for i in range(50):
@@ -118,6 +110,65 @@ class DataLogger:
         self.csvfile.close()
 
 
+class VectorEnvAdapter(VecEnv):
+    """Expose a Gymnasium vector environment that resets its copies within
+    the step that ends their episode (e.g. TaxiFleetVectorEnv) as a
+    stable-baselines3 VecEnv."""
+
+    def __init__(self, env):
+        self.env = env
+        self.actions = None
+        super().__init__(
+            env.num_envs, env.single_observation_space, env.single_action_space
+        )
+
+    def _envs(self, indices):
+        if indices is None:
+            return self.env.envs
+        if isinstance(indices, int):
+            return [self.env.envs[indices]]
+        return [self.env.envs[i] for i in indices]
+
+    def reset(self):
+        observations, _ = self.env.reset()
+        return observations
+
+    def step_async(self, actions):
+        self.actions = actions
+
+    def step_wait(self):
+        observations, rewards, terminations, truncations, infos = self.env.step(
+            self.actions
+        )
+        dones = terminations | truncations
+        episode_infos = [{} for _ in range(self.num_envs)]
+        for i in numpy.flatnonzero(dones).tolist():
+            episode_infos[i]["terminal_observation"] = infos["final_obs"][i]
+            episode_infos[i]["TimeLimit.truncated"] = bool(
+                truncations[i] and not terminations[i]
+            )
+        return observations, rewards, dones, episode_infos
+
+    def close(self):
+        self.env.close()
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(env, attr_name) for env in self._envs(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        for env in self._envs(indices):
+            setattr(env, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return [
+            getattr(env, method_name)(*method_args, **method_kwargs)
+            for env in self._envs(indices)
+        ]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(self._envs(indices))
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Simulate vehicle fleet")
     parser.add_argument(
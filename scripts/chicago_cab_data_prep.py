@@ -8,10 +8,52 @@ import numpy
 import pandas
 
 
+from scripts.data_prep import CHUNK_SIZE, prepare
+
+
 DATE_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+COLUMNS = {
+    'Trip Start Timestamp': 'pickup_time',
+    'Trip End Timestamp': 'dropoff_time',
+    'Trip Miles': 'distance',
+    'Pickup Community Area': 'pickup_location',
+    'Dropoff Community Area': 'dropoff_location',
+    'Trip Total': 'fare',
+}
+READ_OPTIONS = {
+    'usecols': list(COLUMNS),
+    'dtype': {
+        'Trip Start Timestamp': str,
+        'Trip End Timestamp': str,
+        'Trip Miles': str,
+        'Pickup Community Area': numpy.float32,
+        'Dropoff Community Area': numpy.float32,
+        'Trip Total': str,
+    },
+}
 LOGGER = logging.getLogger(__name__)
 
 
+def clean(data):
+    """Clean a chunk of raw Chicago data."""
+    data = data.rename(columns=COLUMNS)
+
+    data = data.replace([numpy.inf, -numpy.inf], numpy.nan).dropna()
+
+    data['pickup_time'] = pandas.to_datetime(data['pickup_time'], format=DATE_FORMAT)
+    data['dropoff_time'] = pandas.to_datetime(data['dropoff_time'], format=DATE_FORMAT)
+    data['distance'] = (1.6 * data['distance'].str.replace(',', '').astype(float)).astype(numpy.float32)
+    data['pickup_location'] = data['pickup_location'].astype(numpy.int16)
+    data['dropoff_location'] = data['dropoff_location'].astype(numpy.int16)
+    data['fare'] = data['fare'].str.replace(',', '').str.replace('$', '').astype(numpy.float32)
+
+    return data[
+        (data['pickup_time'] < data['dropoff_time'])
+        & (data['distance'] > 0)
+        & (data['fare'] > 0)
+    ]
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser('Clean the Chicago city dataset.')
     parser.add_argument(
@@ -20,6 +62,32 @@ if __name__ == '__main__':
         nargs='+',
         help='List of csv files containing raw demand data.'
     )
+    parser.add_argument(
+        '--output',
+        '-o',
+        default='chicago_demand.csv',
+        help='Output consolidated csv file (or dataset directory for parquet).'
+    )
+    parser.add_argument(
+        '--format',
+        '-f',
+        choices=['csv', 'parquet'],
+        default='csv',
+        help='Write a csv file, or a Parquet dataset partitioned by year and month.'
+    )
+    parser.add_argument(
+        '--workers',
+        '-w',
+        type=int,
+        default=None,
+        help='Number of worker processes (default: number of cores).'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=CHUNK_SIZE,
+        help='Number of rows each worker cleans at a time.'
+    )
     parser.add_argument(
         '--verbosity',
         '-v',
@@ -30,71 +98,16 @@ if __name__ == '__main__':
     args = parser.parse_args()
     coloredlogs.install(level=args.verbosity.upper())
 
-    data = []
-    LOGGER.debug('Loading raw data...')
-    for file in args.raw_data:
-        LOGGER.debug(f'Loading file: {DATA}...')
-        data.append(pandas.read_csv(DATA))
-    data = pandas.concat(data)
-
-    LOGGER.debug('Dropping unneeded columns...')
-    data.drop(
-        columns=[
-            'Trip ID',
-            'Taxi ID',
-            'Trip Seconds',
-            'Pickup Census Tract',
-            'Dropoff Census Tract',
-            'Fare',
-            'Tips',
-            'Tolls',
-            'Extras',
-            'Payment Type',
-            'Company',
-            'Pickup Centroid Longitude',
-            'Pickup Centroid Latitude',
-            'Pickup Centroid Location',
-            'Dropoff Centroid Longitude',
-            'Dropoff Centroid Latitude',
-            'Dropoff Centroid  Location',
-        ],
-        inplace=True
-    )
-
-    LOGGER.debug('Dropping NAN and INF values...')
-    data.replace([numpy.inf, -numpy.inf], numpy.nan, inplace=True)
-    data.dropna(inplace=True)
-
-    LOGGER.debug('Standardizing column names...')
-    data.rename(
-        columns={
-            'Trip Start Timestamp': 'pickup_time',
-            'Trip End Timestamp': 'dropoff_time',
-            'Trip Miles': 'distance',
-            'Pickup Community Area': 'pickup_location',
-            'Dropoff Community Area': 'dropoff_location',
-            'Trip Total': 'fare',
-        },
-        inplace=True
+    LOGGER.debug('Cleaning raw data...')
+    rows = prepare(
+        args.raw_data,
+        args.output,
+        clean,
+        READ_OPTIONS,
+        list(COLUMNS.values()),
+        workers=args.workers,
+        chunksize=args.chunk_size,
+        format=args.format
     )
 
-    LOGGER.debug('Casting data to correct types...')
-    data['pickup_time'] = pandas.to_datetime(data['pickup_time'], format=DATE_FORMAT)
-    data['dropoff_time'] = pandas.to_datetime(data['dropoff_time'], format=DATE_FORMAT)
-    data['distance'] = 1.6 * data['distance'].astype(str).str.replace(',', '').astype(float)
-    data['pickup_location'] = data['pickup_location'].astype(int)
-    data['dropoff_location'] = data['dropoff_location'].astype(int)
-    data['fare'] = data['fare'].astype(str).str.replace(',', '').str.replace('$', '').astype(float)
-
-    LOGGER.debug('Dropping nonsensical data...')
-    data.drop(data[data['pickup_time'] >= data['dropoff_time']].index, inplace=True)
-    data.drop(data[data['distance'] <= 0].index, inplace=True)
-    data.drop(data[data['fare'] <= 0].index, inplace=True)
-
-    LOGGER.debug('Sorting demand by pickup time...')
-    data.sort_values(by='pickup_time', ascending=True, inplace=True)
-
-    LOGGER.debug('Writing to file...')
-    data.to_csv('chicago_demand.csv', index=False)
-
-    LOGGER.info('Successfully cleaned Chicago cab data.')
+    LOGGER.info(f'Successfully cleaned Chicago cab data ({rows} trips).')
@@ -0,0 +1,41 @@
+"""Convert a legacy pickled city map into the mmap city map format."""
+
+
+import argparse
+import logging
+import pickle
+
+
+import coloredlogs
+
+
+from simulator.region import city_map_arrays, write_city_map
+
+
+LOGGER = logging.getLogger(__name__)
+coloredlogs.install(level='DEBUG')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('Convert a pickled city map.')
+    parser.add_argument(
+        '--input',
+        '-i',
+        help='Pickled map produced by an older generate_city_map.'
+    )
+    parser.add_argument(
+        '--output',
+        '-o',
+        help='Output map directory'
+    )
+    args = parser.parse_args()
+
+    LOGGER.debug(f'Loading map: {args.input}')
+    with open(args.input, 'rb') as pklfile:
+        city = pickle.loads(pklfile.read())
+
+    LOGGER.debug(f'Writing map: {args.output}')
+    arrays = city_map_arrays(city)
+    write_city_map(args.output, arrays['zones'], arrays['distance'], arrays['time'])
+
+    LOGGER.info(f'Converted {len(arrays["zones"])} zones.')
@@ -0,0 +1,117 @@
+"""Convert a consolidated demand CSV into a columnar demand store."""
+
+
+import argparse
+import logging
+import os
+
+
+import coloredlogs
+import numpy
+import pandas
+
+
+from simulator.demand import DEMAND, DEMAND_COLUMNS
+from simulator.storage import allocate_arrays, write_manifest
+
+
+DATEFMT = '%Y-%m-%d %H:%M:%S'
+CHUNK_SIZE = 1000000
+LOGGER = logging.getLogger(__name__)
+coloredlogs.install(level='DEBUG')
+
+
+def count_rows(path):
+    """Count the data rows of a CSV file without parsing it."""
+    rows = 0
+    with open(path, 'rb') as csvfile:
+        for block in iter(lambda: csvfile.read(1 << 24), b''):
+            rows += block.count(b'\n')
+            last = block
+    if rows > 0 and not last.endswith(b'\n'):
+        rows += 1
+    return max(rows - 1, 0)
+
+
+def truncate(output, columns, length):
+    """Shrink the arrays <columns> of the store at <output> to their first
+    <length> elements, copying CHUNK_SIZE elements at a time.
+    """
+    truncated = {}
+    for name in list(columns):
+        path = os.path.join(output, f'{name}.npy')
+        array = columns.pop(name)
+        shrunk = numpy.lib.format.open_memmap(
+            path + '.tmp', mode='w+', dtype=array.dtype, shape=(length,)
+        )
+        for first in range(0, length, CHUNK_SIZE):
+            stop = min(first + CHUNK_SIZE, length)
+            shrunk[first:stop] = array[first:stop]
+        shrunk.flush()
+        del array, shrunk
+        os.replace(path + '.tmp', path)
+        truncated[name] = numpy.load(path, mmap_mode='r+')
+    return truncated
+
+
+def convert(dataset, output, chunksize=CHUNK_SIZE):
+    """Convert the consolidated CSV <dataset> into a demand store at
+    <output>, <chunksize> rows at a time.
+    """
+    length = count_rows(dataset)
+    columns = allocate_arrays(output, DEMAND_COLUMNS, length)
+    reader = pandas.read_csv(
+        dataset,
+        usecols=list(DEMAND_COLUMNS),
+        dtype={
+            'pickup_location': numpy.int32,
+            'dropoff_location': numpy.int32,
+            'distance': numpy.float32,
+            'fare': numpy.float32,
+        },
+        chunksize=chunksize,
+    )
+    start = 0
+    last = numpy.iinfo(numpy.int64).min
+    for chunk in reader:
+        stop = start + len(chunk)
+        if stop > length:
+            raise Exception(f'{dataset} has more rows than lines')
+        for name in ['pickup_time', 'dropoff_time']:
+            t = pandas.to_datetime(chunk[name], format=DATEFMT).to_numpy()
+            chunk[name] = t.astype('datetime64[s]').astype(numpy.int64)
+        for name in DEMAND_COLUMNS:
+            columns[name][start:stop] = chunk[name].to_numpy()
+        if len(chunk) > 0:
+            pickup_time = chunk['pickup_time']
+            if pickup_time.iloc[0] < last or not pickup_time.is_monotonic_increasing:
+                raise Exception(f'{dataset} is not sorted by pickup time')
+            last = pickup_time.iloc[-1]
+        start = stop
+        LOGGER.debug(f'Converted {stop} of {length} trips')
+    if start < length:
+        # Blank lines and newlines within quoted fields are counted as rows
+        LOGGER.debug(f'Truncating the store from {length} to {start} trips')
+        columns = truncate(output, columns, start)
+    for array in columns.values():
+        array.flush()
+    write_manifest(output, DEMAND, columns)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('Convert demand into a columnar store.')
+    parser.add_argument(
+        '--dataset',
+        '-d',
+        help='Consolidated CSV produced by the data prep scripts.'
+    )
+    parser.add_argument(
+        '--output',
+        '-o',
+        help='Output demand store directory'
+    )
+    args = parser.parse_args()
+
+    convert(args.dataset, args.output)
+
+    LOGGER.info(f'Converted {args.dataset}')
@@ -0,0 +1,227 @@
+"""Out-of-core pipeline shared by the data prep scripts.
+
+Raw files are cleaned in a process pool, one chunk at a time.  Each chunk is
+split by the month of its pickup times and every part is written, sorted, as
+a run file in a per-month partition.  The runs of each month are then merged
+with a k-way merge, and since months do not overlap the sorted months are
+concatenated into the final time-ordered CSV, or each month is written as a
+Parquet partition of a dataset partitioned by year and month.  Memory use is
+bounded by the chunk size and the number of worker processes.
+"""
+
+
+import concurrent.futures
+import heapq
+import logging
+import os
+import shutil
+import tempfile
+
+
+import numpy
+import pandas
+import pyarrow
+import pyarrow.parquet
+
+
+from simulator.demand import DEMAND_COLUMNS, DEMAND_SCHEMA, partition_path
+from simulator.region import WEEK
+
+
+OUTPUT_FORMAT = '%Y-%m-%d %H:%M:%S'
+KEY_LENGTH = 19  # Length of a pickup time in OUTPUT_FORMAT
+CHUNK_SIZE = 1000000
+EPOCH_WEEKDAY = 3  # 1970-01-01 was a Thursday
+TRIP_DTYPES = {
+    'pickup_location': numpy.int64,
+    'dropoff_location': numpy.int64,
+    'distance': numpy.float64,
+    'fare': numpy.float64,
+}
+LOGGER = logging.getLogger(__name__)
+
+
+def clean_file(index, path, clean, read_options, columns, workdir, chunksize=CHUNK_SIZE):
+    """Clean the raw file <path> and write it as sorted runs in per-month
+    partitions of <workdir>.
+
+    Args:
+        index: position of the file in the list of raw files, used to keep
+            the output order deterministic.
+        path: raw csv file.
+        clean: function cleaning a chunk of raw data, returning a data frame
+            with a datetime pickup_time column.
+        read_options: keyword arguments to pandas.read_csv.
+        columns: columns of the cleaned data to write, starting with
+            pickup_time.
+        workdir: directory to write runs to.
+        chunksize: number of rows cleaned at a time.
+
+    Returns:
+        list of (month, run file) tuples.
+    """
+    runs = []
+    reader = pandas.read_csv(path, chunksize=chunksize, **read_options)
+    for number, chunk in enumerate(reader):
+        chunk = clean(chunk)[columns]
+        pickup_time = chunk['pickup_time'].dt
+        for month, part in chunk.groupby(pickup_time.year * 100 + pickup_time.month):
+            month = f'{month // 100:04d}-{month % 100:02d}'
+            os.makedirs(os.path.join(workdir, month), exist_ok=True)
+            run = os.path.join(workdir, month, f'{index:06d}-{number:06d}.csv')
+            part.sort_values('pickup_time', kind='stable').to_csv(
+                run, index=False, header=False, date_format=OUTPUT_FORMAT
+            )
+            runs.append((month, run))
+        LOGGER.debug(f'Cleaned chunk {number} of {path}')
+    return runs
+
+
+def merge_runs(runs, output):
+    """K-way merge the sorted <runs> of one month into <output>.
+
+    Returns:
+        number of rows written.
+    """
+    rows = 0
+    files = [open(run, 'r') for run in runs]
+    try:
+        with open(output, 'w') as merged:
+            for line in heapq.merge(*files, key=lambda line: line[:KEY_LENGTH]):
+                merged.write(line)
+                rows += 1
+    finally:
+        for file in files:
+            file.close()
+    for run in runs:
+        os.remove(run)
+    return rows
+
+
+def write_partition(partition, columns, output, month, chunksize=CHUNK_SIZE):
+    """Write the merged csv <partition> of <month>, with <columns>, as a
+    Parquet partition of the dataset at <output> with compact types (see
+    DEMAND_COLUMNS).
+    """
+    year, month = (int(part) for part in month.split('-'))
+    directory = partition_path(output, year, month)
+    os.makedirs(directory, exist_ok=True)
+    reader = pandas.read_csv(
+        partition,
+        header=None,
+        names=columns,
+        usecols=list(DEMAND_COLUMNS),
+        dtype={
+            'pickup_location': numpy.int32,
+            'dropoff_location': numpy.int32,
+            'distance': numpy.float32,
+            'fare': numpy.float32,
+        },
+        chunksize=chunksize,
+    )
+    with pyarrow.parquet.ParquetWriter(os.path.join(directory, 'part-0.parquet'), DEMAND_SCHEMA) as writer:
+        for chunk in reader:
+            for name in ['pickup_time', 'dropoff_time']:
+                t = pandas.to_datetime(chunk[name], format=OUTPUT_FORMAT).to_numpy()
+                chunk[name] = t.astype('datetime64[s]').astype(numpy.int64)
+            writer.write_table(pyarrow.Table.from_pandas(
+                chunk[list(DEMAND_COLUMNS)], schema=DEMAND_SCHEMA, preserve_index=False
+            ))
+
+
+def read_trips(path, columns, chunksize=CHUNK_SIZE):
+    """Stream the trips of a consolidated csv file, <chunksize> rows at a
+    time.
+
+    Args:
+        path: consolidated csv file written by prepare.
+        columns: columns to read besides the pickup and dropoff times, typed
+            as in TRIP_DTYPES.
+        chunksize: number of rows parsed at a time.
+
+    Yields:
+        (start, duration, chunk) for each chunk, where start is the pickup
+        time of each trip in seconds since the epoch, duration its length in
+        seconds, and chunk a data frame with <columns>.
+    """
+    reader = pandas.read_csv(
+        path,
+        usecols=['pickup_time', 'dropoff_time'] + columns,
+        dtype={name: TRIP_DTYPES[name] for name in columns},
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        pu_time = pandas.to_datetime(chunk['pickup_time'], format=OUTPUT_FORMAT)
+        do_time = pandas.to_datetime(chunk['dropoff_time'], format=OUTPUT_FORMAT)
+        yield (
+            pu_time.to_numpy().astype('datetime64[s]').astype(numpy.int64),
+            (do_time - pu_time).dt.total_seconds().to_numpy(),
+            chunk[columns],
+        )
+
+
+def time_of_week_bucket(t, bucket):
+    """Index of the time of week bucket of length <bucket> (seconds) that
+    contains each epoch second in <t>, counting from Monday 00:00."""
+    return (t + EPOCH_WEEKDAY * 24 * 60 * 60) % WEEK // bucket
+
+
+def prepare(raw_files, output, clean, read_options, columns, workers=None, chunksize=CHUNK_SIZE, tmpdir=None, format='csv'):
+    """Clean <raw_files> into a single csv file sorted by pickup time, or a
+    Parquet dataset partitioned by year and month.
+
+    Args:
+        raw_files: list of raw csv files.
+        output: path of the consolidated csv file or Parquet dataset.
+        clean: function cleaning a chunk of raw data, see clean_file.  Must
+            be defined at module level so it can be sent to the workers.
+        read_options: keyword arguments to pandas.read_csv.
+        columns: column names of the cleaned data, starting with
+            pickup_time.
+        workers: number of worker processes (default: number of cores).
+        chunksize: number of rows cleaned at a time.
+        tmpdir: directory for the month partitions (default: next to
+            output).
+        format: output format, 'csv' or 'parquet'.
+
+    Returns:
+        number of rows written.
+    """
+    if format not in ['csv', 'parquet']:
+        raise Exception(f'Unknown output format: {format}')
+    if columns[0] != 'pickup_time':
+        raise Exception('Cleaned data must start with the pickup_time column')
+    if tmpdir is None:
+        tmpdir = os.path.dirname(os.path.abspath(output))
+    with tempfile.TemporaryDirectory(dir=tmpdir) as workdir:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            futures = [
+                pool.submit(clean_file, index, path, clean, read_options, columns, workdir, chunksize)
+                for index, path in enumerate(raw_files)
+            ]
+            months = {}
+            for future in futures:
+                for month, run in future.result():
+                    months.setdefault(month, []).append(run)
+            LOGGER.debug(f'Merging {len(months)} months...')
+            partitions = [os.path.join(workdir, f'{month}.csv') for month in sorted(months)]
+            rows = sum(pool.map(
+                merge_runs,
+                [sorted(months[month]) for month in sorted(months)],
+                partitions
+            ))
+            if format == 'parquet':
+                list(pool.map(
+                    write_partition,
+                    partitions,
+                    [columns] * len(months),
+                    [output] * len(months),
+                    sorted(months)
+                ))
+                return rows
+        with open(output, 'w') as consolidated:
+            consolidated.write(','.join(columns) + '\n')
+            for partition in partitions:
+                with open(partition, 'r') as month:
+                    shutil.copyfileobj(month, consolidated)
+    return rows
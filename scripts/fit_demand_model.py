@@ -0,0 +1,149 @@
+"""Fit a synthetic demand model to a consolidated demand dataset."""
+
+
+import argparse
+import logging
+
+
+import coloredlogs
+import numpy
+
+
+from scripts.data_prep import CHUNK_SIZE, read_trips, time_of_week_bucket
+from simulator.demand import DEMAND_MODEL
+from simulator.region import WEEK
+from simulator.storage import write_arrays
+
+
+LOGGER = logging.getLogger(__name__)
+coloredlogs.install(level='DEBUG')
+
+
+class DemandModelFitter:
+    """Accumulate the statistics of a synthetic demand model in constant
+    memory.
+
+    Args:
+        n_zones: number of zones in the city (zone ids are 0..n_zones - 1).
+        bucket: length (seconds) of the time of week buckets for arrival
+            rates.  Must divide one week.
+    """
+
+    def __init__(self, n_zones, bucket=3600):
+        if WEEK % bucket != 0:
+            raise Exception(f'Time bucket of {bucket}s does not divide one week')
+        self.n_zones = n_zones
+        self.bucket = bucket
+        self.arrivals = numpy.zeros((WEEK // bucket, n_zones))
+        self.count = numpy.zeros((n_zones, n_zones))
+        self.sum = {name: numpy.zeros((n_zones, n_zones)) for name in ['duration', 'distance', 'fare']}
+        self.log_sum = {name: numpy.zeros((n_zones, n_zones)) for name in self.sum}
+        self.log_sumsq = {name: numpy.zeros((n_zones, n_zones)) for name in self.sum}
+        self.t_min = None
+        self.t_max = None
+
+    def add(self, start, pickup, dropoff, trips):
+        """Fold a batch of trips into the statistics.
+
+        Args:
+            start: pickup time of each trip (seconds since the epoch)
+            pickup: pickup zone of each trip
+            dropoff: dropoff zone of each trip
+            trips: dictionary with duration (seconds), distance (km) and
+                fare ($) of each trip
+        """
+        if len(pickup) == 0:
+            return
+        if min(pickup.min(), dropoff.min()) < 0 or max(pickup.max(), dropoff.max()) >= self.n_zones:
+            raise Exception(f'Dataset has zones outside of [0, {self.n_zones})')
+        self.t_min = start.min() if self.t_min is None else min(self.t_min, start.min())
+        self.t_max = start.max() if self.t_max is None else max(self.t_max, start.max())
+        bucket = time_of_week_bucket(start, self.bucket)
+        numpy.add.at(self.arrivals, (bucket, pickup), 1)
+        pair = pickup * self.n_zones + dropoff
+        size = self.n_zones * self.n_zones
+        shape = (self.n_zones, self.n_zones)
+        self.count += numpy.bincount(pair, minlength=size).reshape(shape)
+        for name in self.sum:
+            value = numpy.maximum(trips[name], 1e-3)
+            self.sum[name] += numpy.bincount(pair, value, size).reshape(shape)
+            self.log_sum[name] += numpy.bincount(pair, numpy.log(value), size).reshape(shape)
+            self.log_sumsq[name] += numpy.bincount(pair, numpy.log(value) ** 2, size).reshape(shape)
+
+    def add_csv(self, path, chunksize=CHUNK_SIZE):
+        """Stream a consolidated demand CSV into the statistics.
+
+        Args:
+            path: consolidated CSV produced by the data prep scripts
+            chunksize: number of rows parsed at a time
+        """
+        columns = ['pickup_location', 'dropoff_location', 'distance', 'fare']
+        for start, duration, chunk in read_trips(path, columns, chunksize):
+            self.add(
+                start,
+                chunk['pickup_location'].to_numpy(),
+                chunk['dropoff_location'].to_numpy(),
+                {
+                    'duration': duration,
+                    'distance': chunk['distance'].to_numpy(),
+                    'fare': chunk['fare'].to_numpy(),
+                },
+            )
+            LOGGER.debug(f'Fitted {int(self.count.sum())} trips')
+
+    def exposure(self):
+        """Number of times each time of week bucket occurs in the dataset."""
+        first = self.t_min - self.t_min % self.bucket
+        starts = numpy.arange(first, self.t_max + 1, self.bucket)
+        bucket = time_of_week_bucket(starts, self.bucket)
+        return numpy.bincount(bucket, minlength=len(self.arrivals))
+
+    def model(self):
+        """Arrays of the fitted demand model, see SyntheticDemand."""
+        exposure = self.exposure()
+        count = numpy.maximum(self.count, 1)
+        model = {
+            'rate': self.arrivals / numpy.maximum(exposure, 1)[:, numpy.newaxis],
+            'destination': self.count,
+        }
+        sigma = []
+        for name in self.sum:
+            model[name] = self.sum[name] / count
+            within = self.log_sumsq[name] - self.log_sum[name] ** 2 / count
+            sigma.append(numpy.sqrt(max(within.sum(), 0.0) / max(self.count.sum(), 1)))
+        model['sigma'] = numpy.array(sigma)
+        return model
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('Fit a synthetic demand model.')
+    parser.add_argument(
+        '--dataset',
+        '-d',
+        help='Consolidated CSV produced by the data prep scripts.'
+    )
+    parser.add_argument(
+        '--n-zones',
+        '-n',
+        help='Number of zones in city',
+        type=int
+    )
+    parser.add_argument(
+        '--time-bucket',
+        '-t',
+        type=int,
+        default=3600,
+        help='Length (seconds) of time of week buckets for arrival rates.'
+    )
+    parser.add_argument(
+        '--output',
+        '-o',
+        help='Output demand model directory'
+    )
+    args = parser.parse_args()
+
+    fitter = DemandModelFitter(args.n_zones, args.time_bucket)
+    fitter.add_csv(args.dataset)
+    write_arrays(args.output, DEMAND_MODEL, fitter.model(), bucket=args.time_bucket)
+
+    LOGGER.info(f'Fitted demand model to {int(fitter.count.sum())} trips.')
@@ -2,11 +2,8 @@
 
 
 import argparse
-import csv
-import datetime
 import json
 import logging
-import pickle
 
 
 import coloredlogs
@@ -16,53 +13,241 @@ import numpy
 from scipy import stats
 
 
-DATEFMT = '%Y-%m-%d %H:%M:%S'
+from scripts.data_prep import CHUNK_SIZE, read_trips, time_of_week_bucket
+from simulator.region import CITY_MAP, WEEK, write_city_map
+from simulator.storage import read_arrays
+
+
 LOGGER = logging.getLogger(__name__)
 coloredlogs.install(level='DEBUG')
 
 
-def dijkstra(loc, dest, MAP):
-    dist = []
-    prev = []
-    Q = set()
-    for v in MAP:
-        dist.append(float('inf'))
-        prev.append(None)
-        Q.add(v)
-    dist[loc - 1] = 0
-
-    while len(Q) > 0:
-        u = list(Q)[0]
-        last_min = dist[u-1]
-        for q in Q:
-            if dist[q-1] < last_min:
-                last_min = dist[q-1]
-                u = q
-        Q.remove(u)
-
-        for v in Q:
-            if MAP[u][v]['distance'] is not None:
-                dv = MAP[u][v]['distance']
-                alt = dist[u-1] + dv
-                if alt < dist[v-1]:
-                    dist[v-1] = alt
-                    prev[v-1] = u
-
-    S = []
-    u = dest
-    t = 0
-    d = 0
-    if prev[u-1] is not None or u == loc:
-        while prev[u - 1] is not None:
-            t += MAP[prev[u-1]][u]['time']
-            d += MAP[prev[u-1]][u]['distance']
-            S.append(u)
-            u = prev[u-1]
-
-    if dist[u-1] == float('inf'):
-        return float('inf'), float('inf')
-
-    return t, d
+MIN_TRIPS = 2
+
+
+def all_pairs_shortest_paths(distance, time):
+    """Floyd-Warshall over the observed edge matrix, vectorized per pivot.
+
+    Routes are shortest by distance; the time of a route is the sum of the
+    edge times along it.
+
+    Args:
+        distance: (n, n) edge distances, inf where there is no edge.
+        time: (n, n) edge times, inf where there is no edge.
+
+    Returns:
+        (distance, time, next_hop) where next_hop[i, j] is the index of the
+        node following i on the route to j, or -1 if j is unreachable.
+    """
+    n = len(distance)
+    distance = distance.copy()
+    time = time.copy()
+    numpy.fill_diagonal(distance, 0.0)
+    numpy.fill_diagonal(time, 0.0)
+    next_hop = numpy.where(
+        numpy.isfinite(distance),
+        numpy.arange(n)[numpy.newaxis, :],
+        -1
+    )
+    for k in range(n):
+        via = distance[:, k, numpy.newaxis] + distance[numpy.newaxis, k, :]
+        shorter = via < distance
+        if not shorter.any():
+            continue
+        rows, cols = numpy.nonzero(shorter)
+        distance[rows, cols] = via[rows, cols]
+        time[rows, cols] = time[rows, k] + time[k, cols]
+        next_hop[rows, cols] = next_hop[rows, k]
+    return distance, time, next_hop
+
+
+def update_shortest_paths(routes, old_edges, new_edges):
+    """Update the output of all_pairs_shortest_paths after edges changed.
+
+    Edges that became shortcuts are relaxed one at a time, which costs
+    O(n^2) per edge.  Edges that were not on any route before or after the
+    change are ignored.  If a changed edge was on a route and did not get
+    shorter, or relaxing edge by edge would cost more than a full pass, the
+    routes are recomputed from scratch.
+
+    Args:
+        routes: (distance, time, next_hop) computed for <old_edges>
+        old_edges: (distance, time) edge matrices the routes were built from
+        new_edges: (distance, time) updated edge matrices
+
+    Returns:
+        (distance, time, next_hop) for <new_edges>.
+    """
+    distance, time, next_hop = (numpy.array(a) for a in routes)
+    old_distance, old_time = old_edges
+    new_distance, new_time = new_edges
+    changed = (old_distance != new_distance) | (old_time != new_time)
+    numpy.fill_diagonal(changed, False)
+    rows, cols = numpy.nonzero(changed)
+    shortcut = new_distance[rows, cols] < distance[rows, cols]
+    unused = (old_distance[rows, cols] > distance[rows, cols]) & ~shortcut
+    if not (shortcut | unused).all() or shortcut.sum() > len(distance):
+        LOGGER.debug('Changed edges affect existing routes, recomputing all')
+        return all_pairs_shortest_paths(new_distance, new_time)
+
+    LOGGER.debug(f'Relaxing {shortcut.sum()} shortcut edges')
+    for u, v in zip(rows[shortcut], cols[shortcut]):
+        if new_distance[u, v] >= distance[u, v]:
+            continue
+        via = distance[:, u, numpy.newaxis] + new_distance[u, v] + distance[numpy.newaxis, v, :]
+        r, c = numpy.nonzero(via < distance)
+        distance[r, c] = via[r, c]
+        time[r, c] = time[r, u] + new_time[u, v] + time[v, c]
+        next_hop[r, c] = numpy.where(r == u, v, next_hop[r, u])
+    return distance, time, next_hop
+
+
+class TripAggregator:
+    """Accumulate per zone pair trip statistics in constant memory.
+
+    Args:
+        n_zones: number of zones in the city (zone ids are 0..n_zones - 1).
+        stats: statistics from a previous aggregation, as returned by
+            to_arrays, to continue from.
+        bucket: length (seconds) of the time of week buckets used for
+            time of day dependent travel times.  Must divide one week.
+            Ignored if <stats> is given.
+    """
+
+    def __init__(self, n_zones, stats=None, bucket=3600):
+        self.n_zones = n_zones
+        if stats is not None:
+            bucket = WEEK // len(stats['trip_bucket_count'])
+        if WEEK % bucket != 0:
+            raise Exception(f'Time bucket of {bucket}s does not divide one week')
+        self.bucket = bucket
+        self.n_buckets = WEEK // bucket
+        self.bucket_count = numpy.zeros((self.n_buckets, n_zones, n_zones), dtype=numpy.int32)
+        self.bucket_time_sum = numpy.zeros((self.n_buckets, n_zones, n_zones))
+        self.count = numpy.zeros((n_zones, n_zones), dtype=numpy.int64)
+        self.distance_sum = numpy.zeros((n_zones, n_zones))
+        self.distance_sumsq = numpy.zeros((n_zones, n_zones))
+        self.time_sum = numpy.zeros((n_zones, n_zones))
+        self.time_sumsq = numpy.zeros((n_zones, n_zones))
+        if stats is not None:
+            self.count += stats['trip_count']
+            self.distance_sum += stats['trip_distance_sum']
+            self.distance_sumsq += stats['trip_distance_sumsq']
+            self.time_sum += stats['trip_time_sum']
+            self.time_sumsq += stats['trip_time_sumsq']
+            self.bucket_count += stats['trip_bucket_count']
+            self.bucket_time_sum += stats['trip_bucket_time_sum']
+
+    def to_arrays(self):
+        """Sufficient statistics to store with the map."""
+        return {
+            'trip_count': self.count,
+            'trip_distance_sum': self.distance_sum,
+            'trip_distance_sumsq': self.distance_sumsq,
+            'trip_time_sum': self.time_sum,
+            'trip_time_sumsq': self.time_sumsq,
+            'trip_bucket_count': self.bucket_count,
+            'trip_bucket_time_sum': self.bucket_time_sum,
+        }
+
+    def add(self, pickup, dropoff, distance, time, start):
+        """Fold a batch of trips into the statistics.
+
+        Args:
+            pickup: pickup zone of each trip
+            dropoff: dropoff zone of each trip
+            distance: distance of each trip (km)
+            time: duration of each trip (seconds)
+            start: pickup time of each trip (seconds since the epoch)
+        """
+        if len(pickup) == 0:
+            return
+        if min(pickup.min(), dropoff.min()) < 0 or max(pickup.max(), dropoff.max()) >= self.n_zones:
+            raise Exception(f'Dataset has zones outside of [0, {self.n_zones})')
+        pair = pickup * self.n_zones + dropoff
+        size = self.n_zones * self.n_zones
+        shape = (self.n_zones, self.n_zones)
+        self.count += numpy.bincount(pair, minlength=size).reshape(shape)
+        self.distance_sum += numpy.bincount(pair, distance, size).reshape(shape)
+        self.distance_sumsq += numpy.bincount(pair, distance * distance, size).reshape(shape)
+        self.time_sum += numpy.bincount(pair, time, size).reshape(shape)
+        self.time_sumsq += numpy.bincount(pair, time * time, size).reshape(shape)
+        bucket = time_of_week_bucket(start, self.bucket)
+        cell = bucket * size + pair
+        numpy.add.at(self.bucket_count.reshape(-1), cell, 1)
+        numpy.add.at(self.bucket_time_sum.reshape(-1), cell, time)
+
+    def add_csv(self, path, chunksize=CHUNK_SIZE):
+        """Stream a consolidated demand CSV into the statistics.
+
+        Args:
+            path: consolidated CSV produced by the data prep scripts
+            chunksize: number of rows parsed at a time
+        """
+        columns = ['pickup_location', 'dropoff_location', 'distance']
+        for start, duration, chunk in read_trips(path, columns, chunksize):
+            self.add(
+                chunk['pickup_location'].to_numpy(),
+                chunk['dropoff_location'].to_numpy(),
+                chunk['distance'].to_numpy(),
+                duration,
+                start,
+            )
+            LOGGER.debug(f'Aggregated {self.count.sum()} trips')
+
+    def mean(self, min_trips=MIN_TRIPS):
+        """Mean distance and time of each zone pair.
+
+        Returns:
+            (distance, time), inf for pairs with fewer than <min_trips> trips.
+        """
+        observed = self.count >= min_trips
+        count = numpy.maximum(self.count, 1)
+        return (
+            numpy.where(observed, self.distance_sum / count, numpy.inf),
+            numpy.where(observed, self.time_sum / count, numpy.inf),
+        )
+
+    def time_of_week(self, min_trips=MIN_TRIPS):
+        """Travel time of each zone pair in each time of week bucket, as a
+        factor of the all-day mean.  Buckets with fewer than <min_trips>
+        trips keep a factor of 1.
+
+        Identical buckets are stored once and factors are stored as float16,
+        which keeps the tensor small for large cities.
+
+        Returns:
+            (factor, bucket) where factor has shape (n_unique, n_zones,
+            n_zones) and bucket maps each time of week bucket to a slice of
+            factor.
+        """
+        _, time = self.mean(min_trips)
+        observed = (self.bucket_count >= min_trips) & numpy.isfinite(time)
+        factor = numpy.ones(self.bucket_count.shape, dtype=numpy.float16)
+        b, i, j = numpy.nonzero(observed)
+        factor[b, i, j] = self.bucket_time_sum[b, i, j] / self.bucket_count[b, i, j] / time[i, j]
+        factor, bucket = numpy.unique(
+            factor.reshape(self.n_buckets, -1), axis=0, return_inverse=True
+        )
+        return (
+            factor.reshape(-1, self.n_zones, self.n_zones),
+            bucket.reshape(-1).astype(numpy.int64),
+        )
+
+    def variance(self, min_trips=MIN_TRIPS):
+        """Population variance of distance and time of each zone pair.
+
+        Returns:
+            (distance, time), nan for pairs with fewer than <min_trips> trips.
+        """
+        observed = self.count >= min_trips
+        count = numpy.maximum(self.count, 1)
+        distance_var = self.distance_sumsq / count - (self.distance_sum / count) ** 2
+        time_var = self.time_sumsq / count - (self.time_sum / count) ** 2
+        return (
+            numpy.where(observed, numpy.maximum(distance_var, 0.0), numpy.nan),
+            numpy.where(observed, numpy.maximum(time_var, 0.0), numpy.nan),
+        )
 
 
 if __name__ == '__main__':
@@ -81,62 +266,74 @@ if __name__ == '__main__':
     parser.add_argument(
         '--map-name',
         '-m',
-        help='Output map name'
+        help='Output map directory'
+    )
+    parser.add_argument(
+        '--update',
+        '-u',
+        action='store_true',
+        help='Fold the dataset into the existing map instead of rebuilding it.'
+    )
+    parser.add_argument(
+        '--time-bucket',
+        '-t',
+        type=int,
+        default=3600,
+        help='Length (seconds) of time of week buckets for travel times.'
     )
     args = parser.parse_args()
     
-    city = {}
-    
-    for zone_from in range(args.n_zones):
-        city[zone_from] = {}
-        for zone_to in range(args.n_zones):
-            city[zone_from][zone_to] = {
-                'time': [],
-                'distance': []
-            }
-
-    with open(args.dataset, 'r') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            pu_loc = int(row['pickup_location'])
-            do_loc = int(row['dropoff_location'])
-            distance = float(row['distance'])
-            pu_time = datetime.datetime.strptime(row['pickup_time'], DATEFMT)
-            do_time = datetime.datetime.strptime(row['dropoff_time'], DATEFMT)
-            city[pu_loc][do_loc]['distance'].append(distance)
-            city[pu_loc][do_loc]['time'].append((do_time - pu_time).total_seconds())
-
-    for zone_from in city:
-        LOGGER.debug(f'Processing Zone: {zone_from}')
-        for zone_to in city:
-            if len(city[zone_from][zone_to]['time']) > 1:
-                city[zone_from][zone_to]['time'] = numpy.mean(city[zone_from][zone_to]['time']).item()
-                city[zone_from][zone_to]['distance'] = numpy.mean(city[zone_from][zone_to]['distance']).item()
-            else:
-                city[zone_from][zone_to]['time'] = None
-                city[zone_from][zone_to]['distance'] = None
-
-    for zone_from in city:
-        LOGGER.debug(f'Calculating Unknown Routes: {zone_from}')
-        for zone_to in city:
-            if city[zone_from][zone_to]['time'] is None:
-                t, d = dijkstra(zone_from, zone_to, city)
-                city[zone_from][zone_to]['time'] = float(t)
-                city[zone_from][zone_to]['distance'] = float(d)
-
-    LOGGER.debug(f'Removing invalid zones')
-    removal_list = []
-    for zone_from in city:
-        invalid = True
-        for zone_to in city:
-            if city[zone_from][zone_to]['distance'] != float('inf') and zone_from != zone_to:
-                invalid = False
-        if invalid:
-            removal_list.append(zone_from)
-    for zone in removal_list:
-        del city[zone]
-        for zone_from in city:
-            del city[zone_from][zone]
-
-    with open(args.map_name, 'wb') as pklfile:
-        pklfile.write(pickle.dumps(city))
+    previous = None
+    if args.update:
+        LOGGER.debug(f'Loading map: {args.map_name}')
+        previous, _ = read_arrays(args.map_name, CITY_MAP, mmap=False)
+        if 'trip_count' not in previous:
+            raise Exception(f'{args.map_name} has no trip statistics, rebuild it without --update')
+        trips = TripAggregator(len(previous['trip_count']), previous)
+        old_edges = trips.mean()
+    else:
+        trips = TripAggregator(args.n_zones, bucket=args.time_bucket)
+
+    LOGGER.debug(f'Aggregating trips: {args.dataset}')
+    trips.add_csv(args.dataset)
+
+    LOGGER.debug('Averaging observed routes')
+    distance, time = trips.mean()
+    distance_var, time_var = trips.variance()
+    time_factor, time_bucket = trips.time_of_week()
+    observed = numpy.isfinite(distance)
+
+    LOGGER.debug('Calculating unknown routes')
+    if previous is None:
+        routes = all_pairs_shortest_paths(distance, time)
+    else:
+        routes = update_shortest_paths(
+            (previous['route_distance'], previous['route_time'], previous['route_next_hop']),
+            old_edges,
+            (distance, time),
+        )
+    path_distance, path_time, next_hop = routes
+    distance = numpy.where(observed, distance, path_distance)
+    time = numpy.where(observed, time, path_time)
+
+    LOGGER.debug('Removing invalid zones')
+    off_diagonal = ~numpy.eye(trips.n_zones, dtype=bool)
+    zones = numpy.flatnonzero((numpy.isfinite(distance) & off_diagonal).any(axis=1))
+    keep = numpy.ix_(zones, zones)
+
+    LOGGER.debug(f'Writing map: {args.map_name}')
+    write_city_map(
+        args.map_name,
+        zones,
+        distance[keep],
+        time[keep],
+        next_hop=next_hop[keep],
+        distance_var=distance_var[keep],
+        time_var=time_var[keep],
+        time_factor=time_factor[:, zones[:, numpy.newaxis], zones],
+        time_bucket=time_bucket,
+        route_distance=path_distance,
+        route_time=path_time,
+        route_next_hop=next_hop,
+        **trips.to_arrays(),
+    )
@@ -8,10 +8,55 @@ import numpy
 import pandas
 
 
+from scripts.data_prep import CHUNK_SIZE, prepare
+
+
 DATE_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+COLUMNS = {
+    'tpep_pickup_datetime': 'pickup_time',
+    'tpep_dropoff_datetime': 'dropoff_time',
+    'passenger_count': 'passenger_count',
+    'trip_distance': 'distance',
+    'PULocationID': 'pickup_location',
+    'DOLocationID': 'dropoff_location',
+    'total_amount': 'fare',
+}
+READ_OPTIONS = {
+    'usecols': list(COLUMNS),
+    'dtype': {
+        'tpep_pickup_datetime': str,
+        'tpep_dropoff_datetime': str,
+        'passenger_count': numpy.float32,
+        'trip_distance': numpy.float32,
+        'PULocationID': numpy.float32,
+        'DOLocationID': numpy.float32,
+        'total_amount': numpy.float32,
+    },
+}
 LOGGER = logging.getLogger(__name__)
 
 
+def clean(data):
+    """Clean a chunk of raw NYC yellow cab data."""
+    data = data.rename(columns=COLUMNS)
+
+    data = data.replace([numpy.inf, -numpy.inf], numpy.nan).dropna()
+
+    data['pickup_time'] = pandas.to_datetime(data['pickup_time'], format=DATE_FORMAT)
+    data['dropoff_time'] = pandas.to_datetime(data['dropoff_time'], format=DATE_FORMAT)
+    data['passenger_count'] = data['passenger_count'].astype(numpy.int8)
+    data['distance'] = (1.6 * data['distance']).astype(numpy.float32)
+    data['pickup_location'] = data['pickup_location'].astype(numpy.int16)
+    data['dropoff_location'] = data['dropoff_location'].astype(numpy.int16)
+
+    return data[
+        (data['pickup_time'] < data['dropoff_time'])
+        & (data['passenger_count'] >= 1)
+        & (data['distance'] > 0)
+        & (data['fare'] > 0)
+    ]
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser('Clean the NYC Yellow Cab dataset.')
     parser.add_argument(
@@ -20,6 +65,32 @@ if __name__ == '__main__':
         nargs='+',
         help='List of csv files containing raw demand data.'
     )
+    parser.add_argument(
+        '--output',
+        '-o',
+        default='nyc_demand.csv',
+        help='Output consolidated csv file (or dataset directory for parquet).'
+    )
+    parser.add_argument(
+        '--format',
+        '-f',
+        choices=['csv', 'parquet'],
+        default='csv',
+        help='Write a csv file, or a Parquet dataset partitioned by year and month.'
+    )
+    parser.add_argument(
+        '--workers',
+        '-w',
+        type=int,
+        default=None,
+        help='Number of worker processes (default: number of cores).'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=CHUNK_SIZE,
+        help='Number of rows each worker cleans at a time.'
+    )
     parser.add_argument(
         '--verbosity',
         '-v',
@@ -30,69 +101,16 @@ if __name__ == '__main__':
     args = parser.parse_args()
     coloredlogs.install(level=args.verbosity.upper())
 
-    data = []
-    LOGGER.debug('Loading raw data...')
-    for file in args.raw_data:
-        LOGGER.debug(f'Loading file: {DATA}...')
-        data.append(pandas.read_csv(DATA))
-    data = pandas.concat(data)
-
-    LOGGER.debug('Dropping unneeded columns...')
-    data.drop(
-        columns=[
-            'VendorID',
-            'RatecodeID',
-            'store_and_fwd_flag',
-            'payment_type',
-            'fare_amount',
-            'extra',
-            'mta_tax',
-            'tip_amount',
-            'tolls_amount',
-            'improvement_surcharge',
-            'congestion_surcharge',
-        ],
-        inplace=True
-    )
-
-    LOGGER.debug('Dropping NAN and INF values...')
-    data.replace([numpy.inf, -numpy.inf], numpy.nan, inplace=True)
-    data.dropna(inplace=True)
-
-    LOGGER.debug('Standardizing column names...')
-    data.rename(
-        columns={
-            'tpep_pickup_datetime': 'pickup_time',
-            'tpep_dropoff_datetime': 'dropoff_time',
-            'passenger_count': 'passenger_count',
-            'trip_distance': 'distance',
-            'PULocationID': 'pickup_location',
-            'DOLocationID': 'dropoff_location',
-            'total_amount': 'fare',
-        },
-        inplace=True
+    LOGGER.debug('Cleaning raw data...')
+    rows = prepare(
+        args.raw_data,
+        args.output,
+        clean,
+        READ_OPTIONS,
+        list(COLUMNS.values()),
+        workers=args.workers,
+        chunksize=args.chunk_size,
+        format=args.format
     )
 
-    LOGGER.debug('Casting data to correct types...')
-    data['pickup_time'] = pandas.to_datetime(data['pickup_time'], format=DATE_FORMAT)
-    data['dropoff_time'] = pandas.to_datetime(data['dropoff_time'], format=DATE_FORMAT)
-    data['passenger_count'] = data['passenger_count'].astype(int)
-    data['distance'] = 1.6 * data['distance'].astype(float)
-    data['pickup_location'] = data['pickup_location'].astype(int)
-    data['dropoff_location'] = data['dropoff_location'].astype(int)
-    data['fare'] = data['fare'].astype(float)
-
-
-    LOGGER.debug('Dropping nonsensical data...')
-    data.drop(data[data['pickup_time'] >= data['dropoff_time']].index, inplace=True)
-    data.drop(data[data['passenger_count'] < 1].index, inplace=True)
-    data.drop(data[data['distance'] <= 0].index, inplace=True)
-    data.drop(data[data['fare'] <= 0].index, inplace=True)
-
-    LOGGER.debug('Sorting demand by pickup time...')
-    data.sort_values(by='pickup_time', ascending=True, inplace=True)
-
-    LOGGER.debug('Writing to file...')
-    data.to_csv('nyc_demand.csv', index=False)
-
-    LOGGER.info('Successfully cleaned NYC yellow cab data.')
+    LOGGER.info(f'Successfully cleaned NYC yellow cab data ({rows} trips).')
@@ -33,8 +33,10 @@ setup(
         'matplotlib',
         'numpy',
         'pandas',
+        'pyarrow',
         'PyYAML',
         'scikit-learn',
+        'scipy',
         'stable_baselines3',
         'torch',
     ]
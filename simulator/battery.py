@@ -1,11 +1,14 @@
 """Battery models."""
 
-from typing import Dict
+from typing import Dict, Tuple, Union
 
 
 import math
 
 
+import numpy
+
+
 class BatteryOverChargeException(Exception):
     """More power supplied than battery can handle.
 
@@ -105,9 +108,81 @@ class MultiStageBattery(Battery):
         2. No loss of SoC in storage
     """
 
+    # Wan et al. parameters for each stage of aging.  A stage applies while
+    # the state of health is above its threshold.
+    STAGES = [
+        {"threshold": 0.933, "alpha": 0.2172, "beta": 24.2535, "psi": -12.0051},
+        {"threshold": 0.866, "alpha": 0.2652, "beta": 9.9653, "psi": -29.0049},
+        {"threshold": -math.inf, "alpha": 0.2611, "beta": -15.1963, "psi": -22.5247},
+    ]
+
     def __init__(self, capacity: float) -> None:
         super().__init__(capacity)
 
+    @classmethod
+    def recalculate_capacity_batch(
+        cls,
+        soc: numpy.ndarray,
+        actual_capacity: numpy.ndarray,
+        initial_capacity: numpy.ndarray,
+        dW: numpy.ndarray,
+        dt: float,
+        T_a: Union[float, numpy.ndarray],
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Batch version of recalculate_capacity for an array of batteries.
+
+        Args:
+            soc - state of charge of each battery
+            actual_capacity - current capacity of each battery in kWh
+            initial_capacity - capacity of each battery when new in kWh
+            dW - energy in (+) or out (-) of each battery in kWh
+            dt - time (seconds)
+            T_a - ambient temperature in Celcius.
+
+        Returns:
+            (soc, actual_capacity) arrays after the update.
+        """
+        soc = numpy.asarray(soc, dtype=numpy.float64)
+        actual_capacity = numpy.asarray(actual_capacity, dtype=numpy.float64)
+        dW = numpy.broadcast_to(numpy.asarray(dW, dtype=numpy.float64), soc.shape)
+        health = actual_capacity / initial_capacity
+        stage = [health > s["threshold"] for s in cls.STAGES]
+        alpha = numpy.select(stage, [s["alpha"] for s in cls.STAGES])
+        beta = numpy.select(stage, [s["beta"] for s in cls.STAGES])
+        psi = numpy.select(stage, [s["psi"] for s in cls.STAGES])
+
+        with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            DoD_ref = 1.0
+            DoD_t = (soc * actual_capacity + dW) / actual_capacity
+            empty = DoD_t <= 0
+            full = ~empty & (DoD_t >= 1)
+            DoD_t = numpy.select([empty, full], [0.0, 1.0], DoD_t)
+            dW = numpy.select(
+                [empty, full], [actual_capacity, (1 - soc) * actual_capacity], dW
+            )
+            I_ref = 0.5 * initial_capacity
+            I_t = dW / (dt / 3600)
+            T_ref = 25
+
+            # In the case where the current drawn is so small, don't do anything
+            active = numpy.abs(I_t) > 1e-5
+
+            # The scalar model takes the absolute value of a (possibly complex)
+            # product, which equals the product of the absolute values.
+            theta_t = (
+                numpy.abs(DoD_t / DoD_ref) ** (1 / alpha)
+                * numpy.abs(I_t / I_ref) ** (1 / beta)
+                * numpy.exp(-psi * (1 / T_a - 1 / T_ref))
+            )
+            N_cref = 513  # Wan et al. 2024 (Good for single and multistage)
+            Q_loss = theta_t / N_cref
+
+        soc = numpy.where(active, DoD_t, soc)
+        actual_capacity = numpy.where(
+            active, numpy.maximum(actual_capacity - Q_loss, 0), actual_capacity
+        )
+        return soc, actual_capacity
+
     def recalculate_capacity(self, dW, dt, T_a) -> None:
         """Under Wan et al. cyclic aging due to charging and discharging is
         equivalent.  This method recalculates SoH and SoC for any inflow /
@@ -121,21 +196,9 @@ class MultiStageBattery(Battery):
         Raises:
             BatteryOverChargeException, BatteryEmptyException
         """
-        if self.actual_capacity / self.initial_capacity > 0.933:
-            alpha = 0.2172
-            beta = 24.2535
-            psi = -12.0051
-            zeta = 0.3952
-        elif self.actual_capacity / self.initial_capacity > 0.866:
-            alpha = 0.2652
-            beta = 9.9653
-            psi = -29.0049
-            zeta = 0.4470
-        else:
-            alpha = 0.2611
-            beta = -15.1963
-            psi = -22.5247
-            zeta = 0.5066
+        health = self.actual_capacity / self.initial_capacity
+        stage = next(s for s in self.STAGES if health > s["threshold"])
+        alpha, beta, psi = stage["alpha"], stage["beta"], stage["psi"]
 
         DoD_ref = 1.0
         DoD_t = (self.soc * self.actual_capacity + dW) / self.actual_capacity
@@ -1,6 +1,9 @@
 """Models for charging infrastructure."""
 
-from typing import Dict, List, Union
+from typing import Dict, ForwardRef, Iterator, List, Union
+
+
+import numpy
 
 
 from simulator.region import *
@@ -78,6 +81,22 @@ class ChargeStation:
             "vehicle_queue": [vid for vid in self.vehicle_queue],
         }
 
+    def occupancy(self) -> float:
+        """
+        Return the number of connected and queued vehicles per port.
+        """
+        connected = sum(port.vehicle is not None for port in self.ports)
+        return (connected + len(self.vehicle_queue)) / max(len(self.ports), 1)
+
+    def active(self, fleet: ForwardRef("Fleet")) -> bool:
+        """
+        Return whether any queued or connected vehicle can still take charge.
+        """
+        return len(self.vehicle_queue) > 0 or any(
+            port.vehicle is not None and fleet.soc[port.vehicle] < 1
+            for port in self.ports
+        )
+
     def request_charge(self, preferred_rate: float, vehicle: int) -> None:
         """
         A <vehicle> requests a maximum charge rate <preferred rate> in kW.
@@ -101,12 +120,12 @@ class ChargeStation:
         if vehicle in self.vehicle_queue:
             del self.vehicle_queue[vehicle]
 
-    def tick(self, fleet: List, dt: float, T_a: float) -> None:
+    def tick(self, fleet: ForwardRef("Fleet"), dt: float, T_a: float) -> None:
         """
         Update the state of all vehicles currently charging.
 
         Args:
-            fleet: global list of vehicles.
+            fleet: global fleet.
             dt: the tick length across which to recalculate state.
             T_a: the ambient temperature of the charging station on the tick
                 interval.
@@ -125,6 +144,106 @@ class ChargeStation:
                 else:
                     port.P_t = max(0.0, self.P_max - power_requested)
                     power_requested += port.P_t
-        for port in self.ports:
-            if port.vehicle is not None:
-                fleet[port.vehicle].battery.charge(port.P_t, dt, T_a)
+        connected = [port for port in self.ports if port.vehicle is not None]
+        fleet.charge(
+            numpy.array([port.vehicle for port in connected], dtype=numpy.int64),
+            numpy.array([port.P_t for port in connected], dtype=numpy.float64),
+            dt,
+            T_a,
+        )
+
+
+class ChargingNetwork:
+    """Charging network - all charging stations in a region.
+
+    When the network is created, the stations are ranked by distance from
+    every zone of the region, so that choosing a charger does not need to
+    visit every station.
+
+    Args:
+        region: global region map.
+        stations: charging stations that comprise the network.
+    """
+
+    def __init__(self, region: CyclicZoneGraph, stations: List[ChargeStation]) -> None:
+        self.region = region
+        self.stations = stations
+        distances, _ = region.distance_submatrix(
+            region.zones, [station.location.zone for station in stations]
+        )
+        self.ranking = numpy.argsort(distances, axis=1, kind="stable")
+        self.ranked = {
+            zone: [stations[i] for i in row]
+            for zone, row in zip(region.zones.tolist(), self.ranking.tolist())
+        }
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def __getitem__(self, idx: int) -> ChargeStation:
+        return self.stations[idx]
+
+    def __iter__(self) -> Iterator[ChargeStation]:
+        return iter(self.stations)
+
+    def snapshot(self) -> Dict[str, numpy.ndarray]:
+        """
+        Return the state of all ports and queues as arrays, see restore().
+        Ports are numbered in the order of the stations.
+        """
+        ports = [port for station in self.stations for port in station.ports]
+        queued = [
+            (i, vehicle, rate)
+            for i, station in enumerate(self.stations)
+            for vehicle, rate in station.vehicle_queue.items()
+        ]
+        return {
+            "port_vehicle": numpy.array(
+                [-1 if port.vehicle is None else port.vehicle for port in ports],
+                dtype=numpy.int64,
+            ),
+            "port_power": numpy.array([port.P_t for port in ports], dtype=numpy.float64),
+            "queue_station": numpy.array([i for i, _, _ in queued], dtype=numpy.int64),
+            "queue_vehicle": numpy.array([v for _, v, _ in queued], dtype=numpy.int64),
+            "queue_rate": numpy.array([r for _, _, r in queued], dtype=numpy.float64),
+        }
+
+    def restore(self, arrays: Dict[str, numpy.ndarray]) -> None:
+        """
+        Restore the state of all ports and queues from <arrays>, as returned
+        by snapshot() of a network with the same stations.
+        """
+        ports = [port for station in self.stations for port in station.ports]
+        for port, vehicle, power in zip(
+            ports, arrays["port_vehicle"].tolist(), arrays["port_power"].tolist()
+        ):
+            port.vehicle = None if vehicle < 0 else vehicle
+            port.P_t = power
+        for station in self.stations:
+            station.vehicle_queue = {}
+        for i, vehicle, rate in zip(
+            arrays["queue_station"].tolist(),
+            arrays["queue_vehicle"].tolist(),
+            arrays["queue_rate"].tolist(),
+        ):
+            self.stations[i].vehicle_queue[vehicle] = rate
+
+    def closest(self, zone: int, max_occupancy: float = None) -> ChargeStation:
+        """
+        Get the closest charging station to <zone>.
+
+        Args:
+            zone: zone id.
+            max_occupancy: skip stations with more connected and queued
+                vehicles per port than this (None means no limit).  If
+                every station is over the limit the closest one is chosen.
+
+        Returns:
+            the chosen charging station.
+        """
+        ranked = self.ranked[zone]
+        if max_occupancy is not None:
+            for station in ranked:
+                if station.occupancy() <= max_occupancy:
+                    return station
+        return ranked[0]
@@ -1,13 +1,37 @@
 """Demand models."""
 
-from typing import Dict, Set
+from typing import Dict, List, Tuple
 
 
 import csv
 import datetime
+import os
+import queue
+import threading
+
+
+import numpy
+import pyarrow
+import pyarrow.parquet
 
 
 from simulator.job import *
+from simulator.storage import *
+
+DEMAND = "demand"
+DEMAND_MODEL = "demand model"
+EPOCH = datetime.datetime(1970, 1, 1)
+DEMAND_COLUMNS = {
+    "pickup_time": numpy.int64,
+    "dropoff_time": numpy.int64,
+    "pickup_location": numpy.int32,
+    "dropoff_location": numpy.int32,
+    "distance": numpy.float32,
+    "fare": numpy.float32,
+}
+DEMAND_SCHEMA = pyarrow.schema(
+    [(name, pyarrow.from_numpy_dtype(dtype)) for name, dtype in DEMAND_COLUMNS.items()]
+)
 
 
 class Demand:
@@ -22,7 +46,7 @@ class Demand:
         """Set demand to time t."""
         raise NotImplemented
 
-    def tick(self, dt: datetime.timedelta, conditions: Dict) -> Set:
+    def tick(self, dt: datetime.timedelta, conditions: Dict) -> Dict:
         """Get new jobs released on interval [t, t + dt).
 
         Args:
@@ -30,14 +54,37 @@ class Demand:
             conditions: dictionary of environmental conditions
 
         Returns:
-            Dictionary with keys (job ID) and values Job objects.
+            Dictionary with an array for each of JOB_COLUMNS, one element
+            per job.
         """
         raise NotImplemented
 
+    def snapshot(self) -> Dict:
+        """Return the position of the demand model (and the state of its
+        random number generator, if it has one) as a JSON serializable
+        dictionary, see restore()."""
+        raise NotImplemented
+
+    def restore(self, state: Dict) -> None:
+        """Return to a position recorded by snapshot()."""
+        raise NotImplemented
+
+    def close(self) -> None:
+        """Release any resources held by the demand model."""
+        pass
+
 
 class ReplayDemand(Demand):
     """ReplayDemand is generated by replaying past data from a real dataset.
 
+    Seeking uses a sidecar index, mapping the start of each hour to the byte
+    offset of its first row, so that seek() and looping jump directly to the
+    right place in the file.  The index is built on first use and cached
+    next to the CSV file as <path>.idx.npz.  The position in the file is
+    recorded as the indexed hour of the last row read and the number of
+    rows read since the start of that hour, so restoring a snapshot
+    re-reads at most an hour of rows however long the episode.
+
     Args:
         path: path to CSV file containing past demand.
         loop: loop the demand if episode reaches its end.
@@ -47,28 +94,54 @@ class ReplayDemand(Demand):
         super().__init__()
         self.datefmt = "%Y-%m-%d %H:%M:%S"
         self.path = path
+        self.index_hours, self.index_offsets = load_csv_index(path)
         self.csvfile = open(path, "r")
         self.reader = csv.DictReader(self.csvfile)
         self.last = next(self.reader)
+        self._anchor(0)
+        self.rows = 1
         self.t_min = datetime.datetime.strptime(self.last["pickup_time"], self.datefmt)
         self.t = self.t_min
-        self.global_idx = 0
         self.region = region
         self.loop = loop
 
+    def _anchor(self, hour: int) -> None:
+        self.hour = hour
+        self.rows = 0
+        if hour + 1 < len(self.index_hours):
+            self.next_hour = to_datetime(self.index_hours[hour + 1])
+        else:
+            self.next_hour = datetime.datetime.max
+
+    def _jump(self, hour: int) -> None:
+        self.csvfile.seek(int(self.index_offsets[hour]))
+        self.reader = csv.DictReader(self.csvfile, fieldnames=self.reader.fieldnames)
+        self._anchor(hour)
+
+    def _next(self) -> None:
+        self.last = next(self.reader)
+        self.rows += 1
+        self.t = datetime.datetime.strptime(self.last["pickup_time"], self.datefmt)
+        if self.t >= self.next_hour:
+            # First row of the next indexed hour
+            self._anchor(self.hour + 1)
+            self.rows = 1
+
     def seek(self, t: datetime.datetime) -> None:
         """Set demand to time t."""
-        if self.t > t:
-            self.csvfile.seek(0)
-            next(self.reader)
+        if self.t == t:
+            return
+        if t <= self.t_min:
+            self._jump(0)
             self.t = self.t_min
-            self.seek(t)
             return
+        hour = numpy.searchsorted(self.index_hours, to_epoch(t), side="left") - 1
+        self._jump(int(hour))
+        self.t = to_datetime(self.index_hours[hour])
         while self.t < t:
-            self.last = next(self.reader)
-            self.t = datetime.datetime.strptime(self.last["pickup_time"], self.datefmt)
+            self._next()
 
-    def tick(self, dt: datetime.timedelta, conditions: Dict = None) -> Set:
+    def tick(self, dt: datetime.timedelta, conditions: Dict = None) -> Dict:
         """Get new jobs released on interval [t, t + dt).
 
         Args:
@@ -76,22 +149,611 @@ class ReplayDemand(Demand):
             conditions: dictionary of environmental conditions
 
         Returns:
-            Dictionary with keys (job ID) and values Job objects.
+            Dictionary with an array for each of JOB_COLUMNS, one element
+            per job.
         """
-        jobs = set({})
+        jobs = {name: [] for name in JOB_COLUMNS}
         end = self.t + datetime.timedelta(seconds=dt)
         try:
             while self.t < end:
-                self.last = next(self.reader)
-                jobs.add(Job(self.last, job_id=self.global_idx, region=self.region))
-                self.global_idx += 1
-                self.t = datetime.datetime.strptime(
-                    self.last["pickup_time"], self.datefmt
+                self._next()
+                dropoff_time = datetime.datetime.strptime(
+                    self.last["dropoff_time"], self.datefmt
                 )
-            return jobs
+                jobs["pickup_location"].append(int(self.last["pickup_location"]))
+                jobs["dropoff_location"].append(int(self.last["dropoff_location"]))
+                jobs["duration"].append((dropoff_time - self.t).total_seconds())
+                jobs["distance"].append(float(self.last["distance"]))
+                jobs["fare"].append(float(self.last["fare"]))
+            return {name: numpy.array(column) for name, column in jobs.items()}
         except StopIteration:
             if self.loop:
                 self.seek(self.t_min)
                 return self.tick(dt, conditions)
             else:
                 raise StopIteration
+
+    def snapshot(self) -> Dict:
+        """Return the position in the CSV file, see restore()."""
+        return {"t": self.t.isoformat(), "hour": self.hour, "rows": self.rows}
+
+    def restore(self, state: Dict) -> None:
+        """Return to a position recorded by snapshot()."""
+        self._jump(state["hour"])
+        for _ in range(state["rows"]):
+            self.last = next(self.reader)
+        self.rows = state["rows"]
+        self.t = datetime.datetime.fromisoformat(state["t"])
+
+    def close(self) -> None:
+        """Close the CSV file."""
+        self.csvfile.close()
+
+
+class ColumnarDemand(Demand):
+    """ColumnarDemand replays past demand from a columnar demand store, as
+    written by write_demand_store.  Timestamps are stored as epoch seconds,
+    so seek() is a binary search and tick() takes a slice of each column.
+
+    Args:
+        path: path to a demand store directory (opened with mmap).
+        region: global region map.
+        loop: loop the demand if episode reaches its end.
+    """
+
+    def __init__(
+        self, path: str, region, loop: bool = True, columns: Dict = None
+    ) -> None:
+        super().__init__()
+        self.path = path
+        if columns is None:
+            columns, _ = read_arrays(path, DEMAND)
+        self.columns = columns
+        self.pickup_time = self.columns["pickup_time"]
+        self.t_min = to_datetime(self.pickup_time[0])
+        self.t = self.t_min
+        self.cursor = 0
+        self.region = region
+        self.loop = loop
+
+    def seek(self, t: datetime.datetime) -> None:
+        """Set demand to time t."""
+        self.cursor = int(
+            numpy.searchsorted(self.pickup_time, to_epoch(t), side="left")
+        )
+        self.t = t
+
+    def tick(self, dt: datetime.timedelta, conditions: Dict = None) -> Dict:
+        """Get new jobs released on interval [t, t + dt).
+
+        Args:
+            dt: interval time delta
+            conditions: dictionary of environmental conditions
+
+        Returns:
+            Dictionary with an array for each of JOB_COLUMNS, one element
+            per job.
+        """
+        if self.cursor >= len(self.pickup_time):
+            if not self.loop:
+                raise StopIteration
+            self.seek(self.t_min)
+        end = self.t + datetime.timedelta(seconds=dt)
+        stop = int(numpy.searchsorted(self.pickup_time, to_epoch(end), side="left"))
+        rows = slice(self.cursor, stop)
+        jobs = {
+            "pickup_location": self.columns["pickup_location"][rows].astype(
+                numpy.int64
+            ),
+            "dropoff_location": self.columns["dropoff_location"][rows].astype(
+                numpy.int64
+            ),
+            "duration": (
+                self.columns["dropoff_time"][rows] - self.columns["pickup_time"][rows]
+            ).astype(numpy.float64),
+            "distance": self.columns["distance"][rows].astype(numpy.float64),
+            "fare": self.columns["fare"][rows].astype(numpy.float64),
+        }
+        self.cursor = stop
+        self.t = end
+        return jobs
+
+    def snapshot(self) -> Dict:
+        """Return the position in the columns, see restore()."""
+        return {"t": self.t.isoformat(), "cursor": self.cursor}
+
+    def restore(self, state: Dict) -> None:
+        """Return to a position recorded by snapshot()."""
+        self.t = datetime.datetime.fromisoformat(state["t"])
+        self.cursor = state["cursor"]
+
+
+class PartitionedDemand(ColumnarDemand):
+    """PartitionedDemand replays past demand from a Parquet dataset
+    partitioned by year and month (see scripts/data_prep.py).  Only the
+    partitions covering [start, end] are read, and the episode loops over
+    those partitions.
+
+    Args:
+        path: path to the partitioned dataset.
+        region: global region map.
+        loop: loop the demand if episode reaches its end.
+        start: start of the simulation (default: start of the dataset).
+        end: end of the simulation (default: end of the dataset).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        region,
+        loop: bool = True,
+        start: datetime.datetime = None,
+        end: datetime.datetime = None,
+    ) -> None:
+        partitions = demand_partitions(path, start, end)
+        if len(partitions) == 0:
+            raise Exception(f"No demand partitions in {path} between {start} and {end}")
+        table = pyarrow.concat_tables(
+            [
+                pyarrow.parquet.read_table(partition, columns=list(DEMAND_COLUMNS))
+                for partition in partitions
+            ]
+        )
+        columns = {
+            name: table.column(name).to_numpy().astype(dtype, copy=False)
+            for name, dtype in DEMAND_COLUMNS.items()
+        }
+        super().__init__(path, region, loop, columns)
+
+
+class SyntheticDemand(Demand):
+    """SyntheticDemand samples demand from a model fitted to a real dataset
+    (see scripts/fit_demand_model.py).
+
+    Arrivals in each zone are Poisson distributed with a rate that depends on
+    the time of week.  Destinations are drawn from the observed
+    origin-destination distribution, and duration, distance and fare are
+    drawn from a log-normal distribution around the mean of the
+    origin-destination pair.  All arrivals of a tick are sampled at once.
+
+    Args:
+        path: path to a demand model directory.
+        region: global region map.  Zones outside the region are never
+            sampled.
+        seed: seed for the random number generator.
+        scale: factor applied to all arrival rates.
+    """
+
+    def __init__(self, path: str, region, seed: int = 0, scale: float = 1.0) -> None:
+        super().__init__()
+        self.path = path
+        self.region = region
+        self.scale = scale
+        self.rng = numpy.random.default_rng(seed)
+        model, meta = read_arrays(path, DEMAND_MODEL, mmap=False)
+        self.bucket_length = meta["bucket"]
+        self.rate = model["rate"]
+        destination = model["destination"].astype(numpy.float64)
+        if region is not None:
+            zones = numpy.zeros(len(self.rate[0]), dtype=bool)
+            zones[region.zones[region.zones < len(zones)]] = True
+            self.rate = self.rate * zones
+            destination = destination * zones
+        total = destination.sum(axis=1, keepdims=True)
+        destination = numpy.divide(
+            destination, total, out=numpy.zeros_like(destination), where=total > 0
+        )
+        self.rate = self.rate * (total.T > 0)
+        self.n_zones = len(destination)
+        # Row i of the CDF is offset by i, so that a single searchsorted call
+        # on the flattened CDF samples destinations for many origins at once.
+        cdf = numpy.cumsum(destination, axis=1)
+        cdf[:, -1] = numpy.where(total[:, 0] > 0, 1.0, 0.0)
+        self.cdf = (cdf + numpy.arange(self.n_zones)[:, numpy.newaxis]).reshape(-1)
+        self.duration = model["duration"]
+        self.distance = model["distance"]
+        self.fare = model["fare"]
+        self.sigma = model["sigma"]
+
+    def seek(self, t: datetime.datetime) -> None:
+        """Set demand to time t."""
+        self.t = t
+
+    def expected(self, dt: float) -> numpy.ndarray:
+        """Expected number of arrivals per zone on interval [t, t + dt)."""
+        expected = numpy.zeros(self.n_zones)
+        start = time_of_week(self.t)
+        elapsed = 0.0
+        while elapsed < dt:
+            bucket = int((start + elapsed) // self.bucket_length) % len(self.rate)
+            overlap = min(
+                dt - elapsed,
+                self.bucket_length - (start + elapsed) % self.bucket_length,
+            )
+            expected += self.rate[bucket] * overlap / self.bucket_length
+            elapsed += overlap
+        return expected * self.scale
+
+    def _sample(self, mean: numpy.ndarray, sigma: float) -> numpy.ndarray:
+        noise = self.rng.normal(-0.5 * sigma * sigma, sigma, len(mean))
+        return mean * numpy.exp(noise)
+
+    def tick(self, dt: datetime.timedelta, conditions: Dict = None) -> Dict:
+        """Get new jobs released on interval [t, t + dt).
+
+        Args:
+            dt: interval time delta
+            conditions: dictionary of environmental conditions
+
+        Returns:
+            Dictionary with an array for each of JOB_COLUMNS, one element
+            per job.
+        """
+        counts = self.rng.poisson(self.expected(dt))
+        origin = numpy.repeat(numpy.arange(self.n_zones), counts)
+        u = origin + self.rng.random(len(origin))
+        destination = (
+            numpy.searchsorted(self.cdf, u, side="right") - origin * self.n_zones
+        )
+        destination = numpy.minimum(destination, self.n_zones - 1)
+        self.t = self.t + datetime.timedelta(seconds=dt)
+        return {
+            "pickup_location": origin,
+            "dropoff_location": destination,
+            "duration": self._sample(self.duration[origin, destination], self.sigma[0]),
+            "distance": self._sample(self.distance[origin, destination], self.sigma[1]),
+            "fare": self._sample(self.fare[origin, destination], self.sigma[2]),
+        }
+
+    def snapshot(self) -> Dict:
+        """Return the time and random number generator state, see
+        restore()."""
+        return {
+            "t": None if self.t is None else self.t.isoformat(),
+            "rng": self.rng.bit_generator.state,
+        }
+
+    def restore(self, state: Dict) -> None:
+        """Return to a time and random number generator state recorded by
+        snapshot()."""
+        self.t = None
+        if state["t"] is not None:
+            self.t = datetime.datetime.fromisoformat(state["t"])
+        self.rng.bit_generator.state = state["rng"]
+
+
+class PrefetchingDemand(Demand):
+    """PrefetchingDemand wraps another demand model and reads the next few
+    ticks ahead of time on a background thread, so that tick() only has to
+    take a ready batch off a bounded queue.
+
+    The wrapped model is only ever advanced by one thread at a time, in the
+    same order as without prefetching, so the batches are identical.  On
+    seek() the batches read ahead are dropped and the wrapped model (including
+    its random number generator, if it has one) is rewound to the last batch
+    that was returned before seeking.  Each batch carries a snapshot of the
+    wrapped model taken after reading it, which is used for rewinding and
+    returned by snapshot().
+
+    Args:
+        demand: demand model to read from.  It should not be used directly
+            while wrapped.
+        dt: tick length (seconds) to prefetch for.  Ticks of any other
+            length seek back to the current time and are read synchronously.
+        depth: maximum number of ticks read ahead.
+    """
+
+    def __init__(self, demand: Demand, dt: float, depth: int = 4) -> None:
+        super().__init__()
+        self.demand = demand
+        self.dt = dt
+        self.depth = depth
+        self.t_min = demand.t_min
+        self.t = demand.t
+        self.state = demand.snapshot()
+        self.thread = None
+        self.error = None
+
+    def _run(self, batches: queue.Queue, stop: threading.Event) -> None:
+        while not stop.is_set():
+            try:
+                batch = (self.demand.tick(self.dt), self.demand.t, self.demand.snapshot())
+            except BaseException as error:
+                batch = error
+            while not stop.is_set():
+                try:
+                    batches.put(batch, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if isinstance(batch, BaseException):
+                return
+
+    def _start(self) -> None:
+        self.stop = threading.Event()
+        self.batches = queue.Queue(maxsize=self.depth)
+        self.thread = threading.Thread(
+            target=self._run, args=(self.batches, self.stop), daemon=True
+        )
+        self.thread.start()
+
+    def _stop(self) -> None:
+        """Stop the background thread and rewind the wrapped model to the
+        last batch returned by tick()."""
+        if self.thread is None:
+            return
+        self.stop.set()
+        self.thread.join()
+        self.thread = None
+        self.error = None
+        self.demand.restore(self.state)
+
+    def seek(self, t: datetime.datetime) -> None:
+        """Set demand to time t."""
+        if self.thread is not None and self.t == t:
+            return
+        self._stop()
+        self.demand.seek(t)
+        self.t = self.demand.t
+        self.state = self.demand.snapshot()
+
+    def tick(self, dt: datetime.timedelta, conditions: Dict = None) -> Dict:
+        """Get new jobs released on interval [t, t + dt).
+
+        Args:
+            dt: interval time delta
+            conditions: dictionary of environmental conditions
+
+        Returns:
+            Dictionary with an array for each of JOB_COLUMNS, one element
+            per job.
+        """
+        if self.error is not None:
+            raise self.error
+        if dt != self.dt:
+            self._stop()
+            jobs = self.demand.tick(dt, conditions)
+            self.t = self.demand.t
+            self.state = self.demand.snapshot()
+            return jobs
+        if self.thread is None:
+            self._start()
+        batch = self.batches.get()
+        if isinstance(batch, BaseException):
+            self.error = batch
+            raise batch
+        jobs, self.t, self.state = batch
+        return jobs
+
+    def snapshot(self) -> Dict:
+        """Return the position of the wrapped model after the last batch
+        returned by tick(), see restore()."""
+        return self.state
+
+    def restore(self, state: Dict) -> None:
+        """Drop the batches read ahead and return to a position recorded by
+        snapshot()."""
+        self._stop()
+        self.demand.restore(state)
+        self.t = self.demand.t
+        self.state = state
+
+    def close(self) -> None:
+        """Stop the background thread and close the wrapped model."""
+        self._stop()
+        self.demand.close()
+
+
+class SharedDemand(Demand):
+    """SharedDemand lets <n> simulators that advance in lockstep share one
+    demand model.  Of every <n> consecutive calls to seek() or tick(), only
+    the first is passed on to the wrapped model, the others return the same
+    jobs.
+
+    Args:
+        demand: demand model to read from.
+        n: number of simulators sharing the model.
+    """
+
+    def __init__(self, demand: Demand, n: int) -> None:
+        super().__init__()
+        self.demand = demand
+        self.n = n
+        self.seeks = 0
+        self.ticks = 0
+        self.jobs = None
+        self.t_min = demand.t_min
+        self.t = demand.t
+
+    def seek(self, t: datetime.datetime) -> None:
+        """Set demand to time t."""
+        if self.seeks % self.n == 0:
+            self.demand.seek(t)
+            self.t = self.demand.t
+        self.seeks += 1
+
+    def tick(self, dt: datetime.timedelta, conditions: Dict = None) -> Dict:
+        """Get new jobs released on interval [t, t + dt).
+
+        Args:
+            dt: interval time delta
+            conditions: dictionary of environmental conditions
+
+        Returns:
+            Dictionary with an array for each of JOB_COLUMNS, one element
+            per job.  The arrays are shared, and must not be modified.
+        """
+        if self.ticks % self.n == 0:
+            self.jobs = self.demand.tick(dt, conditions)
+            self.t = self.demand.t
+        self.ticks += 1
+        return self.jobs
+
+    def snapshot(self) -> Dict:
+        """Return the position of the wrapped model, see restore()."""
+        return self.demand.snapshot()
+
+    def restore(self, state: Dict) -> None:
+        """Return to a position recorded by snapshot().  All simulators
+        sharing the model must be restored to the same snapshot before they
+        are stepped again."""
+        self.demand.restore(state)
+        self.t = self.demand.t
+        self.seeks = 0
+        self.ticks = 0
+
+    def close(self) -> None:
+        """Close the wrapped model."""
+        self.demand.close()
+
+
+def to_epoch(t: datetime.datetime) -> int:
+    """Convert a (naive) datetime into epoch seconds."""
+    return int((t - EPOCH).total_seconds())
+
+
+def to_datetime(epoch: int) -> datetime.datetime:
+    """Convert epoch seconds into a (naive) datetime."""
+    return EPOCH + datetime.timedelta(seconds=int(epoch))
+
+
+def build_csv_index(path: str) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Scan a consolidated demand CSV for the byte offset of the first row
+    of each hour.
+
+    Args:
+        path: path to CSV file sorted by pickup time.
+
+    Returns:
+        (hours, offsets) where hours are epoch seconds of the start of each
+        hour with demand and offsets the byte offset of its first row.
+    """
+    hours = []
+    offsets = []
+    with open(path, "rb") as csvfile:
+        header = csvfile.readline()
+        column = header.decode().strip().split(",").index("pickup_time")
+        offset = len(header)
+        last = None
+        for line in csvfile:
+            hour = line.split(b",", column + 1)[column][:13]
+            if hour != last and line.strip():
+                hours.append(
+                    to_epoch(datetime.datetime.strptime(hour.decode(), "%Y-%m-%d %H"))
+                )
+                offsets.append(offset)
+                last = hour
+            offset += len(line)
+    return numpy.array(hours, dtype=numpy.int64), numpy.array(
+        offsets, dtype=numpy.int64
+    )
+
+
+def load_csv_index(path: str) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Load the seek index of a demand CSV, building and caching it next to
+    the CSV if it is missing or out of date.
+
+    Args:
+        path: path to CSV file sorted by pickup time.
+
+    Returns:
+        (hours, offsets) as for build_csv_index.
+    """
+    stat = os.stat(path)
+    index_path = f"{path}.idx.npz"
+    try:
+        with numpy.load(index_path) as index:
+            if index["size"] == stat.st_size and index["mtime"] == stat.st_mtime_ns:
+                return index["hours"], index["offsets"]
+    except (OSError, KeyError, ValueError):
+        pass
+    hours, offsets = build_csv_index(path)
+    try:
+        with open(index_path, "wb") as fp:
+            numpy.savez(
+                fp,
+                hours=hours,
+                offsets=offsets,
+                size=stat.st_size,
+                mtime=stat.st_mtime_ns,
+            )
+    except OSError:
+        pass
+    return hours, offsets
+
+
+def write_demand_store(path: str, columns: Dict[str, numpy.ndarray]) -> None:
+    """Write a demand store that ColumnarDemand can open with mmap.
+
+    Args:
+        path: output directory
+        columns: arrays for each of DEMAND_COLUMNS, sorted by pickup_time,
+            with timestamps in epoch seconds.
+    """
+    write_arrays(
+        path,
+        DEMAND,
+        {
+            name: numpy.asarray(columns[name], dtype=dtype)
+            for name, dtype in DEMAND_COLUMNS.items()
+        },
+    )
+
+
+def partition_path(path: str, year: int, month: int) -> str:
+    """Directory of the <year>/<month> partition of a partitioned demand
+    dataset at <path>.
+    """
+    return os.path.join(path, f"year={year:04d}", f"month={month:02d}")
+
+
+def demand_partitions(
+    path: str, start: datetime.datetime = None, end: datetime.datetime = None
+) -> List[str]:
+    """List the Parquet files of a partitioned demand dataset at <path> in
+    the months covering [start, end], in time order.
+    """
+    partitions = []
+    for year in sorted(os.listdir(path)):
+        if not year.startswith("year="):
+            continue
+        for month in sorted(os.listdir(os.path.join(path, year))):
+            if not month.startswith("month="):
+                continue
+            key = (int(year[len("year=") :]), int(month[len("month=") :]))
+            if start is not None and key < (start.year, start.month):
+                continue
+            if end is not None and key > (end.year, end.month):
+                continue
+            directory = partition_path(path, *key)
+            partitions.extend(
+                os.path.join(directory, name)
+                for name in sorted(os.listdir(directory))
+                if name.endswith(".parquet")
+            )
+    return partitions
+
+
+def is_partitioned(path: str) -> bool:
+    """Check whether <path> is a partitioned demand dataset."""
+    return os.path.isdir(path) and any(
+        name.startswith("year=") for name in os.listdir(path)
+    )
+
+
+def open_demand(
+    path: str,
+    region,
+    loop: bool = True,
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+) -> Demand:
+    """Open demand stored at <path>, either a partitioned Parquet dataset (of
+    which only the months covering [start, end] are read), a demand store
+    directory or a consolidated CSV file.
+    """
+    if is_partitioned(path):
+        return PartitionedDemand(path, region, loop, start, end)
+    if os.path.isdir(path):
+        return ColumnarDemand(path, region, loop)
+    return ReplayDemand(path, region, loop)
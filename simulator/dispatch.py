@@ -0,0 +1,170 @@
+"""Vehicle to job matching."""
+
+from typing import Sequence, Tuple
+
+
+import time
+
+
+import numpy
+
+
+from scipy import optimize, sparse
+from scipy.sparse import csgraph
+
+
+from simulator.region import *
+
+
+class Matcher:
+    """
+    Matcher - assigns idle vehicles to open jobs, minimizing the total
+    distance from the vehicles to the pickups.
+
+    Batches of at most <max_size> vehicle-job pairs are solved exactly as a
+    rectangular linear sum assignment over the dense cost matrix.  Larger
+    batches only consider the <candidates> nearest jobs of each vehicle and
+    are solved as a sparse bipartite matching, in which vehicles may also
+    stay unmatched.
+
+    All vehicles are matched in one assignment, unless <batch_size> is set
+    or there is a <time_budget>, in which case they are matched
+    <batch_size> (default BUDGET_BATCH_SIZE) at a time, each batch taking
+    the best of the jobs left by the previous ones.  The first batch is
+    always solved, but once <time_budget> seconds have passed no further
+    batches are started, and the remaining vehicles are left unmatched for
+    the caller to dispatch greedily.  The budget is only checked between
+    batches, so a batch may overrun it by the time to solve one batch.
+
+    Args:
+        region: global region map.
+        max_size: largest number of vehicle-job pairs solved densely.
+        candidates: number of candidate jobs per vehicle in larger batches.
+        time_budget: wall time available per call to match() (seconds, None
+            means unlimited).
+        batch_size: number of vehicles matched at once (None: see above).
+    """
+
+    BUDGET_BATCH_SIZE = 128  # vehicles matched at once under a time budget
+
+    def __init__(
+        self,
+        region: CyclicZoneGraph,
+        max_size: int = 250000,
+        candidates: int = 8,
+        time_budget: float = None,
+        batch_size: int = None,
+    ) -> None:
+        self.region = region
+        self.max_size = max_size
+        self.candidates = candidates
+        self.time_budget = time_budget
+        self.batch_size = batch_size
+
+    def match(
+        self, vehicle_zones: Sequence[int], job_zones: Sequence[int]
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Match vehicles to jobs.
+
+        Args:
+            vehicle_zones: current zone of each idle vehicle.
+            job_zones: pickup zone of each open job.
+
+        Returns:
+            (vehicles, jobs) indices into <vehicle_zones> and <job_zones> of
+            the matched pairs.
+        """
+        start = time.perf_counter()
+        vehicle_zones = numpy.asarray(vehicle_zones, dtype=numpy.int64)
+        job_zones = numpy.asarray(job_zones, dtype=numpy.int64)
+        open_jobs = numpy.arange(len(job_zones))
+        vehicles = [numpy.array([], dtype=numpy.int64)]
+        jobs = [numpy.array([], dtype=numpy.int64)]
+        batch_size = self.batch_size
+        if batch_size is None and self.time_budget is None:
+            batch_size = len(vehicle_zones)
+        elif batch_size is None:
+            batch_size = self.BUDGET_BATCH_SIZE
+        for first in range(0, len(vehicle_zones), max(batch_size, 1)):
+            if len(open_jobs) == 0:
+                break
+            if (
+                first > 0
+                and self.time_budget is not None
+                and time.perf_counter() - start > self.time_budget
+            ):
+                break
+            batch = numpy.arange(first, min(first + batch_size, len(vehicle_zones)))
+            if len(batch) * len(open_jobs) <= self.max_size:
+                rows, cols = self._dense(vehicle_zones[batch], job_zones[open_jobs])
+            else:
+                rows, cols = self._sparse(vehicle_zones[batch], job_zones[open_jobs])
+            vehicles.append(batch[rows])
+            jobs.append(open_jobs[cols])
+            open_jobs = numpy.delete(open_jobs, cols)
+        return numpy.concatenate(vehicles), numpy.concatenate(jobs)
+
+    def _dense(
+        self, vehicle_zones: numpy.ndarray, job_zones: numpy.ndarray
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        cost, _ = self.region.distance_submatrix(vehicle_zones, job_zones)
+        # Unreachable pairs cost more than any set of reachable ones, so
+        # they are only used where the assignment cannot avoid them, and
+        # are left out of the result
+        reachable = numpy.isfinite(cost)
+        finite = cost[reachable]
+        sentinel = 1.0
+        if len(finite) > 0:
+            sentinel = (finite.max() + 1.0) * min(cost.shape) + 1.0
+        rows, cols = optimize.linear_sum_assignment(
+            numpy.where(reachable, cost, sentinel)
+        )
+        keep = reachable[rows, cols]
+        return rows[keep], cols[keep]
+
+    def _sparse(
+        self, vehicle_zones: numpy.ndarray, job_zones: numpy.ndarray
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        # Jobs sharing a pickup zone have the same cost, so candidates are
+        # taken zone by zone, nearest zone first
+        zones, inverse, count = numpy.unique(
+            job_zones, return_inverse=True, return_counts=True
+        )
+        by_zone = numpy.argsort(inverse, kind="stable")
+        offset = numpy.concatenate([[0], numpy.cumsum(count)[:-1]])
+        cost, _ = self.region.distance_submatrix(vehicle_zones, zones)
+        nearest = numpy.argsort(cost, axis=1, kind="stable")
+        rows, cols, weights = [], [], []
+        for vehicle in range(len(vehicle_zones)):
+            needed = self.candidates
+            for zone in nearest[vehicle].tolist():
+                if not numpy.isfinite(cost[vehicle, zone]):
+                    break  # this and the remaining zones are unreachable
+                take = min(int(count[zone]), needed)
+                rows.extend([vehicle] * take)
+                cols.extend(by_zone[offset[zone] : offset[zone] + take].tolist())
+                weights.extend([cost[vehicle, zone].item()] * take)
+                needed -= take
+                if needed == 0:
+                    break
+
+        # Weights are shifted by one so that zero distances remain edges of
+        # the sparse graph.  Each vehicle can also be matched to a dummy job
+        # of its own, at a cost higher than any set of real matches.
+        n, m = len(vehicle_zones), len(job_zones)
+        weights = numpy.array(weights) + 1.0
+        penalty = n * (weights.max() if len(weights) > 0 else 1.0) + 1.0
+        graph = sparse.csr_matrix(
+            (
+                numpy.concatenate([weights, numpy.full(n, penalty)]),
+                (
+                    numpy.concatenate([rows, numpy.arange(n)]).astype(numpy.int64),
+                    numpy.concatenate([cols, m + numpy.arange(n)]).astype(numpy.int64),
+                ),
+            ),
+            shape=(n, m + n),
+        )
+        rows, cols = csgraph.min_weight_full_bipartite_matching(graph)
+        real = cols < m
+        return rows[real], cols[real]
@@ -0,0 +1,79 @@
+"""Discrete event queue."""
+
+from typing import Any, Iterator, List, Tuple
+from enum import Enum
+
+
+import heapq
+import itertools
+
+
+class EventType(Enum):
+    """
+    Simulation events, in the order they are processed when they occur at
+    the same time (the order of the phases of a tick).
+    """
+
+    VEHICLE_ARRIVAL = 1  # Vehicle reaches the destination of its leg
+    CHARGING = 2  # Charging station charges its vehicles for a tick
+    DEMAND_RELEASE = 3  # Jobs of the next tick arrive
+    JOB_EXPIRATION = 4  # Jobs not assigned within a tick are rejected
+
+
+class EventQueue:
+    """
+    EventQueue - priority queue of simulation events.
+
+    Events are ordered by time, then by type, then by the order they were
+    pushed.
+    """
+
+    def __init__(self) -> None:
+        self.heap = []
+        self.counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def push(self, t: float, kind: EventType, key: Any = None) -> None:
+        """
+        Schedule an event of type <kind> at time <t> (seconds).  <key> is
+        passed back when the event is popped.
+        """
+        heapq.heappush(self.heap, (t, kind.value, next(self.counter), kind, key))
+
+    def peek(self) -> float:
+        """
+        Return the time of the next event (inf if the queue is empty).
+        """
+        return self.heap[0][0] if self.heap else float("inf")
+
+    def snapshot(self) -> List[Tuple[float, EventType, int, Any]]:
+        """
+        Return the queued events as (time, kind, sequence number, key), in
+        the order of the heap, see restore().
+        """
+        return [(t, kind, seq, key) for t, _, seq, kind, key in self.heap]
+
+    def restore(self, events: List[Tuple[float, EventType, int, Any]]) -> None:
+        """
+        Replace the queued events with <events>, as returned by snapshot().
+        Events pushed afterwards are ordered after all restored events
+        occurring at the same time.
+        """
+        self.heap = [(t, kind.value, seq, kind, key) for t, kind, seq, key in events]
+        heapq.heapify(self.heap)
+        last = max((seq for _, _, seq, _ in events), default=-1)
+        self.counter = itertools.count(last + 1)
+
+    def pop_until(self, t: float) -> Iterator[Tuple[float, EventType, Any]]:
+        """
+        Pop all events up to and including time <t>, in order.  Events
+        pushed while iterating are popped as well if they occur by <t>.
+
+        Yields:
+            (time, kind, key) of each event.
+        """
+        while self.heap and self.heap[0][0] <= t:
+            time, _, _, kind, key = heapq.heappop(self.heap)
+            yield time, kind, key
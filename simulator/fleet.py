@@ -0,0 +1,433 @@
+"""Fleet state engine."""
+
+from typing import Dict, Iterator, List, Sequence, Union
+
+
+import numpy
+
+
+from simulator.battery import *
+from simulator.job import *
+from simulator.region import *
+from simulator.vehicle import *
+
+MOVING = [
+    VehicleStatus.TOPICKUP.value,
+    VehicleStatus.TOCHARGE.value,
+    VehicleStatus.TOLOC.value,
+    VehicleStatus.ONJOB.value,
+    VehicleStatus.RECOVERY.value,
+]
+ACTIVE = MOVING + [VehicleStatus.IDLE.value, VehicleStatus.CHARGING.value]
+RECOVERY_TIME = 24 * 60 * 60
+STATUS_NAMES = {status.value: status.name for status in VehicleStatus}
+FLEET_STATE = [
+    "efficiency",
+    "initial_capacity",
+    "actual_capacity",
+    "soc",
+    "depot",
+    "location",
+    "destination",
+    "distance_remaining",
+    "time_remaining",
+    "time_elapsed",
+    "preferred_rate",
+    "status",
+    "job_slot",
+    "job_id",
+]
+FLEET_FIELDS = [
+    "location",
+    "destination",
+    "distance_remaining",
+    "time_remaining",
+    "status",
+    "initial_capacity",
+    "actual_capacity",
+    "soc",
+    "time_elapsed",
+]
+
+
+class FleetBattery(MultiStageBattery):
+    """MultiStageBattery whose state is stored in a Fleet.
+
+    Args:
+        fleet: fleet storing the battery state.
+        vid: id of the vehicle the battery belongs to.
+    """
+
+    def __init__(self, fleet: "Fleet", vid: int) -> None:
+        self.fleet = fleet
+        self.vid = vid
+
+    @property
+    def initial_capacity(self) -> float:
+        """Capacity when the battery was new (kWh)."""
+        return self.fleet.initial_capacity[self.vid].item()
+
+    @initial_capacity.setter
+    def initial_capacity(self, capacity: float) -> None:
+        self.fleet.initial_capacity[self.vid] = capacity
+
+    @property
+    def actual_capacity(self) -> float:
+        """Current capacity of the battery (kWh)."""
+        return self.fleet.actual_capacity[self.vid].item()
+
+    @actual_capacity.setter
+    def actual_capacity(self, capacity: float) -> None:
+        self.fleet.actual_capacity[self.vid] = capacity
+
+    @property
+    def soc(self) -> float:
+        """State of charge."""
+        return self.fleet.soc[self.vid].item()
+
+    @soc.setter
+    def soc(self, soc: float) -> None:
+        self.fleet.soc[self.vid] = soc
+
+
+class Fleet:
+    """
+    Fleet - struct-of-arrays store for the state of all vehicles.
+
+    Each field of the vehicle state is a NumPy array indexed by vehicle id,
+    so the fleet is advanced with masked array operations instead of one
+    Python call per vehicle.  Vehicle and FleetBattery objects are views of
+    a single vehicle for per-vehicle access.
+
+    Args:
+        region: global region map.
+        jobs: global job table.
+        locations: starting zone of each vehicle (also its depot).
+        model: select from previously defined vehicles: ['byd e6'] or provide
+            a dictionary in the format {'capacity': kWh, 'efficiency':
+            kWh/100km}
+        battery: select from previously defined models: ['multistage']
+    """
+
+    def __init__(
+        self,
+        region: Region,
+        jobs: JobTable,
+        locations: Sequence[int],
+        model: Union[str, Dict[str, float]],
+        battery: str,
+    ) -> None:
+        self.region = region
+        self.jobs = jobs
+        self.model = model
+        if isinstance(model, str) and model.lower() == "byd e6":
+            capacity = 71.7
+            efficiency = 17.1
+        else:
+            capacity = model["capacity"]
+            efficiency = model["efficiency"]
+        if battery.lower() != "multistage":
+            raise Exception(f"Unknown battery model: {battery}")
+
+        size = len(locations)
+        self.efficiency = numpy.full(size, efficiency)
+        self.initial_capacity = numpy.full(size, float(capacity))
+        self.actual_capacity = numpy.full(size, float(capacity))
+        self.soc = numpy.ones(size)
+        self.depot = numpy.array(locations, dtype=numpy.int64)
+        self.location = self.depot.copy()
+        self.destination = self.depot.copy()
+        self.distance_remaining = numpy.zeros(size)
+        self.time_remaining = numpy.zeros(size)
+        self.time_elapsed = numpy.zeros(size)
+        self.preferred_rate = numpy.zeros(size)
+        self.status = numpy.full(size, VehicleStatus.IDLE.value, dtype=numpy.int8)
+        self.job_slot = numpy.full(size, -1, dtype=numpy.int64)
+        self.job_id = numpy.full(size, -1, dtype=numpy.int64)
+        self.chargers = [None] * size
+        self.batteries = [FleetBattery(self, vid) for vid in range(size)]
+        self.vehicles = [Vehicle(self, vid) for vid in range(size)]
+
+    def __len__(self) -> int:
+        return len(self.vehicles)
+
+    def __getitem__(self, vid: int) -> Vehicle:
+        return self.vehicles[vid]
+
+    def __iter__(self) -> Iterator[Vehicle]:
+        return iter(self.vehicles)
+
+    def to_location(self, zone: int) -> CyclicZoneGraphLocation:
+        """
+        Return a location object for <zone>.
+        """
+        return CyclicZoneGraphLocation(int(zone), self.region)
+
+    def job(self, vid: int) -> Job:
+        """
+        Return a view of the job assigned to vehicle <vid> (None if no job
+        was ever assigned).
+        """
+        if self.job_slot[vid] < 0:
+            return None
+        return Job(self.jobs, int(self.job_slot[vid]), int(self.job_id[vid]))
+
+    def set_job(self, vid: int, job: Job) -> None:
+        """
+        Assign <job> to vehicle <vid>.
+        """
+        self.job_slot[vid] = job.slot
+        self.job_id[vid] = job.id
+
+    def state_of_health(self) -> numpy.ndarray:
+        """
+        Return the state of health (actual / initial capacity) of each
+        battery.
+        """
+        return self.actual_capacity / self.initial_capacity
+
+    def observation(self) -> numpy.ndarray:
+        """
+        Return the (state of health, state of charge) of each vehicle as an
+        array of shape (len(fleet), 2).
+        """
+        return numpy.column_stack([self.state_of_health(), self.soc])
+
+    def to_array(self, vids: Sequence[int] = None) -> numpy.ndarray:
+        """
+        Return the vehicles <vids> (default: all vehicles) as a structured
+        array with a field for each of FLEET_FIELDS (status is the
+        VehicleStatus value).
+        """
+        vids = slice(None) if vids is None else numpy.asarray(vids, dtype=numpy.int64)
+        status = self.status[vids]
+        array = numpy.empty(
+            len(status), dtype=[(name, getattr(self, name).dtype) for name in FLEET_FIELDS]
+        )
+        for name in FLEET_FIELDS:
+            array[name] = getattr(self, name)[vids]
+        return array
+
+    def to_dicts(self, vids: Sequence[int] = None) -> List[Dict]:
+        """
+        Return a list of dictionaries representing the vehicles <vids> (default:
+        all vehicles), see Vehicle.to_dict.
+        """
+        return fleet_dicts(self.to_array(vids))
+
+    def snapshot(self, stations: Sequence["ChargeStation"]) -> Dict[str, numpy.ndarray]:
+        """
+        Return the state of the fleet as arrays, see restore().  The arrays
+        are views of the fleet and are only valid until it changes.
+
+        Args:
+            stations: charging stations, the charger of each vehicle is
+                recorded as its index in <stations> (-1 for none).
+        """
+        index = {station: i for i, station in enumerate(stations)}
+        arrays = {name: getattr(self, name) for name in FLEET_STATE}
+        arrays["charger"] = numpy.array(
+            [index.get(charger, -1) for charger in self.chargers], dtype=numpy.int64
+        )
+        return arrays
+
+    def restore(
+        self, arrays: Dict[str, numpy.ndarray], stations: Sequence["ChargeStation"]
+    ) -> None:
+        """
+        Restore the state of the fleet from <arrays>, as returned by
+        snapshot().  The arrays of the fleet are updated in place, so views
+        of them (see stack_fleets) stay valid.
+
+        Raises:
+            Exception if the snapshot is of a fleet of another size.
+        """
+        if len(arrays["status"]) != len(self):
+            raise Exception(
+                f"Fleet of {len(arrays['status'])} vehicles cannot be restored "
+                f"into a fleet of {len(self)}"
+            )
+        for name in FLEET_STATE:
+            getattr(self, name)[...] = arrays[name]
+        self.chargers = [
+            None if i < 0 else stations[i] for i in arrays["charger"].tolist()
+        ]
+
+    def charge(
+        self, vids: numpy.ndarray, dW: numpy.ndarray, dt: float, T_a: float
+    ) -> None:
+        """
+        Charge the batteries of vehicles <vids> with <dW> kWh each across
+        <dt> seconds at <T_a> degrees Celsius.
+        """
+        self.soc[vids], self.actual_capacity[vids] = (
+            MultiStageBattery.recalculate_capacity_batch(
+                self.soc[vids],
+                self.actual_capacity[vids],
+                self.initial_capacity[vids],
+                dW,
+                dt,
+                T_a,
+            )
+        )
+
+    def discharge(
+        self, vids: numpy.ndarray, dW: numpy.ndarray, dt: float, T_a: float
+    ) -> None:
+        """
+        Discharge <dW> kWh each from the batteries of vehicles <vids> across
+        <dt> seconds at <T_a> degrees Celsius.
+        """
+        self.charge(vids, -numpy.asarray(dW), dt, T_a)
+
+    def _update_jobs(self, vids: numpy.ndarray, status: numpy.ndarray) -> None:
+        """Set the jobs of vehicles <vids> to <status>, skipping jobs that
+        have finished since they were assigned."""
+        slots = self.job_slot[vids]
+        valid = self.jobs.id[slots] == self.job_id[vids]
+        self.jobs.set_status(slots[valid], status[valid])
+
+    def tick(
+        self, dt: float, conditions: Dict[str, int], vids: Sequence[int] = None
+    ) -> None:
+        """
+        Update the state of all vehicles (or only of vehicles <vids>).
+
+        Vehicles travelling to a destination count down their time remaining.
+        On arrival the energy of the leg is discharged from their battery,
+        and they move on to the next state: a vehicle that reaches its pickup
+        starts the job, one that reaches its dropoff completes it, and one
+        that reaches a charger starts charging.  Vehicles whose battery runs
+        empty fail their job and are recovered to their depot.  Charging
+        vehicles request power from their charger.
+
+        Args:
+            dt: tick length (seconds).
+            conditions: environmental conditions present during the tick.
+            vids: ids of the vehicles to update (default: all vehicles).
+        """
+        if vids is None:
+            vids = numpy.arange(len(self))
+        vids = numpy.asarray(vids, dtype=numpy.int64)
+        status = self.status[vids]
+        invalid = ~numpy.isin(status, ACTIVE)
+        if invalid.any():
+            raise Exception(
+                f"Invalid vehicle state: {VehicleStatus(int(status[invalid][0]))}"
+            )
+
+        # Idle MultiStageBatteries do not age, so idle vehicles are unchanged
+
+        # Count down travel timers
+        moving = vids[numpy.isin(status, MOVING)]
+        self.time_remaining[moving] -= dt
+        arrived = moving[self.time_remaining[moving] <= 0]
+        leg = self.status[arrived]
+        self.status[arrived[leg == VehicleStatus.RECOVERY.value]] = (
+            VehicleStatus.IDLE.value
+        )
+        arrived = arrived[leg != VehicleStatus.RECOVERY.value]
+        leg = leg[leg != VehicleStatus.RECOVERY.value]
+
+        # Discharge the energy of the leg on arrival
+        distance, _ = self.region.distance_pairs(
+            self.location[arrived], self.destination[arrived]
+        )
+        self.discharge(
+            arrived, distance * self.efficiency[arrived] / 100, dt, conditions["T_a"]
+        )
+        empty = self.soc[arrived] <= 0
+
+        # Update jobs of vehicles arriving at a pickup or dropoff
+        on_job = (leg == VehicleStatus.TOPICKUP.value) | (
+            leg == VehicleStatus.ONJOB.value
+        )
+        job_status = numpy.select(
+            [empty, leg == VehicleStatus.TOPICKUP.value],
+            [JobStatus.FAILED.value, JobStatus.INPROGRESS.value],
+            JobStatus.COMPLETE.value,
+        )
+        self._update_jobs(arrived[on_job], job_status[on_job])
+
+        # Move on to the next state
+        pickup = arrived[(leg == VehicleStatus.TOPICKUP.value) & ~empty]
+        self.destination[pickup] = self.jobs.dropoff_location[self.job_slot[pickup]]
+        _, self.time_remaining[pickup] = self.region.distance_pairs(
+            self.location[pickup], self.destination[pickup]
+        )
+        self.status[arrived] = numpy.select(
+            [
+                empty,
+                leg == VehicleStatus.TOPICKUP.value,
+                leg == VehicleStatus.TOCHARGE.value,
+            ],
+            [
+                VehicleStatus.RECOVERY.value,
+                VehicleStatus.ONJOB.value,
+                VehicleStatus.CHARGING.value,
+            ],
+            VehicleStatus.IDLE.value,
+        )
+
+        # Recover vehicles with an empty battery
+        recovery = arrived[empty]
+        self.destination[recovery] = self.depot[recovery]
+        self.time_remaining[recovery] = RECOVERY_TIME
+        self.charge(recovery, self.actual_capacity[recovery], 3600, 25)
+
+        # Request power for charging vehicles
+        for vid in vids[status == VehicleStatus.CHARGING.value].tolist():
+            self.chargers[vid].request_charge(self.preferred_rate[vid].item(), vid)
+
+
+def fleet_dicts(array: numpy.ndarray) -> List[Dict]:
+    """
+    Return a list of dictionaries representing the vehicles in <array>, as
+    returned by Fleet.to_array, see Vehicle.to_dict.
+    """
+    return [
+        {
+            "location": location,
+            "destination": destination,
+            "distance_remaining": distance_remaining,
+            "time_remaining": time_remaining,
+            "status": STATUS_NAMES[status],
+            "battery": {
+                "initial_capacity": initial_capacity,
+                "actual_capacity": actual_capacity,
+                "soc": soc,
+            },
+            "time_elapsed": time_elapsed,
+        }
+        for location, destination, distance_remaining, time_remaining, status, initial_capacity, actual_capacity, soc, time_elapsed in zip(
+            array["location"].tolist(),
+            array["destination"].tolist(),
+            array["distance_remaining"].tolist(),
+            array["time_remaining"].tolist(),
+            array["status"].tolist(),
+            array["initial_capacity"].tolist(),
+            array["actual_capacity"].tolist(),
+            array["soc"].tolist(),
+            array["time_elapsed"].tolist(),
+        )
+    ]
+
+
+def stack_fleets(fleets: Sequence[Fleet]) -> Dict[str, numpy.ndarray]:
+    """
+    Stack the state of <fleets> (of equal size) along a leading batch axis.
+
+    The arrays of each fleet are replaced by views of its row of the stacked
+    arrays, so the fleets keep working as before and the stacked arrays
+    always hold their current state.
+
+    Returns:
+        {field: array of shape (len(fleets), fleet size)} for each of
+        FLEET_STATE.
+    """
+    state = {}
+    for name in FLEET_STATE:
+        state[name] = numpy.stack([getattr(fleet, name) for fleet in fleets])
+        for fleet, row in zip(fleets, state[name]):
+            setattr(fleet, name, row)
+    return state
@@ -0,0 +1,55 @@
+"""Step information returned by the simulator."""
+
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator
+
+
+INFO_LEVELS = ["none", "summary", "full"]
+
+
+class LazyInfo(MutableMapping):
+    """
+    LazyInfo - info dictionary whose sections are only built when they are
+    first accessed.
+
+    Sections are built on first access by functions that should only
+    depend on data captured when the info was created, so that the info
+    can be read after later steps.
+
+    Args:
+        values: entries that are available immediately.
+        sections: {key: function} building each remaining entry.
+    """
+
+    def __init__(
+        self, values: Dict[str, Any], sections: Dict[str, Callable[[], Any]]
+    ) -> None:
+        self.values = dict(values)
+        self.sections = dict(sections)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.sections:
+            self.values[key] = self.sections.pop(key)()
+        return self.values[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.sections.pop(key, None)
+        self.values[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in self.sections:
+            del self.sections[key]
+        else:
+            del self.values[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.values) + list(self.sections))
+
+    def __len__(self) -> int:
+        return len(self.values) + len(self.sections)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.values or key in self.sections
+
+    def __repr__(self) -> str:
+        return f"LazyInfo({list(self.values)}, pending={list(self.sections)})"
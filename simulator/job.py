@@ -1,17 +1,17 @@
 """Jobs."""
 
-from typing import Dict, Union
+from typing import Dict, List, Union
 from enum import Enum
 
 
-import datetime
+import numpy
 
 
 from simulator.region import *
 from simulator.vehicle import *
 
-
-DATEFMT = "%Y-%m-%d %H:%M:%S"
+JOB_COLUMNS = ["pickup_location", "dropoff_location", "duration", "distance", "fare"]
+JOB_FIELDS = ["id"] + JOB_COLUMNS + ["vehicle", "status", "elapsed_time"]
 
 
 class JobStatus(Enum):
@@ -27,35 +27,371 @@ class JobStatus(Enum):
     FAILED = 6  # Job failed
 
 
-class Job:
+class JobTable:
     """
-    Job - a request for taxi service.
+    JobTable - struct-of-arrays store for all jobs in the simulation.
+
+    Each job occupies a slot in a set of parallel arrays.  Slots of finished
+    jobs are released and reused, so the table only grows with the number of
+    jobs that are active at the same time.
+
+    Active jobs are kept in one bucket per status, and status changes move
+    a job between buckets in O(1), counting the jobs that ever reached each
+    status in <total>.  Jobs that completed, failed or were rejected stay
+    in their bucket until release_finished() is called.
+
+    Open jobs (arrived, but not yet assigned or rejected) are additionally
+    indexed by pickup zone, so that nearest_open() only has to visit the
+    zones nearer than the nearest open job.  Jobs leave the index in O(1)
+    when they are assigned or rejected.
 
     Args:
-        data: job data.  Must contain keys: pickup_location (int),
-            dropoff_location (int), pickup_time (timestamp), dropoff_time
-            (timestamp), and distance (float, km).
-        job_id: a unique integer id for this job.
         region: global region map used to convert locations into location
             objects.
+        capacity: initial number of slots.
     """
 
-    def __init__(self, data: Dict, job_id: int, region: Region) -> None:
-        self.id = job_id
-        self.pickup_location = CyclicZoneGraphLocation(
-            int(data["pickup_location"]), region
+    FREE = 0  # status of a released slot
+    SCAN_BLOCK = 16  # zones visited at first by nearest_open()
+    FINISHED = [JobStatus.COMPLETE, JobStatus.FAILED, JobStatus.REJECTED]
+    FIELDS = [  # (array, value of an unused slot)
+        ("id", -1),
+        ("pickup_location", 0),
+        ("dropoff_location", 0),
+        ("duration", 0),
+        ("distance", 0),
+        ("fare", 0),
+        ("status", FREE),
+        ("vehicle", -1),
+        ("elapsed_time", 0),
+    ]
+
+    def __init__(self, region: Region, capacity: int = 1024) -> None:
+        self.region = region
+        self.next_id = 0
+        self.free = []
+        self.size = 0
+        self.id = numpy.full(capacity, -1, dtype=numpy.int64)
+        self.pickup_location = numpy.zeros(capacity, dtype=numpy.int64)
+        self.dropoff_location = numpy.zeros(capacity, dtype=numpy.int64)
+        self.duration = numpy.zeros(capacity)
+        self.distance = numpy.zeros(capacity)
+        self.fare = numpy.zeros(capacity)
+        self.status = numpy.zeros(capacity, dtype=numpy.int8)
+        self.vehicle = numpy.full(capacity, -1, dtype=numpy.int64)
+        self.elapsed_time = numpy.zeros(capacity)
+        self.buckets = {status.value: {} for status in JobStatus}  # {slot: None}
+        self.total = numpy.zeros(len(JobStatus) + 1, dtype=numpy.int64)
+        self.open = {}  # pickup zone -> {slot: None}, in arrival order
+        self.open_count = numpy.zeros(
+            0 if region is None else len(region.index), dtype=numpy.int64
         )
-        self.dropoff_location = CyclicZoneGraphLocation(
-            int(data["dropoff_location"]), region
+
+    def _grow(self, capacity: int) -> None:
+        for name, fill in self.FIELDS:
+            old = getattr(self, name)
+            new = numpy.full(capacity, fill, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, jobs: Dict[str, numpy.ndarray]) -> numpy.ndarray:
+        """
+        Add newly arrived <jobs>.
+
+        Args:
+            jobs: dictionary with an array for each of JOB_COLUMNS.
+
+        Returns:
+            slots of the new jobs.
+        """
+        n = len(jobs["pickup_location"])
+        reused = min(n, len(self.free))
+        slots = numpy.empty(n, dtype=numpy.int64)
+        if reused > 0:
+            slots[:reused] = self.free[len(self.free) - reused :]
+            del self.free[len(self.free) - reused :]
+        slots[reused:] = numpy.arange(self.size, self.size + n - reused)
+        self.size += n - reused
+        if self.size > len(self.id):
+            self._grow(max(self.size, 2 * len(self.id)))
+        for name in JOB_COLUMNS:
+            getattr(self, name)[slots] = jobs[name]
+        self.id[slots] = numpy.arange(self.next_id, self.next_id + n)
+        self.next_id += n
+        self.status[slots] = JobStatus.ARRIVED.value
+        self.vehicle[slots] = -1
+        self.elapsed_time[slots] = 0
+        self.buckets[JobStatus.ARRIVED.value].update(dict.fromkeys(slots.tolist()))
+        self.total[JobStatus.ARRIVED.value] += n
+        self._open(slots)
+        return slots
+
+    def _open(self, slots: numpy.ndarray) -> None:
+        zones = self.pickup_location[slots]
+        if len(zones) > 0 and zones.max() >= len(self.open_count):
+            open_count = numpy.zeros(zones.max() + 1, dtype=numpy.int64)
+            open_count[: len(self.open_count)] = self.open_count
+            self.open_count = open_count
+        for slot, zone in zip(slots.tolist(), zones.tolist()):
+            self.open.setdefault(zone, {})[slot] = None
+        numpy.add.at(self.open_count, zones, 1)
+
+    def _close(self, slots: numpy.ndarray) -> None:
+        for slot in numpy.atleast_1d(slots).tolist():
+            zone = int(self.pickup_location[slot])
+            bucket = self.open.get(zone)
+            if bucket is not None and slot in bucket:
+                del bucket[slot]
+                self.open_count[zone] -= 1
+
+    def nearest_open(self, neighbors: numpy.ndarray) -> int:
+        """
+        Find the nearest open job.
+
+        Args:
+            neighbors: zone ids sorted by distance, see
+                CyclicZoneGraph.neighbors.
+
+        Returns:
+            slot of the first open job in the nearest zone with open jobs
+            (None if there are no open jobs in <neighbors>).
+        """
+        # Visit the neighbors in growing blocks, so that a vehicle near open
+        # jobs only looks at a few zones rather than at the whole city.
+        start, block = 0, self.SCAN_BLOCK
+        while start < len(neighbors):
+            zones = neighbors[start : start + block]
+            zones = zones[zones < len(self.open_count)]
+            nonempty = numpy.flatnonzero(self.open_count[zones])
+            if len(nonempty) > 0:
+                return next(iter(self.open[int(zones[nonempty[0]])]))
+            start += block
+            block *= 4
+        return None
+
+    def slots(self, status: JobStatus) -> numpy.ndarray:
+        """
+        Return the slots of the jobs with <status>, in the order they
+        reached it.
+        """
+        bucket = self.buckets[status.value]
+        return numpy.fromiter(bucket, dtype=numpy.int64, count=len(bucket))
+
+    def release(self, slots: numpy.ndarray) -> None:
+        """
+        Release the <slots> of finished jobs for reuse.
+        """
+        self._close(slots)
+        for slot, status in zip(
+            numpy.atleast_1d(slots).tolist(), numpy.atleast_1d(self.status[slots]).tolist()
+        ):
+            if status != self.FREE:
+                del self.buckets[status][slot]
+        self.status[slots] = self.FREE
+        self.id[slots] = -1
+        self.free.extend(numpy.atleast_1d(slots).tolist())
+
+    def release_finished(self) -> None:
+        """
+        Release the slots of all jobs that completed, failed or were
+        rejected.
+        """
+        for status in self.FINISHED:
+            self.release(self.slots(status))
+
+    def set_status(
+        self, slots: numpy.ndarray, status: Union[JobStatus, numpy.ndarray]
+    ) -> None:
+        """
+        Set the status of the jobs in <slots>, moving them to the bucket of
+        their new status.
+
+        Args:
+            slots: slots of the jobs.
+            status: new status, or an array with the new status value of
+                each job.
+        """
+        slots = numpy.atleast_1d(slots)
+        if isinstance(status, JobStatus):
+            status = status.value
+        new = numpy.broadcast_to(status, slots.shape)
+        old = self.status[slots]
+        moved = old != new
+        slots, old, new = slots[moved], old[moved], new[moved]
+        self._close(slots[old == JobStatus.ARRIVED.value])
+        for slot, prev, value in zip(slots.tolist(), old.tolist(), new.tolist()):
+            del self.buckets[prev][slot]
+            self.buckets[value][slot] = None
+        numpy.add.at(self.total, new, 1)
+        self.status[slots] = new
+
+    def assign(self, slots: numpy.ndarray, vehicles: numpy.ndarray) -> None:
+        """
+        Assign <vehicles> to the jobs in <slots>.
+        """
+        self.set_status(slots, JobStatus.ASSIGNED)
+        self.vehicle[slots] = vehicles
+
+    def tick(self, slots: numpy.ndarray, dt: float) -> None:
+        """
+        Update the state of the jobs in <slots>.  Jobs that have waited
+        longer than one tick without being assigned are rejected.
+
+        Args:
+            slots: slots of the jobs to update.
+            dt: tick length in seconds.
+        """
+        self.elapsed_time[slots] += dt
+        expired = slots[
+            (self.status[slots] == JobStatus.ARRIVED.value)
+            & (self.elapsed_time[slots] > dt)
+        ]
+        self.set_status(expired, JobStatus.REJECTED)
+
+    def snapshot(self) -> Dict[str, numpy.ndarray]:
+        """
+        Return the state of the table as arrays, see restore().  The arrays
+        may be views of the table and are only valid until it changes.
+        """
+        arrays = {name: getattr(self, name)[: self.size] for name, _ in self.FIELDS}
+        for status, bucket in self.buckets.items():
+            arrays[f"bucket_{status}"] = numpy.fromiter(
+                bucket, dtype=numpy.int64, count=len(bucket)
+            )
+        arrays["free"] = numpy.array(self.free, dtype=numpy.int64)
+        arrays["total"] = self.total
+        arrays["next_id"] = numpy.int64(self.next_id)
+        return arrays
+
+    def restore(self, arrays: Dict[str, numpy.ndarray]) -> None:
+        """
+        Restore the state of the table from <arrays>, as returned by
+        snapshot().  The index of open jobs is rebuilt from the arrived
+        jobs.
+        """
+        self.size = len(arrays["id"])
+        capacity = max(self.size, len(self.id))
+        for name, fill in self.FIELDS:
+            array = numpy.full(capacity, fill, dtype=getattr(self, name).dtype)
+            array[: self.size] = arrays[name]
+            setattr(self, name, array)
+        self.buckets = {
+            status.value: dict.fromkeys(arrays[f"bucket_{status.value}"].tolist())
+            for status in JobStatus
+        }
+        self.free = arrays["free"].tolist()
+        self.total = arrays["total"].copy()
+        self.next_id = int(arrays["next_id"])
+        self.open = {}
+        self.open_count = numpy.zeros(
+            0 if self.region is None else len(self.region.index), dtype=numpy.int64
+        )
+        self._open(self.slots(JobStatus.ARRIVED))
+
+    def view(self, slot: int) -> "Job":
+        """
+        Return a Job view of the job in <slot>.
+        """
+        return Job(self, int(slot))
+
+    def to_array(self, slots: numpy.ndarray) -> numpy.ndarray:
+        """
+        Return the jobs in <slots> as a structured array with a field for
+        each of JOB_FIELDS (vehicle is -1 for unassigned jobs, status is the
+        JobStatus value).
+        """
+        array = numpy.empty(
+            len(slots), dtype=[(name, getattr(self, name).dtype) for name in JOB_FIELDS]
         )
-        self.duration = datetime.datetime.strptime(
-            data["dropoff_time"], DATEFMT
-        ) - datetime.datetime.strptime(data["pickup_time"], DATEFMT)
-        self.distance = float(data["distance"])
-        self.fare = float(data["fare"])
-        self.vehicle = None
-        self.status = JobStatus.ARRIVED
-        self.elapsed_time = 0
+        for name in JOB_FIELDS:
+            array[name] = getattr(self, name)[slots]
+        return array
+
+    def to_dicts(self, slots: numpy.ndarray) -> List[Dict]:
+        """
+        Return a list of dictionaries representing the jobs in <slots>, see
+        Job.to_dict.
+        """
+        return job_dicts(self.to_array(slots))
+
+
+class Job:
+    """
+    Job - a request for taxi service.  Jobs are stored in a JobTable, this
+    is a lightweight view of a single job for per-job access.
+
+    A view only acts on the job it was created for: once that job has
+    finished and its slot is reused, updates through the view are ignored.
+
+    Args:
+        table: table storing the job.
+        slot: slot of the job in the table.
+        job_id: id of the job (default: the job currently in the slot).
+    """
+
+    def __init__(self, table: JobTable, slot: int, job_id: int = None) -> None:
+        self.table = table
+        self.slot = slot
+        self.id = int(table.id[slot]) if job_id is None else job_id
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, Job)
+            and self.table is other.table
+            and self.slot == other.slot
+            and self.id == other.id
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.slot, self.id))
+
+    def _valid(self) -> bool:
+        return self.table.id[self.slot] == self.id
+
+    @property
+    def pickup_location(self) -> CyclicZoneGraphLocation:
+        """Pickup location of the job."""
+        return CyclicZoneGraphLocation(
+            int(self.table.pickup_location[self.slot]), self.table.region
+        )
+
+    @property
+    def dropoff_location(self) -> CyclicZoneGraphLocation:
+        """Dropoff location of the job."""
+        return CyclicZoneGraphLocation(
+            int(self.table.dropoff_location[self.slot]), self.table.region
+        )
+
+    @property
+    def duration(self) -> float:
+        """Trip duration (seconds)."""
+        return float(self.table.duration[self.slot])
+
+    @property
+    def distance(self) -> float:
+        """Trip distance (km)."""
+        return float(self.table.distance[self.slot])
+
+    @property
+    def fare(self) -> float:
+        """Trip fare ($)."""
+        return float(self.table.fare[self.slot])
+
+    @property
+    def vehicle(self) -> int:
+        """Id of the assigned vehicle (None if unassigned)."""
+        vehicle = int(self.table.vehicle[self.slot])
+        return None if vehicle < 0 else vehicle
+
+    @property
+    def status(self) -> JobStatus:
+        """Current job status."""
+        return JobStatus(int(self.table.status[self.slot]))
+
+    @property
+    def elapsed_time(self) -> float:
+        """Time since the job arrived (seconds)."""
+        return float(self.table.elapsed_time[self.slot])
 
     def to_dict(self) -> Dict[str, Union[Dict, float, int, str]]:
         """
@@ -66,50 +402,61 @@ class Job:
             (float, sec.), distance (float, km), fare (float, $),
             vehicle (int), status (str), id (int) }
         """
-        return {
-            "pickup_location": self.pickup_location.to_dict(),
-            "dropoff_location": self.dropoff_location.to_dict(),
-            "duration": self.duration.total_seconds(),
-            "distance": self.distance,
-            "fare": self.fare,
-            "vehicle": self.vehicle,
-            "status": self.status.name,
-            "id": self.id,
-        }
+        return self.table.to_dicts([self.slot])[0]
 
     def assign_vehicle(self, vehicle: int) -> None:
         """
         Assign <vehicle> to this job.
         """
-        self.status = JobStatus.ASSIGNED
-        self.vehicle = vehicle
+        if self._valid():
+            self.table.assign(self.slot, vehicle)
 
     def inprogress(self) -> None:
         """
         Set the job status to "INPROGRESS".
         """
-        self.status = JobStatus.INPROGRESS
+        if self._valid():
+            self.table.set_status(self.slot, JobStatus.INPROGRESS)
 
     def complete(self) -> None:
         """
         Set the job status to "COMPLETE".
         """
-        self.status = JobStatus.COMPLETE
+        if self._valid():
+            self.table.set_status(self.slot, JobStatus.COMPLETE)
 
     def fail(self) -> None:
         """
         Set the job status to "FAILED".
         """
-        self.status = JobStatus.FAILED
+        if self._valid():
+            self.table.set_status(self.slot, JobStatus.FAILED)
 
-    def tick(self, dt: float) -> None:
-        """
-        Update this job's state.
 
-        Args:
-            dt: tick length in seconds.
-        """
-        self.elapsed_time += dt
-        if self.status == JobStatus.ARRIVED:
-            if self.elapsed_time > dt:
-                self.status = JobStatus.REJECTED
+def job_dicts(array: numpy.ndarray) -> List[Dict]:
+    """
+    Return a list of dictionaries representing the jobs in <array>, as
+    returned by JobTable.to_array, see Job.to_dict.
+    """
+    return [
+        {
+            "pickup_location": pickup,
+            "dropoff_location": dropoff,
+            "duration": duration,
+            "distance": distance,
+            "fare": fare,
+            "vehicle": None if vehicle < 0 else vehicle,
+            "status": JobStatus(status).name,
+            "id": job_id,
+        }
+        for pickup, dropoff, duration, distance, fare, vehicle, status, job_id in zip(
+            array["pickup_location"].tolist(),
+            array["dropoff_location"].tolist(),
+            array["duration"].tolist(),
+            array["distance"].tolist(),
+            array["fare"].tolist(),
+            array["vehicle"].tolist(),
+            array["status"].tolist(),
+            array["id"].tolist(),
+        )
+    ]
@@ -0,0 +1,157 @@
+"""Wall time profiling of simulator steps."""
+
+from typing import Dict
+
+
+import time
+
+BUCKETS = 64  # histogram buckets, bucket b counts durations of b bits (ns)
+
+
+class PhaseStats:
+    """
+    PhaseStats - wall time statistics of one phase of a step.
+
+    Durations are counted in a histogram with one bucket per power of two
+    nanoseconds, so percentiles are known to within a factor of two at a
+    fixed cost per call.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0  # ns
+        self.max = 0  # ns
+        self.histogram = [0] * BUCKETS
+
+    def percentile(self, q: float) -> int:
+        """
+        Return an upper bound of the <q>th percentile (0 to 100) of the
+        durations in nanoseconds.
+        """
+        rank = q / 100 * self.calls
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if count > 0 and seen >= rank:
+                return min((1 << bucket) - 1, self.max)
+        return self.max
+
+    def merge(self, other: "PhaseStats") -> None:
+        """
+        Add the durations counted in <other>.
+        """
+        self.calls += other.calls
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def to_dict(self) -> Dict[str, float]:
+        """
+        Return a dictionary summarizing the statistics.
+
+        Returns:
+            { calls (int), total (s), mean, p50, p90, p99, max (µs),
+            histogram ({upper bound (ns): count}) }
+        """
+        return {
+            "calls": self.calls,
+            "total": self.total / 1e9,
+            "mean": self.total / max(self.calls, 1) / 1e3,
+            "p50": self.percentile(50) / 1e3,
+            "p90": self.percentile(90) / 1e3,
+            "p99": self.percentile(99) / 1e3,
+            "max": self.max / 1e3,
+            "histogram": {
+                (1 << bucket) - 1: count
+                for bucket, count in enumerate(self.histogram)
+                if count > 0
+            },
+        }
+
+
+class StepProfiler:
+    """
+    StepProfiler - records the wall time of each phase of the simulator
+    steps, aggregated over all steps since it was created.
+
+    A step calls begin() before its first phase and lap(<phase>) at the end
+    of each phase, which attributes the time since the previous call to
+    <phase>.  end() records the time of the whole step as "step".
+    """
+
+    def __init__(self) -> None:
+        self.phases = {}  # name -> PhaseStats, in order of first use
+        self.start = 0
+        self.last = 0
+
+    def begin(self) -> None:
+        """
+        Start timing a step.
+        """
+        self.start = self.last = time.perf_counter_ns()
+
+    def _record(self, phase: str, elapsed: int) -> None:
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats()
+        stats.calls += 1
+        stats.total += elapsed
+        if elapsed > stats.max:
+            stats.max = elapsed
+        stats.histogram[min(elapsed.bit_length(), BUCKETS - 1)] += 1
+
+    def lap(self, phase: str) -> None:
+        """
+        Attribute the time since the previous call to <phase>.
+        """
+        now = time.perf_counter_ns()
+        self._record(phase, now - self.last)
+        self.last = now
+
+    def end(self) -> None:
+        """
+        Finish timing a step.
+        """
+        self._record("step", time.perf_counter_ns() - self.start)
+
+    def reset(self) -> None:
+        """
+        Discard all statistics.
+        """
+        self.phases = {}
+
+    def merge(self, other: "StepProfiler") -> None:
+        """
+        Add the statistics of <other>, e.g. of another simulator of a
+        vector environment.
+        """
+        for phase, stats in other.phases.items():
+            if phase not in self.phases:
+                self.phases[phase] = PhaseStats()
+            self.phases[phase].merge(stats)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Return the statistics of each phase, see PhaseStats.to_dict.
+        """
+        return {phase: stats.to_dict() for phase, stats in self.phases.items()}
+
+    def report(self) -> str:
+        """
+        Return the statistics of each phase as a table, with the share of
+        the total step time spent in each phase.
+        """
+        summary = self.summary()
+        step = summary.get("step", {}).get("total", 0.0)
+        lines = [
+            f"{'phase':<12}{'calls':>10}{'total s':>12}{'share':>8}"
+            f"{'mean µs':>12}{'p50 µs':>12}{'p99 µs':>12}{'max µs':>12}"
+        ]
+        for phase, stats in summary.items():
+            share = stats["total"] / step if step > 0 else 0.0
+            lines.append(
+                f"{phase:<12}{stats['calls']:>10}{stats['total']:>12.3f}{share:>8.1%}"
+                f"{stats['mean']:>12.1f}{stats['p50']:>12.1f}{stats['p99']:>12.1f}"
+                f"{stats['max']:>12.1f}"
+            )
+        return "\n".join(lines)
@@ -1,11 +1,22 @@
 """Region map."""
 
-from typing import Dict, ForwardRef, Self, Tuple
+from typing import Dict, ForwardRef, Self, Sequence, Tuple, Union
 
 
+import datetime
+import os
 import pickle
 
 
+import numpy
+
+
+from simulator.storage import *
+
+CITY_MAP = "city map"
+WEEK = 7 * 24 * 60 * 60
+
+
 class Location:
     """Abstract class representing a location in a region."""
 
@@ -35,6 +46,12 @@ class Region:
     def __init__(self) -> None:
         pass
 
+    def seek(self, t: datetime.datetime) -> None:
+        """Set the time used for distance calculations that do not specify
+        one in their conditions.
+        """
+        pass
+
     def distance(
         self, start: Location, end: Location, conditions: Dict = None
     ) -> Tuple[float, float]:
@@ -78,29 +95,254 @@ class CyclicZoneGraphLocation(Location):
 class CyclicZoneGraph(Region):
     """Region comprised of zones connected by bidirectional edges.
 
+    Travel distances and times are held as dense (n_zones, n_zones) arrays.
+    Zone ids are translated to rows/columns of these arrays through the
+    <index> table, so that dispatch code can look up whole rows or
+    submatrices in a single call.  Maps written by generate_city_map also
+    carry <next_hop>, where next_hop[i, j] is the zone id following zones[i]
+    on the shortest route to zones[j].
+
+    If the map carries a time of week travel time tensor, times are scaled
+    by the slice for the time given in the conditions, or, if none is given,
+    the time set with seek().
+
     Args:
-        mapfile: path to file containing map data.
+        mapfile: path to a map directory written by write_city_map (opened
+            with mmap), or to a legacy pickled map.
+        arrays: map arrays to use instead of reading <mapfile>, as returned
+            by arrays().
     """
 
-    def __init__(self, mapfile: str) -> None:
+    def __init__(self, mapfile: str = None, arrays: Dict[str, numpy.ndarray] = None) -> None:
         super().__init__()
-        with open(mapfile, "rb") as pklfile:
-            self.map = pickle.loads(pklfile.read())
+        if arrays is None and os.path.isdir(mapfile):
+            arrays, _ = read_arrays(mapfile, CITY_MAP)
+        elif arrays is None:
+            with open(mapfile, "rb") as pklfile:
+                arrays = city_map_arrays(pickle.loads(pklfile.read()))
+        self.zones = arrays["zones"]
+        self.index = arrays["index"]
+        self.distances = arrays["distance"]
+        self.times = arrays["time"]
+        self.next_hop = arrays.get("next_hop")
+        self.time_factor = arrays.get("time_factor")
+        self.time_bucket = arrays.get("time_bucket")
+        self.neighbor_order = None
+        self.neighbor_count = None
+        self.factor = None
+        if self.time_factor is not None:
+            self.bucket_length = WEEK // len(self.time_bucket)
+            self.factor = self.time_factor[self.time_bucket[0]]
+
+    def arrays(self) -> Dict[str, numpy.ndarray]:
+        """Arrays of this map, in the format of write_city_map."""
+        arrays = {
+            "zones": self.zones,
+            "index": self.index,
+            "distance": self.distances,
+            "time": self.times,
+            "next_hop": self.next_hop,
+            "time_factor": self.time_factor,
+            "time_bucket": self.time_bucket,
+        }
+        return {name: array for name, array in arrays.items() if array is not None}
+
+    def time_of_week(self, t: datetime.datetime) -> numpy.ndarray:
+        """Travel time factors (n_zones, n_zones) in effect at time <t>, or
+        None if this map has no time of week tensor.
+        """
+        if self.time_factor is None:
+            return None
+        return self.time_factor[self.time_bucket[time_of_week(t) // self.bucket_length]]
+
+    def seek(self, t: datetime.datetime) -> None:
+        """Set the time used for distance calculations that do not specify
+        one in their conditions.
+        """
+        self.factor = self.time_of_week(t)
+
+    def _factor(self, conditions: Dict) -> numpy.ndarray:
+        if conditions is not None and "t" in conditions:
+            return self.time_of_week(conditions["t"])
+        return self.factor
+
+    def zone_index(self, zones: Union[int, Sequence[int]]) -> numpy.ndarray:
+        """Translate zone ids into row/column indices of the distance arrays.
+
+        Args:
+            zones: a zone id or sequence of zone ids
+
+        Returns:
+            array of indices with the same shape as <zones>.
+
+        Raises:
+            KeyError if any of the zones is not part of this region.
+        """
+        zones = numpy.asarray(zones)
+        if (zones < 0).any() or (zones >= len(self.index)).any():
+            raise KeyError(f"Unknown zone in {zones}")
+        idx = self.index[zones]
+        if (idx < 0).any():
+            raise KeyError(f"Unknown zone in {zones}")
+        return idx
 
     def distance(
         self, start: Location, end: Location, conditions: Dict = None
-    ) -> float:
+    ) -> Tuple[float, float]:
         """Calculate the distance between <start> and <end> given <conditions>.
 
         Args:
             start: starting location
             end: ending location
-            conditions: environmental conditions
+            conditions: environmental conditions, "t" (datetime) selects the
+                travel time slice.
 
         Returns:
             (distance, time) in km and seconds respectively.
         """
-        return (
-            self.map[start.zone][end.zone]["distance"],
-            self.map[start.zone][end.zone]["time"],
-        )
+        i = self.index[start.zone]
+        j = self.index[end.zone]
+        if i < 0 or j < 0:
+            raise KeyError(f"Unknown zone in {(start.zone, end.zone)}")
+        factor = self._factor(conditions)
+        if factor is None:
+            return self.distances[i, j].item(), self.times[i, j].item()
+        return self.distances[i, j].item(), (self.times[i, j] * factor[i, j]).item()
+
+    def distance_row(
+        self, start: int, ends: Sequence[int] = None, conditions: Dict = None
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """One-to-many lookup from zone <start> to each zone in <ends>.
+
+        Args:
+            start: starting zone id
+            ends: destination zone ids (None selects every zone, in the order
+                of <zones>)
+            conditions: environmental conditions, as for distance()
+
+        Returns:
+            (distance, time) arrays in km and seconds respectively.
+        """
+        i = self.zone_index(start)
+        j = slice(None) if ends is None else self.zone_index(ends)
+        factor = self._factor(conditions)
+        if factor is None:
+            return self.distances[i, j], self.times[i, j]
+        return self.distances[i, j], self.times[i, j] * factor[i, j]
+
+    def neighbors(self, zone: int) -> numpy.ndarray:
+        """Zone ids of all zones reachable from <zone> (at a finite
+        distance), sorted by distance (nearest first).  The order is
+        computed for every zone on first use.
+        """
+        if self.neighbor_order is None:
+            self.neighbor_order = self.zones[
+                numpy.argsort(self.distances, axis=1, kind="stable")
+            ]
+            # Unreachable zones sort last, so each row is cut before them
+            self.neighbor_count = numpy.isfinite(self.distances).sum(axis=1)
+        i = self.zone_index(zone)
+        return self.neighbor_order[i, : self.neighbor_count[i]]
+
+    def distance_pairs(
+        self, starts: Sequence[int], ends: Sequence[int], conditions: Dict = None
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Elementwise lookup from each zone in <starts> to the zone at the
+        same position in <ends>.
+
+        Args:
+            starts: starting zone ids
+            ends: destination zone ids (same length as <starts>)
+            conditions: environmental conditions, as for distance()
+
+        Returns:
+            (distance, time) arrays in km and seconds respectively.
+        """
+        i = self.zone_index(starts)
+        j = self.zone_index(ends)
+        factor = self._factor(conditions)
+        if factor is None:
+            return self.distances[i, j], self.times[i, j]
+        return self.distances[i, j], self.times[i, j] * factor[i, j]
+
+    def distance_submatrix(
+        self, starts: Sequence[int], ends: Sequence[int], conditions: Dict = None
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Many-to-many lookup between zones <starts> and zones <ends>.
+
+        Args:
+            starts: starting zone ids
+            ends: destination zone ids
+            conditions: environmental conditions, as for distance()
+
+        Returns:
+            (distance, time) arrays of shape (len(starts), len(ends)) in km
+            and seconds respectively.
+        """
+        rows, cols = numpy.ix_(self.zone_index(starts), self.zone_index(ends))
+        factor = self._factor(conditions)
+        if factor is None:
+            return self.distances[rows, cols], self.times[rows, cols]
+        return self.distances[rows, cols], self.times[rows, cols] * factor[rows, cols]
+
+
+def time_of_week(t: datetime.datetime) -> int:
+    """Seconds elapsed at time <t> since the start of its week (Monday
+    00:00).
+    """
+    return t.weekday() * 86400 + t.hour * 3600 + t.minute * 60 + t.second
+
+
+def city_map_arrays(city: Dict) -> Dict[str, numpy.ndarray]:
+    """Convert a legacy {zone: {zone: {"distance", "time"}}} map into the
+    arrays used by CyclicZoneGraph.
+
+    Args:
+        city: nested dictionary map, as unpickled from a legacy map file
+
+    Returns:
+        {zones, index, distance, time}
+    """
+    zones = numpy.array(sorted(city), dtype=numpy.int64)
+    index = numpy.full(zones.max() + 1, -1, dtype=numpy.int64)
+    index[zones] = numpy.arange(len(zones))
+    distance = numpy.empty((len(zones), len(zones)))
+    time = numpy.empty((len(zones), len(zones)))
+    for i, zone_from in enumerate(zones):
+        for j, zone_to in enumerate(zones):
+            distance[i, j] = city[zone_from][zone_to]["distance"]
+            time[i, j] = city[zone_from][zone_to]["time"]
+    return {"zones": zones, "index": index, "distance": distance, "time": time}
+
+
+def write_city_map(
+    path: str,
+    zones: numpy.ndarray,
+    distance: numpy.ndarray,
+    time: numpy.ndarray,
+    **arrays: numpy.ndarray,
+) -> None:
+    """Write a city map that CyclicZoneGraph can open with mmap.
+
+    Args:
+        path: output map directory
+        zones: zone ids, one per row/column of <distance> and <time>
+        distance: (n_zones, n_zones) travel distances in km
+        time: (n_zones, n_zones) travel times in seconds
+        arrays: additional arrays to store with the map, e.g. next_hop
+    """
+    zones = numpy.asarray(zones, dtype=numpy.int64)
+    index = numpy.full(zones.max() + 1, -1, dtype=numpy.int64)
+    index[zones] = numpy.arange(len(zones))
+    write_arrays(
+        path,
+        CITY_MAP,
+        {
+            "zones": zones,
+            "index": index,
+            "distance": numpy.asarray(distance, dtype=numpy.float64),
+            "time": numpy.asarray(time, dtype=numpy.float64),
+            **arrays,
+        },
+        n_zones=len(zones),
+    )
@@ -0,0 +1,215 @@
+"""Read-only simulator assets shared between processes.
+
+The parent process publishes the arrays of a scenario (the region map and
+the decoded demand columns) once in shared memory.  Worker processes attach
+to them by name and get read-only NumPy views of the same memory, so the
+memory used by the assets does not grow with the number of workers.
+"""
+
+from typing import Dict
+
+
+import multiprocessing
+import os
+import sys
+
+
+import numpy
+
+
+from multiprocessing import resource_tracker, shared_memory
+
+
+from simulator.demand import *
+from simulator.region import *
+
+HEADER = 64  # bytes before the first array, holding the attachment count
+ALIGN = 64  # alignment of each array in the block
+
+
+def _attach_block(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Before Python 3.13 every attached block is registered for cleanup, and
+    # a resource tracker of its own would unlink it when the worker exits.
+    # Workers started by multiprocessing share the tracker of the owner,
+    # where the block is already registered, so only other processes
+    # unregister it.  Only POSIX blocks are registered, under their name
+    # with a leading slash.
+    block = shared_memory.SharedMemory(name=name)
+    if os.name == "posix" and multiprocessing.parent_process() is None:
+        resource_tracker.unregister("/" + block.name.lstrip("/"), "shared_memory")
+    return block
+
+
+class SharedAssets:
+    """
+    SharedAssets - read-only arrays published in one shared memory block.
+
+    The process creating the assets owns them.  Pass the object to worker
+    processes when they are started (e.g. as an argument of
+    multiprocessing.Process, or in the initargs of a Pool), and call
+    attach() in the worker to get views of the arrays without copying.
+    The number of attached workers is counted in the block; the owner
+    unlinks the block in close(), after which workers that are still
+    attached keep their views until they detach.
+
+    Args:
+        arrays: arrays to publish ({name: array}).
+        context: multiprocessing context the workers are started with
+            (default: the default context).
+    """
+
+    def __init__(self, arrays: Dict[str, numpy.ndarray], context=None) -> None:
+        self.layout = {}
+        size = HEADER
+        for name, array in arrays.items():
+            array = numpy.asarray(array)
+            size = -(-size // ALIGN) * ALIGN
+            self.layout[name] = (size, array.shape, array.dtype.str)
+            size += array.nbytes
+        self.block = shared_memory.SharedMemory(create=True, size=size)
+        self.name = self.block.name
+        self.lock = (context or multiprocessing).Lock()
+        self.pid = os.getpid()
+        self.attached = self.pid
+        self.refs = numpy.ndarray((1,), dtype=numpy.int64, buffer=self.block.buf)
+        self.refs[0] = 0
+        self.arrays = self._views(writeable=True)
+        for name, array in arrays.items():
+            self.arrays[name][...] = array
+            self.arrays[name].flags.writeable = False
+
+    def __getstate__(self) -> Dict:
+        return {
+            "name": self.name,
+            "layout": self.layout,
+            "lock": self.lock,
+            "pid": self.pid,
+        }
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self.attached = None
+        self.block = None
+        self.refs = None
+        self.arrays = None
+
+    def __enter__(self) -> Dict[str, numpy.ndarray]:
+        return self.attach()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _views(self, writeable: bool = False) -> Dict[str, numpy.ndarray]:
+        views = {}
+        for name, (offset, shape, dtype) in self.layout.items():
+            views[name] = numpy.ndarray(
+                shape, dtype=numpy.dtype(dtype), buffer=self.block.buf, offset=offset
+            )
+            views[name].flags.writeable = writeable
+        return views
+
+    @property
+    def owner(self) -> bool:
+        """Whether this process published the assets."""
+        return os.getpid() == self.pid
+
+    @property
+    def users(self) -> int:
+        """Number of workers attached to the assets."""
+        if self.attached != os.getpid():
+            return 0
+        return int(self.refs[0])
+
+    def attach(self) -> Dict[str, numpy.ndarray]:
+        """
+        Attach to the assets (in the owner this returns the published
+        arrays).
+
+        Returns:
+            {name: read-only array}
+        """
+        # Workers started with fork inherit the views of the parent, they
+        # attach by name like any other worker
+        if self.attached != os.getpid():
+            self.block = _attach_block(self.name)
+            self.refs = numpy.ndarray((1,), dtype=numpy.int64, buffer=self.block.buf)
+            with self.lock:
+                self.refs[0] += 1
+            self.arrays = self._views()
+            self.attached = os.getpid()
+        return self.arrays
+
+    def detach(self) -> None:
+        """
+        Drop the views of the assets.  Arrays returned by attach() must not
+        be used afterwards.
+        """
+        if self.attached != os.getpid():
+            return
+        if not self.owner:
+            with self.lock:
+                self.refs[0] -= 1
+        self.arrays = None
+        self.refs = None
+        try:
+            self.block.close()
+        except BufferError:
+            pass  # views are still referenced, unmapped once they are freed
+        self.block = None
+        self.attached = None
+
+    def close(self) -> None:
+        """
+        Detach from the assets, and in the owner also unlink the shared
+        memory block.
+        """
+        block = self.block if self.attached == os.getpid() else None
+        self.detach()
+        if self.owner and block is not None:
+            block.unlink()
+
+
+def share_scenario(
+    region: CyclicZoneGraph, demand: Demand = None, context=None
+) -> SharedAssets:
+    """Publish the arrays of <region> and the decoded columns of a columnar
+    <demand> (see ColumnarDemand and PartitionedDemand) in shared memory,
+    for workers started with multiprocessing <context>.
+
+    Raises:
+        Exception if <demand> does not hold its columns in memory, e.g. CSV
+        demand, which should be converted with scripts.convert_demand.
+    """
+    arrays = {f"region/{name}": array for name, array in region.arrays().items()}
+    if demand is not None:
+        columns = getattr(demand, "columns", None)
+        if columns is None:
+            raise Exception(f"Only columnar demand can be shared, not {type(demand).__name__}")
+        arrays.update({f"demand/{name}": column for name, column in columns.items()})
+    return SharedAssets(arrays, context)
+
+
+def shared_region(assets: SharedAssets) -> CyclicZoneGraph:
+    """Attach to the region published by share_scenario."""
+    arrays = assets.attach()
+    return CyclicZoneGraph(
+        arrays={
+            name[len("region/") :]: array
+            for name, array in arrays.items()
+            if name.startswith("region/")
+        }
+    )
+
+
+def shared_demand(assets: SharedAssets, region: Region, loop: bool = True) -> ColumnarDemand:
+    """Attach to the demand published by share_scenario.  Each call returns
+    a demand model with its own position in the shared columns."""
+    arrays = assets.attach()
+    columns = {
+        name[len("demand/") :]: array
+        for name, array in arrays.items()
+        if name.startswith("demand/")
+    }
+    return ColumnarDemand(None, region, loop, columns)
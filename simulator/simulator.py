@@ -1,5 +1,5 @@
 """Taxi fleet simulator."""
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 from enum import Enum
 
 
@@ -7,6 +7,7 @@ import argparse
 import datetime
 import json
 import logging
+import math
 import pickle
 import random
 
@@ -22,12 +23,43 @@ from scipy import stats
 from simulator.job import *
 from simulator.charger import *
 from simulator.demand import *
+from simulator.dispatch import *
+from simulator.events import *
+from simulator.fleet import *
+from simulator.info import *
+from simulator.profiler import *
 from simulator.region import *
+from simulator.snapshot import *
 from simulator.vehicle import *
 
 
 random.seed(0)
 numpy.random.seed(0)
+LOGGER = logging.getLogger(__name__)
+
+
+def load_demand(config: Dict, region: Region, seed: int = None) -> Demand:
+    """Open the demand model configured in <config>.
+
+    Args:
+        config: simulator configuration dictionary.
+        region: global region map.
+        seed: seed for synthetic demand (default: the configured seed).
+    """
+    start = datetime.datetime.strptime(config['start t'], '%Y/%m/%d %H:%M:%S')
+    end = datetime.datetime.strptime(config['end t'], '%Y/%m/%d %H:%M:%S')
+    if config.get('demand type', 'replay') == 'synthetic':
+        demand = SyntheticDemand(
+            config['demand'],
+            region,
+            seed=seed if seed is not None else config.get('demand seed', 0),
+            scale=config.get('demand scale', 1.0)
+        )
+    else:
+        demand = open_demand(config['demand'], region, start=start, end=end)
+    if config.get('demand prefetch', 0) > 0:
+        demand = PrefetchingDemand(demand, float(config['delta t']), config['demand prefetch'])
+    return demand
 
 
 class TaxiFleetSimulator(gym.Env):
@@ -36,19 +68,66 @@ class TaxiFleetSimulator(gym.Env):
     Args:
         seed: seed value for random number generator
         config: configuration dictionary, (see config.yaml for details.)
+        region: region map to use instead of loading the configured one
+            (shared with other simulators, see TaxiFleetVectorEnv)
+        demand: demand model to use instead of opening the configured one
+            (shared with other simulators, owned and closed by the caller)
+
+    If 'profile' is set in the configuration, the wall time of each phase of
+    step() is recorded in <profiler> (see StepProfiler) over all episodes.
     """
 
-    def __init__(self, config: Dict) -> None:
+    def __init__(self, config: Dict, region: Region = None, demand: Demand = None) -> None:
         super().__init__()
         self.config = config
+        self.shared_region = region
+        self.shared_demand = demand
+        self.profiler = StepProfiler() if config.get('profile', False) else None
 
     def _get_obs(self) -> numpy.array:
         """Get an observation from the environment."""
-        obs = numpy.zeros((len(self.fleet), 2))
-        for idx, v in enumerate(self.fleet):
-            obs[idx, 0] = v.battery.actual_capacity / v.battery.initial_capacity
-            obs[idx, 1] = v.battery.soc
-        return obs
+        return self.fleet.observation()
+
+    def _get_info(self) -> Dict:
+        """Get the info dictionary for the configured info level.
+
+        "none" returns an empty dictionary, "summary" the job counters, and
+        "full" additionally the arrived, assigned and in-progress jobs, the
+        charging network, the fleet and, when profiling, the step profile.
+        The jobs, the fleet and the charging network are copied when the
+        info is created, so it still describes this step after later steps;
+        the jobs and the fleet are kept as structured arrays under
+        "<section>_array" and only turned into dictionaries on first
+        access.  The profile is read from the profiler on first access.
+        """
+        if self.info_level == 'none':
+            return {}
+        info = {
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'n_arrived': len(self.jobs.buckets[JobStatus.ARRIVED.value]),
+            'n_assigned': len(self.jobs.buckets[JobStatus.ASSIGNED.value]),
+            'n_inprogress': len(self.jobs.buckets[JobStatus.INPROGRESS.value]),
+        }
+        if self.info_level == 'summary':
+            return info
+        # The arrays of this step are copied now, so that the info stays
+        # valid after later steps, and only turned into dicts on access
+        sections = {}
+        for key, status in [
+            ('arrived', JobStatus.ARRIVED),
+            ('assigned', JobStatus.ASSIGNED),
+            ('inprogress', JobStatus.INPROGRESS),
+        ]:
+            info[f'{key}_array'] = self.jobs.to_array(self.jobs.slots(status))
+            sections[key] = lambda array=info[f'{key}_array']: job_dicts(array)
+        info['charging_network'] = [s.to_dict() for s in self.charging_network]
+        info['fleet_array'] = self.fleet.to_array()
+        sections['fleet'] = lambda array=info['fleet_array']: fleet_dicts(array)
+        if self.profiler is not None:
+            sections['profile'] = self.profiler.summary
+        return LazyInfo(info, sections)
 
     def reset(self, seed: int = None) -> Tuple[numpy.array, Dict]:
         """Start a new episode.
@@ -68,36 +147,70 @@ class TaxiFleetSimulator(gym.Env):
         self.T_a = 25 #TODO Weather model
 
         # Load Map
-        self.region = CyclicZoneGraph(self.config['city']) 
+        if self.shared_region is not None:
+            self.region = self.shared_region
+        else:
+            self.region = CyclicZoneGraph(self.config['city'])
+        self.region.seek(self.t)
 
         # Load Demand
-        self.demand = ReplayDemand(self.config['demand'], self.region)
+        if self.shared_demand is not None:
+            self.demand = self.shared_demand
+        else:
+            if getattr(self, 'demand', None) is not None:
+                self.demand.close()
+            self.demand = load_demand(self.config, self.region, seed)
         self.demand.seek(self.t)
-        self.arrived = self.demand.tick(self.dt)
-        self.assigned = set()
-        self.inprogress = set()
-        self.rejected = 0
-        self.completed = 0
-        self.failed = 0
+        self.jobs = JobTable(self.region)
+        released = self.jobs.add(self.demand.tick(self.dt))
 
         # Initialize Fleet
-        self.fleet = []
-        for vehicle in range(self.config['fleet']['size']):
-            self.fleet.append(Vehicle(
-                model=self.config['fleet']['vehicle'],
-                battery=self.config['fleet']['battery model'],
-                location=CyclicZoneGraphLocation(random.choice(list(self.region.map.keys())), self.region),
-                vid=vehicle
-            ))
+        zones = self.region.zones.tolist()
+        self.fleet = Fleet(
+            region=self.region,
+            jobs=self.jobs,
+            locations=[random.choice(zones) for vehicle in range(self.config['fleet']['size'])],
+            model=self.config['fleet']['vehicle'],
+            battery=self.config['fleet']['battery model'],
+        )
+
+        # Initialize Dispatch
+        self.matcher = None
+        if self.config.get('dispatch', 'greedy') == 'optimal':
+            self.matcher = Matcher(
+                self.region,
+                max_size=self.config.get('dispatch max size', 250000),
+                candidates=self.config.get('dispatch candidates', 8),
+                time_budget=self.config.get('dispatch time budget'),
+                batch_size=self.config.get('dispatch batch size'),
+            )
 
         # Initialize Charging Network
-        self.charging_network = []
+        stations = []
         for station in self.config['charging stations']:
-            self.charging_network.append(ChargeStation(
+            stations.append(ChargeStation(
                 location = CyclicZoneGraphLocation(station['location'], self.region),
                 ports = [ChargePort(station['max port power'], station['efficiency']) for port in range(station['ports'])],
                 P_max = station['max total power'],
             ))
+        self.charging_network = ChargingNetwork(self.region, stations)
+        self.max_charger_occupancy = self.config.get('charger max occupancy')
+
+        # Initialize Engine
+        self.engine = self.config.get('engine', 'tick')
+        if self.engine not in ['tick', 'event']:
+            raise Exception(f"Unknown engine: {self.engine}")
+        if self.engine == 'event':
+            self.clock = 0.0
+            self.events = EventQueue()
+            self.legs = numpy.zeros(len(self.fleet), dtype=numpy.int64)
+            self.eta = numpy.zeros(len(self.fleet))
+            self.charging = set()
+            self.events.push(self.dt, EventType.DEMAND_RELEASE)
+            # Jobs released at reset wait one extra tick, as in tick mode
+            key = (released, self.jobs.id[released].copy())
+            self.events.push(self.dt, EventType.JOB_EXPIRATION, key)
+            self.events.push(2 * self.dt, EventType.JOB_EXPIRATION, key)
 
         # Initialize State and Action Spaces
         self.observation_space = gym.spaces.Box(0,1, shape=(len(self.fleet), 2))
@@ -105,42 +218,245 @@ class TaxiFleetSimulator(gym.Env):
         self.step_count = 0
 
         # Global state information
-        info = {}
-        info['arrived'] = [j.to_dict() for j in self.arrived]
-        info['assigned'] = [j.to_dict() for j in self.assigned]
-        info['completed'] = self.completed
-        info['rejected'] = self.rejected
-        info['inprogress'] = [j.to_dict() for j in self.inprogress]
-        info['failed'] = self.failed
-        info['charging_network'] = [s.to_dict() for s in self.charging_network]
-        info['fleet'] = [v.to_dict() for v in self.fleet]
+        self.info_level = self.config.get('info', 'full')
+        if self.info_level not in INFO_LEVELS:
+            raise Exception(f"Unknown info level: {self.info_level}")
+
+        return self._get_obs(), self._get_info()
+
+    @property
+    def completed(self) -> int:
+        """Number of jobs completed so far."""
+        return int(self.jobs.total[JobStatus.COMPLETE.value])
+
+    @property
+    def rejected(self) -> int:
+        """Number of jobs rejected so far."""
+        return int(self.jobs.total[JobStatus.REJECTED.value])
+
+    @property
+    def failed(self) -> int:
+        """Number of jobs failed so far."""
+        return int(self.jobs.total[JobStatus.FAILED.value])
+
+    def close(self) -> None:
+        """Release resources held by the environment, stopping any
+        background demand reader."""
+        if getattr(self, 'demand', None) is not None:
+            if self.shared_demand is None:
+                self.demand.close()
+            self.demand = None
+        super().close()
+
+    def _snapshot_events(self) -> Dict[str, numpy.ndarray]:
+        """Encode the event engine state as arrays.  Event keys are stored
+        in <a> and <b>: the vehicle and leg of arrivals, the station index
+        of charging events, and the range of <expire_slots> and
+        <expire_ids> holding the jobs of expirations."""
+        stations = {station: i for i, station in enumerate(self.charging_network)}
+        events = self.events.snapshot()
+        a = numpy.zeros(len(events), dtype=numpy.int64)
+        b = numpy.zeros(len(events), dtype=numpy.int64)
+        slots, ids = [], []
+        expiring = 0
+        for i, (_, kind, _, key) in enumerate(events):
+            if kind == EventType.VEHICLE_ARRIVAL:
+                a[i], b[i] = key
+            elif kind == EventType.CHARGING:
+                a[i] = stations[key]
+            elif kind == EventType.JOB_EXPIRATION:
+                slots.append(key[0])
+                ids.append(key[1])
+                a[i], b[i] = expiring, expiring + len(key[0])
+                expiring += len(key[0])
+        return {
+            'time': numpy.array([t for t, _, _, _ in events], dtype=numpy.float64),
+            'kind': numpy.array([kind.value for _, kind, _, _ in events], dtype=numpy.int8),
+            'seq': numpy.array([seq for _, _, seq, _ in events], dtype=numpy.int64),
+            'a': a,
+            'b': b,
+            'expire_slots': numpy.concatenate(slots or [numpy.zeros(0, dtype=numpy.int64)]),
+            'expire_ids': numpy.concatenate(ids or [numpy.zeros(0, dtype=numpy.int64)]),
+            'legs': self.legs,
+            'eta': self.eta,
+            'charging': numpy.array(sorted(stations[s] for s in self.charging), dtype=numpy.int64),
+        }
+
+    def _restore_events(self, arrays: Dict[str, numpy.ndarray]) -> None:
+        """Decode the event engine state written by _snapshot_events."""
+        stations = self.charging_network.stations
+        events = []
+        for t, value, seq, a, b in zip(
+            arrays['time'].tolist(),
+            arrays['kind'].tolist(),
+            arrays['seq'].tolist(),
+            arrays['a'].tolist(),
+            arrays['b'].tolist(),
+        ):
+            kind = EventType(value)
+            if kind == EventType.VEHICLE_ARRIVAL:
+                key = (a, b)
+            elif kind == EventType.CHARGING:
+                key = stations[a]
+            elif kind == EventType.JOB_EXPIRATION:
+                key = (arrays['expire_slots'][a:b].copy(), arrays['expire_ids'][a:b].copy())
+            else:
+                key = None
+            events.append((t, kind, seq, key))
+        self.events.restore(events)
+        self.legs[...] = arrays['legs']
+        self.eta[...] = arrays['eta']
+        self.charging = {stations[i] for i in arrays['charging'].tolist()}
+
+    def snapshot(self) -> bytes:
+        """Capture the full simulation state between two steps.
+
+        The fleet, its batteries, the job table, the charging stations, the
+        event queue, the position of the demand model and the random number
+        generators are packed into a compact binary snapshot (see
+        pack_arrays).  Static data (map, demand data, configuration) is not
+        included.
+
+        Returns:
+            the snapshot, see restore().
+        """
+        groups = {
+            'fleet': self.fleet.snapshot(self.charging_network.stations),
+            'jobs': self.jobs.snapshot(),
+            'chargers': self.charging_network.snapshot(),
+        }
+        if self.engine == 'event':
+            groups['events'] = self._snapshot_events()
+        rng = None if self._np_random is None else self._np_random.bit_generator.state
+        meta = {
+            't': self.t.isoformat(),
+            'step_count': self.step_count,
+            'engine': self.engine,
+            'clock': getattr(self, 'clock', None),
+            'demand': self.demand.snapshot(),
+            'rng': rng,
+        }
+        return pack_arrays(groups, meta)
+
+    def restore(self, snapshot: bytes) -> Tuple[numpy.array, Dict]:
+        """Return to the state captured by snapshot().
+
+        The simulator must have been reset with the same configuration as
+        the one the snapshot was taken from, e.g. to fork several
+        scenarios from one warmed up simulator:
+
+            env.reset()
+            env.restore(snapshot)
+
+        Args:
+            snapshot: snapshot returned by snapshot()
 
-        return self._get_obs(), info
+        Returns:
+            tuple: (observation, info) for the restored state
+
+        Raises:
+            SnapshotFormatError, or Exception if the snapshot does not match
+            the configuration.
+        """
+        groups, meta = unpack_arrays(snapshot)
+        if meta['engine'] != self.engine:
+            raise Exception(f"Snapshot of the {meta['engine']} engine cannot be restored into the {self.engine} engine")
+        self.fleet.restore(groups['fleet'], self.charging_network.stations)
+        self.jobs.restore(groups['jobs'])
+        self.charging_network.restore(groups['chargers'])
+        if self.engine == 'event':
+            self.clock = meta['clock']
+            self._restore_events(groups['events'])
+        self.demand.restore(meta['demand'])
+        if meta['rng'] is not None:
+            self._np_random = numpy.random.Generator(getattr(numpy.random, meta['rng']['bit_generator'])())
+            self._np_random.bit_generator.state = meta['rng']
+        self.t = datetime.datetime.fromisoformat(meta['t'])
+        self.region.seek(self.t)
+        self.step_count = meta['step_count']
+        return self._get_obs(), self._get_info()
 
     def get_closest_charger(self, vehicle: Vehicle) -> ChargeStation:
         """
-        Get the closest charger to a <vehicle>.
+        Get the closest charger to a <vehicle>, skipping chargers above the
+        configured occupancy.
         """
-        distances = []
-        for charger in self.charging_network:
-            d, t = vehicle.location.to(charger.location)
-            distances.append(d)
-        return self.charging_network[distances.index(min(distances))]
+        return self.charging_network.closest(
+            vehicle.location.zone, self.max_charger_occupancy
+        )
 
     def get_closest_job(self, vehicle: Vehicle) -> Job:
         """
-        Get the closest job to <vehicle> that is not inprogress or expired.
+        Get the closest open job to <vehicle> (None if there are no open jobs).
+        """
+        slot = self.jobs.nearest_open(self.region.neighbors(vehicle.location.zone))
+        return None if slot is None else self.jobs.view(slot)
+
+    def _schedule(self, vids: List[int], t: float) -> None:
+        """Schedule the arrival of each vehicle in <vids> that starts a leg at
+        time <t>, and start charging vehicles that are at their charger."""
+        for vid in vids:
+            status = self.fleet.status[vid]
+            if status in MOVING:
+                self.legs[vid] += 1
+                self.eta[vid] = t + self.fleet.time_remaining[vid]
+                self.events.push(self.eta[vid], EventType.VEHICLE_ARRIVAL, (vid, self.legs[vid]))
+            elif status == VehicleStatus.CHARGING.value:
+                charger = self.fleet.chargers[vid]
+                charger.request_charge(self.fleet.preferred_rate[vid].item(), vid)
+                if charger not in self.charging:
+                    # Charged at the end of the tick after its request, as in
+                    # tick mode
+                    self.charging.add(charger)
+                    end = math.ceil((t + self.dt) / self.dt - 1e-9) * self.dt
+                    self.events.push(end, EventType.CHARGING, charger)
+
+    def _run_events(self, vids: List[int]) -> None:
+        """Advance the simulation by one tick in event mode, after vehicles
+        <vids> were dispatched.
+
+        Only vehicles, charging stations and jobs with an event in the tick
+        are visited: vehicles on the arrival at the end of each leg,
+        charging stations while any of their vehicles can take charge, and
+        jobs on their release and expiration.  As in tick mode, the elapsed
+        time of a job counts the ticks it was open for.
         """
-        closest_job = None
-        distance = float('inf')
-        for job in self.arrived:
-            d, t = vehicle.location.to(job.pickup_location)
-            #if d == float('inf'):
-            #    print(job.pickup_location.region.map[1])
-            if d < distance:
-                distance = d
-                closest_job = job
-        return closest_job
+        self._schedule(vids, self.clock)
+        end = self.clock + self.dt
+        for t, kind, key in self.events.pop_until(end):
+            if kind == EventType.VEHICLE_ARRIVAL:
+                vid, leg = key
+                if self.legs[vid] != leg:
+                    continue  # vehicle was redirected before arriving
+                # Counts down to exactly zero, so that vehicles that stop
+                # report no time remaining
+                self.fleet.time_remaining[vid] = self.dt
+                self.fleet.tick(self.dt, {'T_a': self.T_a}, [vid])
+                self._schedule([vid], t)
+            elif kind == EventType.CHARGING:
+                key.tick(self.fleet, self.dt, self.T_a)
+                if key.active(self.fleet):
+                    self.events.push(t + self.dt, EventType.CHARGING, key)
+                else:
+                    self.charging.discard(key)
+            elif kind == EventType.DEMAND_RELEASE:
+                released = self.jobs.add(self.demand.tick(self.dt))
+                self.jobs.tick(released, self.dt)
+                self.events.push(t + self.dt, EventType.JOB_EXPIRATION, (released, self.jobs.id[released].copy()))
+                self.events.push(t + self.dt, EventType.DEMAND_RELEASE)
+            elif kind == EventType.JOB_EXPIRATION:
+                slots, ids = key
+                slots = slots[
+                    (self.jobs.id[slots] == ids)
+                    & (self.jobs.status[slots] == JobStatus.ARRIVED.value)
+                ]
+                # Rejects the jobs that have waited longer than one tick
+                self.jobs.tick(slots, self.dt)
+        self.clock = end
+
+        # Time remaining of vehicles that are still travelling
+        moving = numpy.isin(self.fleet.status, MOVING)
+        self.fleet.time_remaining[moving] = self.eta[moving] - self.clock
 
     def step(self, action: numpy.array) -> Tuple[numpy.array, float, bool, bool, Dict]:
         """Execute one timestep within the environment.
@@ -151,91 +467,99 @@ class TaxiFleetSimulator(gym.Env):
         Returns:
             tuple: (observation, reward, terminated, truncated, info)
         """
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin()
 
         # First update vehicle statuses
-        for idx in range(len(self.fleet)):
-            if action[idx,0] > 0.5 and self.fleet[idx].status in [VehicleStatus.IDLE, VehicleStatus.CHARGING, VehicleStatus.TOCHARGE]:
+        available = numpy.isin(self.fleet.status, [VehicleStatus.IDLE.value, VehicleStatus.CHARGING.value, VehicleStatus.TOCHARGE.value])
+        to_dispatch = []
+        for idx in numpy.flatnonzero(available).tolist():
+            if action[idx,0] > 0.5:
                 self.fleet[idx].charge(self.get_closest_charger(self.fleet[idx]), action[idx,1])
-            elif len(self.arrived) > 0 and self.fleet[idx].status in [VehicleStatus.IDLE, VehicleStatus.CHARGING, VehicleStatus.TOCHARGE]:
-                self.fleet[idx].service_demand(self.get_closest_job(self.fleet[idx]))
-
-        # Update fleet
-        for vehicle in self.fleet:
-            vehicle.tick(self.dt, {'T_a': self.T_a}) # TODO: Check conditions
-
-        # Update charging vehicles
-        for charger in self.charging_network:
-            charger.tick(self.fleet, self.dt, self.T_a)
-
-        # Get new arrivals
-        self.arrived = self.arrived | self.demand.tick(self.dt)
-
-        # Update jobs in progress
-        to_completed = set()
-        to_failed = set()
-        for job in self.inprogress:
-            if job.status == JobStatus.COMPLETE:
-                to_completed = to_completed.union({job})
-            elif job.status == JobStatus.FAILED:
-                to_failed = to_failed.union({job})
-        self.inprogress = self.inprogress - to_completed - to_failed
-        self.completed += len(to_completed)
-        self.failed += len(to_failed)
-
-        # Update assigned jobs
-        to_inprogress = set()
-        to_failed = set()
-        for job in self.assigned:
-            if job.status == JobStatus.INPROGRESS:
-                to_inprogress = to_inprogress.union({job})
-            elif job.status == JobStatus.FAILED:
-                to_failed = to_failed.union({job})
-        self.assigned = self.assigned - to_inprogress - to_failed
-        self.failed += len(to_failed)
-        self.inprogress = self.inprogress.union(to_inprogress)
-
-        # Update arrived jobs
-        to_assigned = set()
-        to_rejected = set()
-        for job in self.arrived:
-            job.tick(self.dt)
-            if job.status == JobStatus.ASSIGNED:
-                to_assigned = to_assigned.union({job})
-            elif job.status == JobStatus.REJECTED:
-                to_rejected = to_rejected.union({job})
-            elif job.status == JobStatus.INPROGRESS:
-                to_inprogress = to_inprogress.union({job})
-        self.arrived = self.arrived - to_assigned - to_rejected - to_inprogress
-        self.assigned = self.assigned.union(to_assigned)
-        self.inprogress = self.inprogress.union(to_inprogress)
-        self.rejected += len(to_rejected)
+            else:
+                to_dispatch.append(idx)
+        if profiler is not None:
+            profiler.lap('actions')
+
+        # Dispatch the remaining vehicles, optimally if configured, then
+        # greedily for vehicles the matcher left unmatched
+        arrived = self.jobs.slots(JobStatus.ARRIVED)
+        if self.matcher is not None and len(to_dispatch) > 0 and len(arrived) > 0:
+            vids = numpy.array(to_dispatch, dtype=numpy.int64)
+            vehicles, jobs = self.matcher.match(
+                self.fleet.location[vids], self.jobs.pickup_location[arrived]
+            )
+            for idx, slot in zip(vids[vehicles].tolist(), arrived[jobs].tolist()):
+                self.fleet[idx].service_demand(self.jobs.view(slot))
+            to_dispatch = numpy.delete(vids, vehicles).tolist()
+        for idx in to_dispatch:
+            job = self.get_closest_job(self.fleet[idx])
+            if job is not None:
+                self.fleet[idx].service_demand(job)
+        if profiler is not None:
+            profiler.lap('dispatch')
+
+        if self.engine == 'event':
+            self._run_events(numpy.flatnonzero(available).tolist())
+            if profiler is not None:
+                profiler.lap('events')
+        else:
+            # Update fleet
+            self.fleet.tick(self.dt, {'T_a': self.T_a}) # TODO: Check conditions
+            if profiler is not None:
+                profiler.lap('vehicles')
+
+            # Update charging vehicles
+            for charger in self.charging_network:
+                charger.tick(self.fleet, self.dt, self.T_a)
+            if profiler is not None:
+                profiler.lap('chargers')
+
+            # Get new arrivals
+            self.jobs.add(self.demand.tick(self.dt))
+            if profiler is not None:
+                profiler.lap('demand')
+
+            # Reject jobs that were not assigned within a tick.  Jobs move
+            # between status buckets as their status changes, so no
+            # bookkeeping is needed for the others.
+            self.jobs.tick(self.jobs.slots(JobStatus.ARRIVED), self.dt)
+
+        # Release jobs that finished
+        self.jobs.release_finished()
+        if profiler is not None:
+            profiler.lap('jobs')
 
         # Update time
         self.t = self.t + datetime.timedelta(seconds=self.dt)
+        self.region.seek(self.t)
         self.step_count += 1
-        
-        print(self.t)
+        LOGGER.debug('%s', self.t)
+        if profiler is not None:
+            profiler.lap('clock')
 
         # Calculate info
-        info = {}
-        info['arrived'] = [j.to_dict() for j in self.arrived]
-        info['assigned'] = [j.to_dict() for j in self.assigned]
-        info['completed'] = self.completed
-        info['rejected'] = self.rejected
-        info['inprogress'] = [j.to_dict() for j in self.inprogress]
-        info['failed'] = self.failed
-        info['charging_network'] = [s.to_dict() for s in self.charging_network]
-        info['fleet'] = [v.to_dict() for v in self.fleet]
-        
+        info = self._get_info()
+        if profiler is not None:
+            profiler.lap('info')
+
         # Calculate reward
         # TODO: specify as lambda
         ALPHA = 1.0
         BETA = 1.0
         #reward = sum([v.battery.soc for v in self.fleet]) + LAMBDA * sum([v.battery.actual_capacity / v.battery.initial_capacity for v in self.fleet])
-        reward = self.completed + ALPHA * sum([v.battery.actual_capacity / v.battery.initial_capacity for v in self.fleet]) # - BETA * sum([1 if v.status == VehicleStatus.RECOVERY else - for v in self.fleet])
+        reward = self.completed + ALPHA * self.fleet.state_of_health().sum() # - BETA * sum([1 if v.status == VehicleStatus.RECOVERY else - for v in self.fleet])
+        if profiler is not None:
+            profiler.lap('reward')
+
+        observation = self._get_obs()
+        if profiler is not None:
+            profiler.lap('observation')
+            profiler.end()
 
         return (
-            self._get_obs(),
+            observation,
             reward,
             True if self.t >= self.t_max else False,
             True if self.step_count > 1000 else False,
@@ -0,0 +1,107 @@
+"""Binary snapshots of simulator state.
+
+A snapshot is a single bytes object: a short header, a JSON description of
+the arrays and of any scalar state, and the raw data of each array.  Array
+data is copied as is, so packing and unpacking cost little more than a
+memory copy regardless of the number of vehicles and jobs, and no Python
+objects are pickled.
+"""
+
+from typing import Dict, Tuple
+
+
+import json
+import struct
+
+
+import numpy
+
+MAGIC = b"TFSNAP"
+SNAPSHOT_VERSION = 1
+PREAMBLE = struct.Struct("<6sII")  # magic, version, description length
+ALIGN = 8  # alignment of each array in the snapshot
+
+
+class SnapshotFormatError(Exception):
+    """Snapshot is corrupt or of an unsupported version.
+
+    Args:
+        message: custom error message
+    """
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+
+
+def pack_arrays(groups: Dict[str, Dict[str, numpy.ndarray]], meta: Dict) -> bytes:
+    """Pack groups of arrays and JSON serializable <meta> into a snapshot.
+
+    Args:
+        groups: {group: {name: array}}, e.g. the state of the fleet and of
+            the job table.
+        meta: scalar state, e.g. the simulation time.
+
+    Returns:
+        the snapshot.
+    """
+    layout = {}
+    size = 0
+    for group, arrays in groups.items():
+        layout[group] = {}
+        for name, array in arrays.items():
+            array = numpy.asarray(array)
+            size = -(-size // ALIGN) * ALIGN
+            layout[group][name] = (size, array.shape, array.dtype.str)
+            size += array.nbytes
+    description = json.dumps({"arrays": layout, "meta": meta}).encode()
+    start = -(-(PREAMBLE.size + len(description)) // ALIGN) * ALIGN
+    blob = bytearray(start + size)
+    PREAMBLE.pack_into(blob, 0, MAGIC, SNAPSHOT_VERSION, len(description))
+    blob[PREAMBLE.size : PREAMBLE.size + len(description)] = description
+    for group, arrays in groups.items():
+        for name, array in arrays.items():
+            offset, shape, dtype = layout[group][name]
+            numpy.ndarray(shape, dtype=dtype, buffer=blob, offset=start + offset)[
+                ...
+            ] = array
+    return bytes(blob)
+
+
+def unpack_arrays(
+    blob: bytes,
+) -> Tuple[Dict[str, Dict[str, numpy.ndarray]], Dict]:
+    """Unpack a snapshot written by pack_arrays.
+
+    Args:
+        blob: the snapshot.
+
+    Returns:
+        (groups, meta), where the arrays are read-only views of <blob>.
+
+    Raises:
+        SnapshotFormatError
+    """
+    try:
+        magic, version, length = PREAMBLE.unpack_from(blob, 0)
+    except struct.error:
+        raise SnapshotFormatError("Snapshot is truncated")
+    if magic != MAGIC:
+        raise SnapshotFormatError("Not a simulator snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotFormatError(
+            f"Snapshot has format version {version}, expected {SNAPSHOT_VERSION}"
+        )
+    description = json.loads(bytes(blob[PREAMBLE.size : PREAMBLE.size + length]))
+    start = -(-(PREAMBLE.size + length) // ALIGN) * ALIGN
+    groups = {}
+    for group, arrays in description["arrays"].items():
+        groups[group] = {}
+        for name, (offset, shape, dtype) in arrays.items():
+            dtype = numpy.dtype(dtype)
+            count = int(numpy.prod(shape, dtype=numpy.int64))
+            if start + offset + count * dtype.itemsize > len(blob):
+                raise SnapshotFormatError("Snapshot is truncated")
+            groups[group][name] = numpy.frombuffer(
+                blob, dtype=dtype, count=count, offset=start + offset
+            ).reshape(shape)
+    return groups, description["meta"]
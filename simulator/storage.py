@@ -0,0 +1,147 @@
+"""Versioned on-disk storage for read-only simulator assets.
+
+An asset is a directory holding one ``.npy`` file per array and a
+``manifest.json`` describing the asset kind, format version, and array
+shapes.  Arrays are opened with mmap so that startup does not depend on the
+size of the asset and processes opening the same asset share its pages.
+"""
+
+from typing import Dict, Tuple
+
+
+import json
+import os
+
+
+import numpy
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+
+
+class AssetFormatError(Exception):
+    """Asset on disk is missing, of the wrong kind, or of an unsupported
+    version.
+
+    Args:
+        message: custom error message
+    """
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+
+
+def write_arrays(
+    path: str, kind: str, arrays: Dict[str, numpy.ndarray], **meta
+) -> None:
+    """Write <arrays> to the asset directory <path>.
+
+    Args:
+        path: asset directory (created if it does not exist)
+        kind: asset kind recorded in the manifest, e.g. "city map"
+        arrays: dictionary of array name to array
+        meta: additional JSON serializable metadata
+    """
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        numpy.save(
+            os.path.join(path, f"{name}.npy"),
+            numpy.ascontiguousarray(array),
+            allow_pickle=False,
+        )
+    write_manifest(path, kind, arrays, **meta)
+
+
+def allocate_arrays(
+    path: str, dtypes: Dict[str, numpy.dtype], length: int
+) -> Dict[str, numpy.ndarray]:
+    """Create writable, memory mapped, one dimensional arrays of <length> in
+    the asset directory <path>.  This allows assets larger than memory to be
+    filled incrementally.  Call write_manifest once they are filled.
+
+    Args:
+        path: asset directory (created if it does not exist)
+        dtypes: dictionary of array name to dtype
+        length: number of elements in each array
+
+    Returns:
+        dictionary of array name to writable memory mapped array.
+    """
+    os.makedirs(path, exist_ok=True)
+    return {
+        name: numpy.lib.format.open_memmap(
+            os.path.join(path, f"{name}.npy"),
+            mode="w+",
+            dtype=dtype,
+            shape=(length,),
+        )
+        for name, dtype in dtypes.items()
+    }
+
+
+def write_manifest(
+    path: str, kind: str, arrays: Dict[str, numpy.ndarray], **meta
+) -> None:
+    """Write the manifest of an asset whose <arrays> are already on disk.
+
+    The manifest is written last, so a partially written asset is never
+    mistaken for a complete one.
+
+    Args:
+        path: asset directory
+        kind: asset kind recorded in the manifest
+        arrays: dictionary of array name to array
+        meta: additional JSON serializable metadata
+    """
+    manifest = {"kind": kind, "version": FORMAT_VERSION, "arrays": {}, "meta": meta}
+    for name, array in arrays.items():
+        manifest["arrays"][name] = {
+            "dtype": numpy.asarray(array).dtype.str,
+            "shape": list(numpy.shape(array)),
+        }
+    with open(os.path.join(path, MANIFEST + ".tmp"), "w") as fp:
+        json.dump(manifest, fp, indent=2)
+    os.replace(os.path.join(path, MANIFEST + ".tmp"), os.path.join(path, MANIFEST))
+
+
+def read_arrays(
+    path: str, kind: str, mmap: bool = True
+) -> Tuple[Dict[str, numpy.ndarray], Dict]:
+    """Open the asset directory <path>.
+
+    Args:
+        path: asset directory
+        kind: expected asset kind
+        mmap: map arrays read-only instead of reading them into memory
+
+    Returns:
+        (arrays, meta) where arrays maps array names to arrays.
+
+    Raises:
+        AssetFormatError
+    """
+    try:
+        with open(os.path.join(path, MANIFEST), "r") as fp:
+            manifest = json.load(fp)
+    except FileNotFoundError:
+        raise AssetFormatError(f"{path} has no {MANIFEST}")
+    if manifest.get("kind") != kind:
+        raise AssetFormatError(f"{path} is a {manifest.get('kind')}, not a {kind}")
+    if manifest.get("version") != FORMAT_VERSION:
+        raise AssetFormatError(
+            f"{path} has format version {manifest.get('version')}, "
+            f"expected {FORMAT_VERSION}"
+        )
+    arrays = {}
+    for name in manifest["arrays"]:
+        arrays[name] = numpy.load(
+            os.path.join(path, f"{name}.npy"),
+            mmap_mode="r" if mmap else None,
+            allow_pickle=False,
+        )
+    return arrays, manifest["meta"]
+
+
+def is_asset(path: str) -> bool:
+    """Return True if <path> looks like an asset directory."""
+    return os.path.isfile(os.path.join(path, MANIFEST))
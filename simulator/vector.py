@@ -0,0 +1,115 @@
+"""Batched taxi fleet simulator."""
+
+from typing import Dict, Tuple
+
+
+import gymnasium as gym
+import numpy
+
+
+from gymnasium.vector.utils import batch_space
+
+
+from simulator.simulator import *
+
+
+class TaxiFleetVectorEnv(gym.vector.VectorEnv):
+    """Batched taxi fleet simulator, stepping <num_envs> independent fleets
+    in one process.
+
+    All fleets share one region map and one demand model, which is opened
+    once and read once per tick for the whole batch.  The fleet state of all
+    copies is stacked along a leading batch axis in <state> (see
+    stack_fleets), and observations, rewards and flags are returned as
+    stacked arrays.
+
+    The copies are created once and start and end their episodes together.
+    When an episode ends, all copies are reset within the same step; the
+    last observation of the episode is returned in infos["final_obs"].
+
+    Args:
+        config: configuration dictionary, as for TaxiFleetSimulator.
+        num_envs: number of fleets.
+    """
+
+    def __init__(self, config: Dict, num_envs: int) -> None:
+        self.config = config
+        self.num_envs = num_envs
+        self.region = CyclicZoneGraph(config['city'])
+        self.demand = None
+        self.envs = [
+            TaxiFleetSimulator(config, region=self.region) for _ in range(num_envs)
+        ]
+        self.state = None
+        size = config['fleet']['size']
+        self.single_observation_space = gym.spaces.Box(0, 1, shape=(size, 2))
+        self.single_action_space = gym.spaces.Box(0, 1, shape=(size, 2))
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+
+    def _get_obs(self) -> numpy.ndarray:
+        """Get the observations of all fleets, of shape (num_envs, fleet
+        size, 2)."""
+        return numpy.stack(
+            [self.state['actual_capacity'] / self.state['initial_capacity'], self.state['soc']],
+            axis=-1,
+        )
+
+    def _get_info(self) -> Dict[str, numpy.ndarray]:
+        """Get the job counters of all fleets."""
+        info = {}
+        for key in ['completed', 'rejected', 'failed']:
+            info[key] = numpy.array([getattr(env, key) for env in self.envs])
+            info[f'_{key}'] = numpy.ones(self.num_envs, dtype=bool)
+        return info
+
+    def reset(self, seed: int = None, options: Dict = None) -> Tuple[numpy.ndarray, Dict]:
+        """Start a new episode in all fleets.
+
+        Args:
+            seed: Random seed, fleet i is seeded with <seed> + i
+
+        Returns:
+            tuple: (observations, infos) for initial state
+        """
+        if self.demand is None:
+            self.demand = SharedDemand(load_demand(self.config, self.region, seed), self.num_envs)
+            for env in self.envs:
+                env.shared_demand = self.demand
+        self.demand.seeks = 0
+        self.demand.ticks = 0
+        for i, env in enumerate(self.envs):
+            env.reset(seed=None if seed is None else seed + i)
+        self.state = stack_fleets([env.fleet for env in self.envs])
+        return self._get_obs(), self._get_info()
+
+    def step(
+        self, actions: numpy.ndarray
+    ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, Dict]:
+        """Execute one timestep in all fleets.
+
+        Args:
+            actions: actions of shape (num_envs, fleet size, 2)
+
+        Returns:
+            tuple: (observations, rewards, terminations, truncations, infos)
+        """
+        rewards = numpy.zeros(self.num_envs)
+        terminations = numpy.zeros(self.num_envs, dtype=bool)
+        truncations = numpy.zeros(self.num_envs, dtype=bool)
+        for i, env in enumerate(self.envs):
+            _, rewards[i], terminations[i], truncations[i], _ = env.step(actions[i])
+        observations = self._get_obs()
+        infos = self._get_info()
+        if (terminations | truncations).any():
+            infos['final_obs'] = observations
+            observations, _ = self.reset()
+        return observations, rewards, terminations, truncations, infos
+
+    def close(self, **kwargs) -> None:
+        """Release resources held by the environments."""
+        for env in self.envs:
+            env.close()
+        if self.demand is not None:
+            self.demand.close()
+            self.demand = None
@@ -24,45 +24,118 @@ class VehicleStatus(Enum):
 
 
 class Vehicle:
-    """Electric Vehicle.
+    """Electric Vehicle.  The state of all vehicles is stored in a Fleet,
+    this is a lightweight view of a single vehicle for per-vehicle access.
 
     Args:
-        model: select from previously defined vehicles: ['byd e6'] or provide
-            a diction in the format {'capacity': kWh, 'efficiency': kWh/100km}
-        battery: select from previously defined models: ['multistage'] or
-            provide an object inheriting from Battery.
-        location: starting location of the vehicle.
+        fleet: fleet storing the vehicle.
+        vid: id of the vehicle (its index in the fleet).
     """
 
-    def __init__(
-        self,
-        model: Union[str, Dict[str, float]],
-        battery: Union[str, Battery],
-        location: Location,
-        vid: int,
-    ) -> None:
-        self.model = model
+    def __init__(self, fleet: ForwardRef("Fleet"), vid: int) -> None:
+        self.fleet = fleet
         self.vid = vid
-        self.charger = None
-        if self.model.lower() == "byd e6":
-            capacity = 71.7
-            self.efficiency = 17.1
-        else:
-            capacity = model["capacity"]
-            self.efficiency = model["efficiency"]
-
-        if battery.lower() == "multistage":
-            self.battery = MultiStageBattery(capacity)
-        else:
-            self.battery = battery
-
-        self.depo = location
-        self.location = location
-        self.destination = location
-        self.distance_remaining = 0.0
-        self.time_remaining = 0.0
-        self.time_elapsed = 0.0
-        self.status = VehicleStatus.IDLE
+
+    @property
+    def model(self) -> Union[str, Dict[str, float]]:
+        """Vehicle model."""
+        return self.fleet.model
+
+    @property
+    def efficiency(self) -> float:
+        """Energy consumption (kWh/100km)."""
+        return self.fleet.efficiency[self.vid].item()
+
+    @property
+    def battery(self) -> Battery:
+        """Battery of the vehicle."""
+        return self.fleet.batteries[self.vid]
+
+    @property
+    def charger(self) -> ForwardRef("ChargeStation"):
+        """Charging station the vehicle is assigned to (None if unassigned)."""
+        return self.fleet.chargers[self.vid]
+
+    @charger.setter
+    def charger(self, charger: ForwardRef("ChargeStation")) -> None:
+        self.fleet.chargers[self.vid] = charger
+
+    @property
+    def job(self) -> ForwardRef("Job"):
+        """Job the vehicle is servicing (None if unassigned)."""
+        return self.fleet.job(self.vid)
+
+    @job.setter
+    def job(self, job: ForwardRef("Job")) -> None:
+        self.fleet.set_job(self.vid, job)
+
+    @property
+    def depo(self) -> Location:
+        """Depot of the vehicle."""
+        return self.fleet.to_location(self.fleet.depot[self.vid])
+
+    @property
+    def location(self) -> Location:
+        """Current location of the vehicle."""
+        return self.fleet.to_location(self.fleet.location[self.vid])
+
+    @location.setter
+    def location(self, location: Location) -> None:
+        self.fleet.location[self.vid] = location.zone
+
+    @property
+    def destination(self) -> Location:
+        """Destination of the vehicle (same as location if not travelling)."""
+        return self.fleet.to_location(self.fleet.destination[self.vid])
+
+    @destination.setter
+    def destination(self, location: Location) -> None:
+        self.fleet.destination[self.vid] = location.zone
+
+    @property
+    def distance_remaining(self) -> float:
+        """Distance to destination (km)."""
+        return self.fleet.distance_remaining[self.vid].item()
+
+    @distance_remaining.setter
+    def distance_remaining(self, distance: float) -> None:
+        self.fleet.distance_remaining[self.vid] = distance
+
+    @property
+    def time_remaining(self) -> float:
+        """Time to destination (seconds)."""
+        return self.fleet.time_remaining[self.vid].item()
+
+    @time_remaining.setter
+    def time_remaining(self, time: float) -> None:
+        self.fleet.time_remaining[self.vid] = time
+
+    @property
+    def time_elapsed(self) -> float:
+        """Time elapsed since the vehicle began travel (seconds)."""
+        return self.fleet.time_elapsed[self.vid].item()
+
+    @time_elapsed.setter
+    def time_elapsed(self, time: float) -> None:
+        self.fleet.time_elapsed[self.vid] = time
+
+    @property
+    def preferred_rate(self) -> float:
+        """Maximum charging rate requested by the vehicle (kW)."""
+        return self.fleet.preferred_rate[self.vid].item()
+
+    @preferred_rate.setter
+    def preferred_rate(self, rate: float) -> None:
+        self.fleet.preferred_rate[self.vid] = rate
+
+    @property
+    def status(self) -> VehicleStatus:
+        """Current vehicle status."""
+        return VehicleStatus(int(self.fleet.status[self.vid]))
+
+    @status.setter
+    def status(self, status: VehicleStatus) -> None:
+        self.fleet.status[self.vid] = status.value
 
     def to_dict(self) -> Dict[str, Union[Dict, float, str]]:
         """Return a dictionary representing the current state of the vehicle.
@@ -79,15 +152,7 @@ class Vehicle:
                 time_elapsed: time elapsed since the vehicle began travel
             }
         """
-        return {
-            "location": self.location.to_dict(),
-            "destination": self.destination.to_dict(),
-            "distance_remaining": self.distance_remaining,
-            "time_remaining": self.time_remaining,
-            "status": self.status.name,
-            "battery": self.battery.to_dict(),
-            "time_elapsed": self.time_elapsed,
-        }
+        return self.fleet.to_dicts([self.vid])[0]
 
     def service_demand(self, job: ForwardRef("Job")) -> None:
         """
@@ -128,69 +193,10 @@ class Vehicle:
 
     def tick(self, dt: float, conditions: Dict[str, int]) -> None:
         """
-        Update the vehicle's state.
+        Update the vehicle's state, see Fleet.tick.
 
         Args:
             dt: tick length (seconds).
             conditions: environmental conditions present during the tick.
         """
-        if self.status == VehicleStatus.IDLE:
-            self.battery.age(dt, conditions["T_a"])
-        elif self.status == VehicleStatus.TOPICKUP:
-            self.time_remaining -= dt
-            if self.time_remaining <= 0:
-                distance = self.location.to(self.destination)[0]
-                dW = distance * self.efficiency / 100
-                self.battery.discharge(dW, dt, conditions["T_a"])
-                if self.battery.soc <= 0:
-                    self.status = VehicleStatus.RECOVERY
-                    self.job.fail()
-                    self.initialize_recovery_state()
-                else:
-                    self.destination = self.job.dropoff_location
-                    self.time_remaining = self.location.to(self.destination)[1]
-                    self.job.inprogress()
-                    self.status = VehicleStatus.ONJOB
-        elif self.status == VehicleStatus.TOCHARGE:
-            self.time_remaining -= dt
-            if self.time_remaining <= 0:
-                distance = self.location.to(self.destination)[0]
-                dW = distance * self.efficiency / 100
-                self.battery.discharge(dW, dt, conditions["T_a"])
-                if self.battery.soc <= 0:
-                    self.status = VehicleStatus.RECOVERY
-                    self.initialize_recovery_state()
-                else:
-                    self.status = VehicleStatus.CHARGING
-        elif self.status == VehicleStatus.CHARGING:
-            self.charger.request_charge(self.preferred_rate, self.vid)
-        elif self.status == VehicleStatus.TOLOC:
-            self.time_remaining -= dt
-            if self.time_remaining <= 0:
-                distance = self.location.to(self.destination)[0]
-                dW = distance * self.efficiency / 100
-                self.battery.discharge(dW, dt, conditions["T_a"])
-                if self.battery.soc <= 0:
-                    self.status = VehicleStatus.RECOVERY
-                    self.initialize_recovery_state()
-                else:
-                    self.status = VehicleStatus.IDLE
-        elif self.status == VehicleStatus.ONJOB:
-            self.time_remaining -= dt
-            if self.time_remaining <= 0:
-                distance = self.location.to(self.destination)[0]
-                dW = distance * self.efficiency / 100
-                self.battery.discharge(dW, dt, conditions["T_a"])
-                if self.battery.soc <= 0:
-                    self.status = VehicleStatus.RECOVERY
-                    self.job.fail()
-                    self.initialize_recovery_state()
-                else:
-                    self.status = VehicleStatus.IDLE
-                    self.job.complete()
-        elif self.status == VehicleStatus.RECOVERY:
-            self.time_remaining -= dt
-            if self.time_remaining <= 0:
-                self.status = VehicleStatus.IDLE
-        else:
-            raise Exception(f"Invalid vehicle state: {self.status}")
+        self.fleet.tick(dt, conditions, [self.vid])
@@ -0,0 +1,109 @@
+import datetime
+import pickle
+
+import numpy
+import pytest
+
+from simulator.demand import *
+
+
+@pytest.fixture
+def city_map(tmp_path):
+    path = tmp_path / "map.pkl"
+    city = {}
+    for zone_from in [1, 3, 4]:
+        city[zone_from] = {}
+        for zone_to in [1, 3, 4]:
+            city[zone_from][zone_to] = {
+                "distance": float(10 * zone_from + zone_to),
+                "time": float(100 * zone_from + zone_to),
+            }
+    with open(path, "wb") as pklfile:
+        pklfile.write(pickle.dumps(city))
+    return path
+
+
+@pytest.fixture
+def demand_store(tmp_path):
+    path = tmp_path / "demand"
+    start = to_epoch(datetime.datetime(2023, 1, 1))
+    pickup_time = start + numpy.array([0, 600, 1800, 3600, 3700, 7300])
+    write_demand_store(
+        path,
+        {
+            "pickup_time": pickup_time,
+            "dropoff_time": pickup_time + 900,
+            "pickup_location": [1, 2, 3, 4, 5, 6],
+            "dropoff_location": [6, 5, 4, 3, 2, 1],
+            "distance": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+            "fare": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+        },
+    )
+    return path
+
+
+@pytest.fixture
+def scenario(tmp_path, city_map):
+    path = tmp_path / "scenario"
+    rng = numpy.random.default_rng(0)
+    start = to_epoch(datetime.datetime(2023, 1, 1))
+    pickup_time = numpy.sort(start + rng.integers(0, 6 * 3600, 400))
+    write_demand_store(
+        path,
+        {
+            "pickup_time": pickup_time,
+            "dropoff_time": pickup_time + rng.integers(300, 1800, 400),
+            "pickup_location": rng.choice([1, 3, 4], 400),
+            "dropoff_location": rng.choice([1, 3, 4], 400),
+            "distance": rng.uniform(1, 20, 400),
+            "fare": rng.uniform(5, 50, 400),
+        },
+    )
+    return {
+        "delta t": 300,
+        "start t": "2023/01/01 00:00:00",
+        "end t": "2023/01/02 00:00:00",
+        "city": city_map,
+        "demand": path,
+        "fleet": {"size": 8, "vehicle": "BYD E6", "battery model": "multistage"},
+        "charging stations": [
+            {
+                "location": 3,
+                "max port power": 50,
+                "max total power": 60,
+                "efficiency": 0.9,
+                "ports": 2,
+            }
+        ],
+        "engine": "tick",
+        "info": "summary",
+    }
+
+
+@pytest.fixture
+def run():
+    def run(env, actions):
+        return [
+            (obs.tolist(), reward, info["completed"], info["rejected"], info["failed"])
+            for obs, reward, _, _, info in (env.step(action) for action in actions)
+        ]
+
+    return run
+
+
+@pytest.fixture
+def make_jobs():
+    def make_jobs(n, pickup=None, dropoff=None):
+        return {
+            "pickup_location": (
+                numpy.arange(n) if pickup is None else numpy.array(pickup)
+            ),
+            "dropoff_location": (
+                numpy.arange(n)[::-1] if dropoff is None else numpy.array(dropoff)
+            ),
+            "duration": numpy.full(n, 600.0),
+            "distance": numpy.full(n, 2.0),
+            "fare": numpy.arange(n, dtype=float),
+        }
+
+    return make_jobs
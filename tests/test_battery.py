@@ -1,3 +1,7 @@
+import math
+
+import numpy
+
 from simulator.battery import *
 
 def test_multi_stage_battery():
@@ -7,3 +11,38 @@ def test_multi_stage_battery():
     bat.discharge(100, 3600, 25)
     assert bat.soc == 0
 
+
+
+def test_multi_stage_battery_batch():
+    rng = numpy.random.default_rng(0)
+    n = 1000
+    initial = rng.uniform(50, 100, n)
+    actual = initial * rng.uniform(0.8, 1.0, n)
+    soc = rng.uniform(0, 1, n)
+    dW = rng.uniform(-120, 120, n)
+    dW[::10] = rng.uniform(-1e-6, 1e-6, n // 10)  # currents below the threshold
+    soc_batch, actual_batch = MultiStageBattery.recalculate_capacity_batch(
+        soc, actual, initial, dW, 600, 30
+    )
+    for i in range(n):
+        bat = MultiStageBattery(initial[i].item())
+        bat.actual_capacity = actual[i].item()
+        bat.soc = soc[i].item()
+        bat.recalculate_capacity(dW[i].item(), 600, 30)
+        assert math.isclose(soc_batch[i], bat.soc, rel_tol=1e-12, abs_tol=1e-15)
+        assert math.isclose(actual_batch[i], bat.actual_capacity, rel_tol=1e-12)
+
+
+def test_multi_stage_battery_stages(monkeypatch):
+    # Both paths read the aging parameters from STAGES
+    stages = [{"threshold": -math.inf, "alpha": 0.25, "beta": 10.0, "psi": -20.0}]
+    monkeypatch.setattr(MultiStageBattery, "STAGES", stages)
+    bat = MultiStageBattery(100)
+    bat.recalculate_capacity(-40, 600, 30)
+    soc, actual = MultiStageBattery.recalculate_capacity_batch(
+        numpy.array([1.0]), numpy.array([100.0]), numpy.array([100.0]), -40, 600, 30
+    )
+    theta = 0.6 ** 4 * 4.8 ** 0.1 * math.exp(20 * (1 / 30 - 1 / 25))
+    assert math.isclose(bat.actual_capacity, 100 - theta / 513, rel_tol=1e-12)
+    assert math.isclose(actual[0], bat.actual_capacity, rel_tol=1e-12)
+    assert soc[0] == bat.soc
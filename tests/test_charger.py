@@ -0,0 +1,41 @@
+from simulator.charger import *
+
+
+def test_charging_network(city_map):
+    region = CyclicZoneGraph(city_map)
+    stations = [
+        ChargeStation(CyclicZoneGraphLocation(zone, region), [ChargePort(50, 0.9)], 50)
+        for zone in [4, 3]
+    ]
+    network = ChargingNetwork(region, stations)
+    assert list(network.ranking[region.zone_index(1)]) == [1, 0]
+    assert network.closest(1) is stations[1]
+    stations[1].request_charge(50, 0)
+    stations[1].request_charge(50, 1)
+    assert stations[1].occupancy() == 2.0
+    assert network.closest(1, max_occupancy=1.0) is stations[0]
+    stations[0].request_charge(50, 2)
+    stations[0].request_charge(50, 3)
+    assert network.closest(1, max_occupancy=1.0) is stations[1]
+    assert len(network) == 2 and list(network) == stations
+
+
+def test_charging_network_snapshot(city_map):
+    region = CyclicZoneGraph(city_map)
+    stations = [
+        ChargeStation(CyclicZoneGraphLocation(zone, region), [ChargePort(50, 0.9)], 50)
+        for zone in [4, 3]
+    ]
+    network = ChargingNetwork(region, stations)
+    stations[1].ports[0].vehicle, stations[1].ports[0].P_t = 5, 22.0
+    stations[1].request_charge(40, 7)
+    stations[1].request_charge(30, 2)
+    snapshot = network.snapshot()
+    stations[1].disconnect(5)
+    stations[1].disconnect(2)
+    stations[0].request_charge(50, 1)
+    network.restore(snapshot)
+    assert [s.to_dict()["vehicle_queue"] for s in stations] == [[], [7, 2]]
+    assert stations[1].vehicle_queue[2] == 30
+    assert stations[1].ports[0].to_dict()["vehicle"] == 5
+    assert stations[1].ports[0].P_t == 22.0 and stations[0].ports[0].vehicle is None
@@ -0,0 +1,33 @@
+import datetime
+
+from scripts.convert_demand import *
+from simulator.demand import ColumnarDemand
+
+
+def test_count_rows(tmp_path):
+    path = tmp_path / "demand.csv"
+    path.write_text("pickup_time,fare")
+    assert count_rows(path) == 0
+    path.write_text("pickup_time,fare\n1,2\n3,4")
+    assert count_rows(path) == 2
+
+
+def test_convert(tmp_path):
+    rows = [
+        "pickup_time,dropoff_time,distance,pickup_location,dropoff_location,fare,note",
+        '2023-01-01 00:00:00,2023-01-01 00:15:00,1.0,1,2,10.0,"two\nlines"',
+        "",
+        "2023-01-01 00:30:00,2023-01-01 00:45:00,2.0,2,3,20.0,",
+        "2023-01-01 01:10:00,2023-01-01 01:15:00,3.0,3,4,30.0,",
+        "",
+    ]
+    path = tmp_path / "demand.csv"
+    path.write_text("\n".join(rows) + "\n")
+    assert count_rows(path) == 6
+    convert(path, tmp_path / "demand", chunksize=2)
+    # The store holds only the parsed rows, not the extra lines
+    demand = ColumnarDemand(tmp_path / "demand", region=None, loop=False)
+    assert len(demand.pickup_time) == 3
+    assert list(demand.columns["fare"]) == [10.0, 20.0, 30.0]
+    demand.seek(datetime.datetime(2023, 1, 1, 0, 20))
+    assert list(demand.tick(3600)["fare"]) == [20.0, 30.0]
@@ -0,0 +1,77 @@
+import datetime
+
+import numpy
+import pandas
+
+from scripts.chicago_cab_data_prep import *
+from scripts.data_prep import *
+from simulator.demand import *
+
+
+def write_raw(path, rows, seed):
+    rng = numpy.random.default_rng(seed)
+    start = pandas.Timestamp(2023, 1, 20) + pandas.to_timedelta(
+        rng.integers(0, 30 * 86400, rows), unit="s"
+    )
+    end = start + pandas.to_timedelta(rng.integers(-60, 3600, rows), unit="s")
+    raw = pandas.DataFrame(
+        {
+            "Trip ID": numpy.arange(rows),
+            "Trip Start Timestamp": start.strftime(DATE_FORMAT),
+            "Trip End Timestamp": end.strftime(DATE_FORMAT),
+            "Trip Miles": [f"{m:,.1f}" for m in rng.uniform(0, 2000, rows)],
+            "Pickup Community Area": rng.integers(1, 78, rows).astype(float),
+            "Dropoff Community Area": rng.integers(1, 78, rows).astype(float),
+            "Trip Total": [f"${f:,.2f}" for f in rng.uniform(-5, 1500, rows)],
+        }
+    )
+    raw.loc[::17, "Pickup Community Area"] = numpy.nan
+    raw.to_csv(path, index=False)
+
+
+def test_prepare(tmp_path):
+    raw = [tmp_path / "a.csv", tmp_path / "b.csv"]
+    write_raw(raw[0], 500, 0)
+    write_raw(raw[1], 300, 1)
+    columns = list(COLUMNS.values())
+    rows = prepare(
+        raw, tmp_path / "out.csv", clean, READ_OPTIONS, columns, workers=2, chunksize=64
+    )
+    output = pandas.read_csv(tmp_path / "out.csv")
+    assert len(output) == rows
+    assert list(output.columns) == columns
+    expected = pandas.concat(
+        [clean(pandas.read_csv(path, **READ_OPTIONS)) for path in raw]
+    ).sort_values("pickup_time", kind="stable")
+    assert len(expected) == rows
+    assert (
+        output["pickup_time"].tolist()
+        == expected["pickup_time"].dt.strftime(OUTPUT_FORMAT).tolist()
+    )
+    assert output["fare"].astype(numpy.float32).tolist() == expected["fare"].tolist()
+
+
+def test_prepare_parquet(tmp_path):
+    write_raw(tmp_path / "a.csv", 500, 0)
+    rows = prepare(
+        [tmp_path / "a.csv"],
+        tmp_path / "demand",
+        clean,
+        READ_OPTIONS,
+        list(COLUMNS.values()),
+        workers=2,
+        chunksize=64,
+        format="parquet",
+    )
+    assert len(demand_partitions(tmp_path / "demand")) == 2
+    demand = open_demand(tmp_path / "demand", None)
+    assert len(demand.pickup_time) == rows
+    assert numpy.all(numpy.diff(demand.pickup_time) >= 0)
+    assert demand.columns["pickup_location"].dtype == numpy.int32
+    assert demand.columns["fare"].dtype == numpy.float32
+    february = datetime.datetime(2023, 2, 1)
+    demand = open_demand(
+        tmp_path / "demand", None, start=february, end=datetime.datetime(2023, 2, 10)
+    )
+    assert 0 < len(demand.pickup_time) < rows
+    assert demand.t_min >= february
@@ -0,0 +1,193 @@
+import datetime
+
+import numpy
+
+from simulator.demand import *
+
+
+def test_columnar_demand(demand_store):
+    demand = ColumnarDemand(demand_store, region=None)
+    demand.seek(datetime.datetime(2023, 1, 1, 0, 5))
+    jobs = demand.tick(3600)
+    assert list(jobs["pickup_location"]) == [2, 3, 4, 5]
+    assert list(jobs["duration"]) == [900, 900, 900, 900]
+    jobs = demand.tick(3600)
+    assert list(jobs["fare"]) == [60.0]
+    demand.seek(datetime.datetime(2023, 1, 1))
+    jobs = demand.tick(1800)
+    assert list(jobs["dropoff_location"]) == [6, 5]
+
+
+def test_columnar_demand_loop(demand_store):
+    demand = ColumnarDemand(demand_store, region=None, loop=True)
+    demand.seek(datetime.datetime(2023, 1, 1, 2))
+    assert len(demand.tick(3600)["fare"]) == 1
+    assert len(demand.tick(3600)["fare"]) == 3
+    demand = ColumnarDemand(demand_store, region=None, loop=False)
+    demand.seek(datetime.datetime(2023, 1, 1, 2))
+    demand.tick(3600)
+    try:
+        demand.tick(3600)
+        assert False
+    except StopIteration:
+        pass
+
+
+def test_replay_demand_index(tmp_path):
+    rows = [
+        "pickup_time,dropoff_time,distance,pickup_location,dropoff_location,fare",
+        "2023-01-01 00:00:00,2023-01-01 00:15:00,1.0,1,2,10.0",
+        "2023-01-01 00:30:00,2023-01-01 00:45:00,1.0,2,3,20.0",
+        "2023-01-01 02:10:00,2023-01-01 02:15:00,1.0,3,4,30.0",
+        "2023-01-01 02:20:00,2023-01-01 02:35:00,1.0,4,5,40.0",
+        "2023-01-01 03:00:00,2023-01-01 03:15:00,1.0,5,6,50.0",
+    ]
+    path = tmp_path / "demand.csv"
+    path.write_text("\n".join(rows) + "\n")
+    hours, offsets = build_csv_index(path)
+    assert list(hours - hours[0]) == [0, 7200, 10800]
+    starts = [sum(len(row) + 1 for row in rows[:i]) for i in [1, 3, 5]]
+    assert list(offsets) == starts
+    demand = ReplayDemand(str(path), region=None)
+    assert (tmp_path / "demand.csv.idx.npz").exists()
+    demand.seek(datetime.datetime(2023, 1, 1, 2, 5))
+    assert demand.t == datetime.datetime(2023, 1, 1, 2, 10)
+    assert list(demand.tick(600)["fare"]) == [40.0]
+    demand.seek(datetime.datetime(2023, 1, 1, 0, 10))
+    assert demand.t == datetime.datetime(2023, 1, 1, 0, 30)
+
+
+def test_replay_demand_restore(tmp_path):
+    start = datetime.datetime(2023, 1, 1)
+    rows = ["pickup_time,dropoff_time,distance,pickup_location,dropoff_location,fare"]
+    for i in range(48 * 6):
+        t = start + datetime.timedelta(minutes=10 * i)
+        end = t + datetime.timedelta(minutes=5)
+        rows.append(f"{t},{end},1.0,1,2,{float(i)}")
+    path = tmp_path / "demand.csv"
+    path.write_text("\n".join(rows) + "\n")
+    demand = ReplayDemand(str(path), region=None)
+    demand.seek(start)
+    for _ in range(40 * 6):
+        demand.tick(600)
+    # Late in a long episode, a snapshot still only counts rows of one hour
+    state = demand.snapshot()
+    assert state["rows"] <= 6
+    expected = [demand.tick(600)["fare"].tolist() for _ in range(12)]
+    fork = ReplayDemand(str(path), region=None)
+    fork.restore(state)
+    assert [fork.tick(600)["fare"].tolist() for _ in range(12)] == expected
+    demand.restore(state)
+    assert [demand.tick(600)["fare"].tolist() for _ in range(12)] == expected
+    assert expected[0][0] > 200
+    demand.close()
+    fork.close()
+
+
+def write_model(path):
+    rate = numpy.zeros((168, 3))
+    rate[:, 1] = 20.0
+    destination = numpy.array([[0, 0, 0], [0, 0, 3], [0, 0, 0]])
+    mean = numpy.full((3, 3), 10.0)
+    write_arrays(
+        path,
+        DEMAND_MODEL,
+        {
+            "rate": rate,
+            "destination": destination,
+            "duration": mean * 60,
+            "distance": mean,
+            "fare": mean,
+            "sigma": numpy.array([0.1, 0.1, 0.1]),
+        },
+        bucket=3600,
+    )
+
+
+def test_synthetic_demand(tmp_path):
+    write_model(tmp_path / "model")
+    jobs = []
+    for scale in [1.0, 1.0, 4.0]:
+        demand = SyntheticDemand(tmp_path / "model", region=None, seed=1, scale=scale)
+        demand.seek(datetime.datetime(2023, 1, 1))
+        jobs.append(demand.tick(3600))
+    assert all(jobs[0][name].tolist() == jobs[1][name].tolist() for name in jobs[0])
+    assert all(len(jobs[0][name]) == len(jobs[0]["fare"]) for name in JOB_COLUMNS)
+    assert set(jobs[0]["pickup_location"].tolist()) == {1}
+    assert set(jobs[0]["dropoff_location"].tolist()) == {2}
+    assert len(jobs[2]["fare"]) > 2 * len(jobs[0]["fare"])
+
+
+def test_prefetching_demand(tmp_path):
+    write_model(tmp_path / "model")
+    start = datetime.datetime(2023, 1, 1)
+    plain = SyntheticDemand(tmp_path / "model", region=None, seed=1)
+    prefetched = PrefetchingDemand(
+        SyntheticDemand(tmp_path / "model", region=None, seed=1), 600, depth=3
+    )
+    for demand in [plain, prefetched]:
+        demand.seek(start)
+    expected = [plain.tick(600)["fare"].tolist() for _ in range(4)]
+    assert [prefetched.tick(600)["fare"].tolist() for _ in range(4)] == expected
+    # Seeking discards the ticks read ahead and rewinds the generator
+    plain.seek(start)
+    prefetched.seek(start)
+    assert prefetched.tick(600)["fare"].tolist() == plain.tick(600)["fare"].tolist()
+    assert prefetched.tick(300)["fare"].tolist() == plain.tick(300)["fare"].tolist()
+    prefetched.tick(600)
+    thread = prefetched.thread
+    prefetched.close()
+    assert prefetched.thread is None
+    assert not thread.is_alive()
+
+
+def test_prefetching_replay_demand(tmp_path):
+    start = datetime.datetime(2023, 1, 1)
+    rows = ["pickup_time,dropoff_time,distance,pickup_location,dropoff_location,fare"]
+    for i in range(60):
+        t = start + datetime.timedelta(minutes=7 * i)
+        end = t + datetime.timedelta(minutes=5)
+        rows.append(f"{t},{end},1.0,1,2,{float(i)}")
+    path = tmp_path / "demand.csv"
+    path.write_text("\n".join(rows) + "\n")
+    plain = ReplayDemand(str(path), region=None)
+    prefetched = PrefetchingDemand(ReplayDemand(str(path), region=None), 600, depth=3)
+    for demand in [plain, prefetched]:
+        demand.seek(start)
+    # Changing the tick length after reading ahead must not drop any rows
+    ticks = [600, 600, 1200, 600, 300, 600]
+    expected = [plain.tick(dt)["fare"].tolist() for dt in ticks]
+    assert [prefetched.tick(dt)["fare"].tolist() for dt in ticks] == expected
+    fares = sum(expected, [])
+    assert fares == list(numpy.arange(fares[0], fares[0] + len(fares)))
+    prefetched.close()
+
+
+def test_prefetching_demand_end(demand_store):
+    demand = PrefetchingDemand(
+        ColumnarDemand(demand_store, None, loop=False), 3600
+    )
+    demand.seek(datetime.datetime(2023, 1, 1))
+    assert len(demand.tick(3600)["fare"]) == 3
+    assert len(demand.tick(3600)["fare"]) == 2
+    assert len(demand.tick(3600)["fare"]) == 1
+    for _ in range(2):
+        try:
+            demand.tick(3600)
+            assert False
+        except StopIteration:
+            pass
+    demand.seek(datetime.datetime(2023, 1, 1))
+    assert len(demand.tick(3600)["fare"]) == 3
+    demand.close()
+
+
+def test_shared_demand(demand_store):
+    demand = SharedDemand(ColumnarDemand(demand_store, region=None), 2)
+    for _ in range(2):
+        demand.seek(datetime.datetime(2023, 1, 1, 0, 5))
+    first = [demand.tick(3600) for _ in range(2)]
+    second = [demand.tick(3600) for _ in range(2)]
+    assert first[0] is first[1]
+    assert list(first[1]["pickup_location"]) == [2, 3, 4, 5]
+    assert list(second[1]["fare"]) == [60.0]
@@ -0,0 +1,86 @@
+import numpy
+
+from simulator.dispatch import *
+from simulator.simulator import *
+
+
+def make_region(tmp_path):
+    distance = numpy.array([[0.0, 1.0, 5.0], [1.0, 0.0, 2.0], [5.0, 2.0, 0.0]])
+    write_city_map(tmp_path / "map", [0, 1, 2], distance, 60 * distance)
+    return CyclicZoneGraph(str(tmp_path / "map"))
+
+
+def pairs(vehicles, jobs):
+    return sorted(zip(vehicles.tolist(), jobs.tolist()))
+
+
+def test_dense_matching(tmp_path):
+    matcher = Matcher(make_region(tmp_path))
+    # Greedy dispatch in vehicle order would cost 0 + 5
+    assert pairs(*matcher.match([1, 0], [1, 2])) == [(0, 1), (1, 0)]
+    assert pairs(*matcher.match([1, 0, 2], [1])) == [(0, 0)]
+
+
+def test_sparse_matching(tmp_path):
+    matcher = Matcher(make_region(tmp_path), max_size=0, candidates=1)
+    assert pairs(*matcher.match([1, 0], [1, 2])) == [(0, 0)]
+    matcher = Matcher(make_region(tmp_path), max_size=0, candidates=2)
+    assert pairs(*matcher.match([1, 0], [1, 2])) == [(0, 1), (1, 0)]
+
+
+def test_global_matching(tmp_path):
+    region = make_region(tmp_path)
+    rng = numpy.random.default_rng(0)
+    vehicle_zones, job_zones = rng.integers(0, 3, 300), rng.integers(0, 3, 200)
+    cost, _ = region.distance_submatrix(vehicle_zones, job_zones)
+    best = cost[optimize.linear_sum_assignment(cost)].sum()
+    # Without a time budget all vehicles are matched in one assignment
+    vehicles, jobs = Matcher(region).match(vehicle_zones, job_zones)
+    assert len(jobs) == 200 and cost[vehicles, jobs].sum() == best
+    # Batches in vehicle order take the nearest jobs first
+    vehicles, jobs = Matcher(region, batch_size=1).match(vehicle_zones, job_zones)
+    assert cost[vehicles, jobs].sum() > best
+
+
+def test_unreachable_jobs(tmp_path):
+    distance = numpy.array([[0.0, numpy.inf, 5.0], [1.0, 0.0, 2.0], [5.0, 2.0, 0.0]])
+    write_city_map(tmp_path / "map", [0, 1, 2], distance, 60 * distance)
+    region = CyclicZoneGraph(str(tmp_path / "map"))
+    for matcher in [Matcher(region), Matcher(region, max_size=0)]:
+        # The only job of the vehicle in zone 0 cannot be reached
+        assert pairs(*matcher.match([0], [1])) == []
+        assert pairs(*matcher.match([0, 2], [1])) == [(1, 0)]
+        # Zone 0 only reaches zone 2, so the vehicle in zone 1 takes zone 1
+        assert pairs(*matcher.match([1, 0], [1, 2])) == [(0, 0), (1, 1)]
+
+
+def test_time_budget(tmp_path):
+    matcher = Matcher(make_region(tmp_path), time_budget=0, batch_size=1)
+    assert pairs(*matcher.match([1, 0], [1, 2])) == [(0, 0)]
+
+
+def test_time_budget_batches(tmp_path):
+    matcher = Matcher(make_region(tmp_path), time_budget=0)
+    rng = numpy.random.default_rng(0)
+    vehicles, jobs = matcher.match(rng.integers(0, 3, 300), rng.integers(0, 3, 300))
+    # Only the first batch is solved once the budget is spent
+    assert len(vehicles) == Matcher.BUDGET_BATCH_SIZE
+    assert vehicles.max() < Matcher.BUDGET_BATCH_SIZE
+
+
+def test_time_budget_greedy_fallback(scenario):
+    scenario.update(
+        {"dispatch": "optimal", "dispatch time budget": 0, "dispatch batch size": 2}
+    )
+    scenario["fleet"]["size"] = 4
+    env = TaxiFleetSimulator(scenario)
+    env.reset(seed=0)
+    open_jobs = len(env.jobs.slots(JobStatus.ARRIVED))
+    matched = []
+    match = env.matcher.match
+    env.matcher.match = lambda *args: matched.append(match(*args)) or matched[-1]
+    env.step(numpy.zeros((4, 2)))
+    assert open_jobs >= 4 and len(matched[0][0]) == 2
+    # The vehicles left unmatched were dispatched greedily
+    assert not numpy.any(env.fleet.status == VehicleStatus.IDLE.value)
+    env.close()
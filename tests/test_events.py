@@ -0,0 +1,17 @@
+from simulator.events import *
+
+
+def test_event_queue():
+    events = EventQueue()
+    events.push(60.0, EventType.JOB_EXPIRATION, "a")
+    events.push(60.0, EventType.VEHICLE_ARRIVAL, "b")
+    events.push(30.0, EventType.DEMAND_RELEASE, "c")
+    events.push(90.0, EventType.CHARGING, "d")
+    assert events.peek() == 30.0
+    popped = []
+    for t, kind, key in events.pop_until(60.0):
+        popped.append(key)
+        if key == "c":
+            events.push(45.0, EventType.CHARGING, "e")
+    assert popped == ["c", "e", "b", "a"]
+    assert len(events) == 1 and events.peek() == 90.0
@@ -0,0 +1,53 @@
+import numpy
+
+from simulator.fleet import *
+
+
+def test_fleet_tick(city_map, make_jobs):
+    region = CyclicZoneGraph(city_map)
+    jobs = JobTable(region)
+    fleet = Fleet(
+        region, jobs, [1, 1, 4], {"capacity": 10, "efficiency": 20}, "multistage"
+    )
+    slots = jobs.add(make_jobs(2, [3, 3], [4, 4]))
+    fleet[0].service_demand(jobs.view(slots[0]))
+    fleet[1].service_demand(jobs.view(slots[1]))
+    fleet.soc[1] = 0.1
+    assert fleet[0].time_remaining == 103.0
+    fleet.tick(60, {"T_a": 25})
+    assert fleet[0].status == VehicleStatus.TOPICKUP
+    fleet.tick(60, {"T_a": 25})
+
+    battery = MultiStageBattery(10)
+    battery.discharge(13 * 20 / 100, 60, 25)
+    assert fleet[0].battery.soc == battery.soc
+    assert fleet[0].battery.actual_capacity == battery.actual_capacity
+    assert fleet[0].status == VehicleStatus.ONJOB
+    assert fleet[0].destination.zone == 4
+    assert fleet[0].time_remaining == 104.0
+    assert jobs.view(slots[0]).status == JobStatus.INPROGRESS
+
+    assert fleet[1].status == VehicleStatus.RECOVERY
+    assert fleet[1].destination.zone == 1
+    assert fleet[1].battery.soc == 1.0
+    assert jobs.view(slots[1]).status == JobStatus.FAILED
+
+    assert fleet[2].status == VehicleStatus.IDLE
+    assert numpy.array_equal(fleet.observation()[:, 1], fleet.soc)
+    assert fleet.to_dicts()[0] == fleet[0].to_dict()
+    assert numpy.array_equal(fleet.to_array()["soc"], fleet.soc)
+    assert list(fleet.to_array([2])["location"]) == [4]
+
+
+def test_stack_fleets(city_map):
+    region = CyclicZoneGraph(city_map)
+    model = {"capacity": 10, "efficiency": 20}
+    fleets = [
+        Fleet(region, JobTable(region), locations, model, "multistage")
+        for locations in [[1, 3], [4, 4]]
+    ]
+    state = stack_fleets(fleets)
+    assert state["location"].tolist() == [[1, 3], [4, 4]]
+    fleets[1].discharge([1], [2.0], 60, 25)
+    assert state["soc"][1, 1] == fleets[1][1].battery.soc < 1.0
+    assert state["soc"][0].tolist() == [1.0, 1.0]
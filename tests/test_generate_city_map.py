@@ -0,0 +1,90 @@
+import numpy
+
+from scripts.generate_city_map import *
+
+
+def test_all_pairs_shortest_paths():
+    inf = numpy.inf
+    distance = numpy.array(
+        [
+            [inf, 1.0, 5.0, inf],
+            [inf, inf, 1.0, inf],
+            [inf, inf, inf, inf],
+            [inf, inf, inf, inf],
+        ]
+    )
+    time = 10 * distance
+    d, t, next_hop = all_pairs_shortest_paths(distance, time)
+    assert d[0, 2] == 2.0
+    assert t[0, 2] == 20.0
+    assert next_hop[0, 2] == 1
+    assert next_hop[1, 2] == 2
+    assert d[0, 0] == 0.0
+    assert d[2, 0] == inf
+    assert next_hop[2, 0] == -1
+    assert d[0, 3] == inf
+
+
+def test_update_shortest_paths():
+    rng = numpy.random.default_rng(0)
+    distance = numpy.where(rng.random((20, 20)) < 0.2, rng.random((20, 20)), numpy.inf)
+    time = 100 * distance
+    routes = all_pairs_shortest_paths(distance, time)
+    new_distance = distance.copy()
+    new_distance[3, 7] = 0.001
+    new_distance[11, 2] = 0.001
+    new_time = 100 * new_distance
+    d, t, next_hop = update_shortest_paths(
+        routes, (distance, time), (new_distance, new_time)
+    )
+    expected = all_pairs_shortest_paths(new_distance, new_time)
+    assert numpy.allclose(d, expected[0])
+    assert numpy.allclose(t, expected[1])
+    assert numpy.array_equal(next_hop, expected[2])
+
+
+def write_trips(path):
+    rng = numpy.random.default_rng(0)
+    pickup = rng.choice([0, 1], 9)
+    dropoff = rng.choice([1, 2], 9)
+    pickup[-1], dropoff[-1] = 2, 0  # seen only once
+    start = numpy.datetime64("2023-01-02T00:00:00") + rng.integers(0, 7200, 9)
+    duration = rng.integers(60, 1800, 9)
+    distance = rng.uniform(1, 10, 9)
+    with open(path, "w") as fp:
+        fp.write("pickup_time,dropoff_time,pickup_location,dropoff_location,distance,fare\n")
+        for row in zip(
+            start.tolist(),
+            (start + duration).tolist(),
+            pickup.tolist(),
+            dropoff.tolist(),
+            distance.tolist(),
+        ):
+            fp.write(",".join(str(value) for value in row) + ",10.0\n")
+    return pickup, dropoff, duration.astype(float), distance
+
+
+def test_trip_aggregator(tmp_path):
+    pickup, dropoff, duration, distance = write_trips(tmp_path / "trips.csv")
+    trips = TripAggregator(3)
+    trips.add_csv(tmp_path / "trips.csv", chunksize=5)
+    batches = TripAggregator(3)
+    start = numpy.zeros(9, dtype=numpy.int64)
+    for part in [slice(0, 4), slice(4, None)]:
+        batches.add(pickup[part], dropoff[part], distance[part], duration[part], start[part])
+    for aggregator in [trips, batches]:
+        mean_distance, mean_time = aggregator.mean()
+        var_distance, var_time = aggregator.variance()
+        for i, j in zip(pickup.tolist(), dropoff.tolist()):
+            pair = (pickup == i) & (dropoff == j)
+            if pair.sum() < MIN_TRIPS:
+                assert mean_distance[i, j] == numpy.inf and numpy.isnan(var_time[i, j])
+                continue
+            assert numpy.isclose(mean_distance[i, j], distance[pair].mean())
+            assert numpy.isclose(mean_time[i, j], duration[pair].mean())
+            assert numpy.isclose(var_distance[i, j], distance[pair].var())
+            assert numpy.isclose(var_time[i, j], duration[pair].var())
+        assert aggregator.count.sum() == 9
+    # Population variance: a pair seen once has no spread
+    assert trips.variance(min_trips=1)[1][2, 0] == 0.0
+    assert trips.mean(min_trips=1)[0][2, 0] == distance[-1]
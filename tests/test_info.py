@@ -0,0 +1,42 @@
+import numpy
+
+from simulator.info import *
+from simulator.simulator import *
+
+
+def test_lazy_info():
+    built = []
+
+    def section():
+        built.append(1)
+        return [1, 2]
+
+    info = LazyInfo({"completed": 3}, {"fleet": section})
+    assert set(info) == {"completed", "fleet"}
+    assert "fleet" in info and len(info) == 2
+    assert built == []
+    assert info["fleet"] == [1, 2]
+    assert info["fleet"] == [1, 2]
+    assert built == [1]
+    info["episode"] = {"r": 1.0}
+    del info["completed"]
+    assert dict(info) == {"fleet": [1, 2], "episode": {"r": 1.0}}
+
+
+def test_info_after_step(scenario):
+    env = TaxiFleetSimulator({**scenario, "info": "full"})
+    env.reset(seed=0)
+    rng = numpy.random.default_rng(1)
+    _, _, _, _, info = env.step(rng.random((8, 2)))
+    fleet = env.fleet.to_dicts()
+    arrived = env.jobs.to_dicts(env.jobs.slots(JobStatus.ARRIVED))
+    chargers = [station.to_dict() for station in env.charging_network]
+    for _ in range(5):
+        env.step(rng.random((8, 2)))
+    assert env.fleet.to_dicts() != fleet
+    # An info read after later steps still describes its own step
+    assert info["fleet"] == fleet
+    assert info["arrived"] == arrived
+    assert info["charging_network"] == chargers
+    assert len(info["fleet_array"]) == 8
+    env.close()
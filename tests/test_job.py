@@ -0,0 +1,92 @@
+import numpy
+
+from simulator.job import *
+
+
+def test_job_table(make_jobs):
+    table = JobTable(region=None, capacity=2)
+    slots = table.add(make_jobs(3))
+    assert list(slots) == [0, 1, 2]
+    assert list(table.id[slots]) == [0, 1, 2]
+    job = table.view(slots[1])
+    job.assign_vehicle(7)
+    assert job.status == JobStatus.ASSIGNED
+    assert job.to_dict()["vehicle"] == 7
+    table.tick(slots, 60)
+    table.tick(slots, 60)
+    assert list(table.status[slots]) == [4, 2, 4]
+    table.release(slots[[0, 2]])
+    new = table.add(make_jobs(4))
+    assert sorted(new[:2]) == [0, 2]
+    assert list(table.id[new]) == [3, 4, 5, 6]
+    job.complete()
+    table.release(slots[1])
+    table.add(make_jobs(1))
+    job.fail()
+    assert table.status[slots[1]] == JobStatus.ARRIVED.value
+
+
+def test_nearest_open(make_jobs):
+    table = JobTable(region=None)
+    slots = table.add(make_jobs(3))
+    neighbors = numpy.array([2, 0, 1, 5])
+    assert table.nearest_open(neighbors) == slots[2]
+    table.view(slots[2]).assign_vehicle(0)
+    assert table.nearest_open(neighbors) == slots[0]
+    table.tick(slots, 60)
+    table.tick(slots, 60)
+    assert table.nearest_open(neighbors) is None
+    assert list(table.open_count) == [0, 0, 0]
+
+
+def test_nearest_open_scan(make_jobs):
+    rng = numpy.random.default_rng(0)
+    table = JobTable(region=None)
+    jobs = make_jobs(40)
+    jobs["pickup_location"] = rng.integers(0, 1000, 40)
+    slots = table.add(jobs)
+    neighbors = rng.permutation(1200)  # includes zones beyond the table
+    for _ in slots:
+        zones = numpy.array([z for z in neighbors if z < len(table.open_count)])
+        nonempty = zones[table.open_count[zones] > 0]
+        nearest = table.nearest_open(neighbors)
+        assert table.pickup_location[nearest] == nonempty[0]
+        table.view(nearest).assign_vehicle(0)
+    assert table.nearest_open(neighbors) is None
+
+
+def test_nearest_open_unreachable(tmp_path, make_jobs):
+    distance = numpy.array([[0.0, numpy.inf], [1.0, 0.0]])
+    write_city_map(tmp_path / "map", [0, 1], distance, 60 * distance)
+    region = CyclicZoneGraph(str(tmp_path / "map"))
+    table = JobTable(region)
+    slots = table.add(make_jobs(2))
+    table.view(slots[0]).assign_vehicle(0)
+    # The only open job is in a zone that cannot be reached from zone 0
+    assert table.nearest_open(region.neighbors(0)) is None
+    assert table.nearest_open(region.neighbors(1)) == slots[1]
+
+
+def test_status_buckets(make_jobs):
+    table = JobTable(region=None)
+    slots = table.add(make_jobs(3))
+    table.view(slots[0]).assign_vehicle(1)
+    table.set_status(slots[[0, 1]], numpy.array([3, 6]))
+    assert list(table.slots(JobStatus.ARRIVED)) == [slots[2]]
+    assert list(table.slots(JobStatus.INPROGRESS)) == [slots[0]]
+    table.view(slots[0]).complete()
+    assert list(table.total[1:]) == [3, 1, 1, 0, 1, 1]
+    table.release_finished()
+    assert sorted(table.free) == [0, 1]
+    assert len(table.slots(JobStatus.COMPLETE)) == 0
+    assert list(table.slots(JobStatus.ARRIVED)) == [slots[2]]
+
+
+def test_to_array(make_jobs):
+    table = JobTable(region=None)
+    slots = table.add(make_jobs(3))
+    table.view(slots[1]).assign_vehicle(4)
+    array = table.to_array(slots[1:])
+    assert list(array["fare"]) == [1.0, 2.0]
+    assert list(array["vehicle"]) == [4, -1]
+    assert list(array["status"]) == [2, 1]
@@ -0,0 +1,80 @@
+import numpy
+
+from simulator.profiler import *
+from simulator.simulator import *
+
+
+def test_step_profiler(monkeypatch):
+    clock = iter([0, 100, 1100, 1200, 1300, 5300, 5400])
+    monkeypatch.setattr(time, "perf_counter_ns", lambda: next(clock))
+    profiler = StepProfiler()
+    profiler.begin()
+    profiler.lap("dispatch")
+    profiler.lap("demand")
+    profiler.end()
+    profiler.begin()
+    profiler.lap("dispatch")
+    profiler.end()
+    summary = profiler.summary()
+    assert list(summary) == ["dispatch", "demand", "step"]
+    assert summary["dispatch"]["calls"] == 2
+    assert summary["dispatch"]["total"] == 4.1e-6
+    assert summary["dispatch"]["max"] == 4.0
+    assert summary["dispatch"]["histogram"] == {127: 1, 4095: 1}
+    assert summary["dispatch"]["p50"] == 0.127 and summary["dispatch"]["p99"] == 4.0
+    assert summary["step"]["total"] == 5.3e-6
+    assert profiler.report().splitlines()[1].startswith("dispatch")
+
+
+def test_step_profiler_merge(monkeypatch):
+    clock = iter([0, 100, 200, 0, 5000, 5100, 5200])
+    monkeypatch.setattr(time, "perf_counter_ns", lambda: next(clock))
+    profilers = [StepProfiler(), StepProfiler()]
+    profilers[0].begin()
+    profilers[0].lap("dispatch")
+    profilers[0].end()
+    profilers[1].begin()
+    profilers[1].lap("dispatch")
+    profilers[1].lap("demand")
+    profilers[1].end()
+    merged = StepProfiler()
+    for profiler in profilers:
+        merged.merge(profiler)
+    summary = merged.summary()
+    assert list(summary) == ["dispatch", "step", "demand"]
+    assert summary["dispatch"]["calls"] == 2
+    assert summary["dispatch"]["total"] == 5.1e-6
+    assert summary["dispatch"]["max"] == 5.0
+    assert summary["dispatch"]["histogram"] == {127: 1, 8191: 1}
+    assert summary["demand"]["calls"] == 1
+    assert summary["step"]["total"] == 5.4e-6
+    assert profilers[0].summary()["dispatch"]["calls"] == 1
+
+
+def test_simulator_profile(scenario, run):
+    actions = numpy.zeros((5, 8, 2))
+    env = TaxiFleetSimulator(scenario)
+    env.reset(seed=0)
+    run(env, actions)
+    assert env.profiler is None
+
+    env = TaxiFleetSimulator({**scenario, "profile": True, "info": "full"})
+    env.reset(seed=0)
+    run(env, actions)
+    summary = env.profiler.summary()
+    assert list(summary) == [
+        "actions",
+        "dispatch",
+        "vehicles",
+        "chargers",
+        "demand",
+        "jobs",
+        "clock",
+        "info",
+        "reward",
+        "observation",
+        "step",
+    ]
+    assert all(stats["calls"] == 5 for stats in summary.values())
+    _, _, _, _, info = env.step(actions[0])
+    assert info["profile"]["step"]["calls"] == 6
@@ -0,0 +1,72 @@
+import numpy
+
+from simulator.region import *
+
+
+def test_cyclic_zone_graph(city_map):
+    region = CyclicZoneGraph(city_map)
+    a = CyclicZoneGraphLocation(3, region)
+    b = CyclicZoneGraphLocation(4, region)
+    assert a.to(b) == (34.0, 304.0)
+    d, t = region.distance_row(1)
+    assert list(d) == [11.0, 13.0, 14.0]
+    d, t = region.distance_row(4, [1, 3])
+    assert list(t) == [401.0, 403.0]
+    d, t = region.distance_submatrix([3, 1], [4, 4, 1])
+    assert numpy.array_equal(d, [[34.0, 34.0, 31.0], [14.0, 14.0, 11.0]])
+    assert list(region.neighbors(4)) == [1, 3, 4]
+    try:
+        region.zone_index([2])
+        assert False
+    except KeyError:
+        pass
+
+
+def test_neighbors_unreachable(tmp_path):
+    distance = numpy.array([[0.0, numpy.inf, 2.0], [1.0, 0.0, 3.0], [numpy.inf] * 3])
+    write_city_map(tmp_path / "map", [0, 1, 2], distance, 60 * distance)
+    region = CyclicZoneGraph(str(tmp_path / "map"))
+    # Zones at an infinite distance are left out of the neighbor order
+    assert list(region.neighbors(0)) == [0, 2]
+    assert list(region.neighbors(1)) == [1, 0, 2]
+    assert list(region.neighbors(2)) == []
+
+
+def test_city_map_format(tmp_path, city_map):
+    legacy = CyclicZoneGraph(city_map)
+    write_city_map(tmp_path / "map", legacy.zones, legacy.distances, legacy.times)
+    region = CyclicZoneGraph(str(tmp_path / "map"))
+    assert isinstance(region.distances, numpy.memmap)
+    assert numpy.array_equal(region.zones, legacy.zones)
+    assert numpy.array_equal(region.distances, legacy.distances)
+    assert numpy.array_equal(region.times, legacy.times)
+    a = CyclicZoneGraphLocation(4, region)
+    b = CyclicZoneGraphLocation(1, region)
+    assert a.to(b) == (41.0, 401.0)
+
+
+def test_time_of_week(tmp_path, city_map):
+    legacy = CyclicZoneGraph(city_map)
+    time_factor = numpy.ones((2, 3, 3), dtype=numpy.float16)
+    time_factor[1, 1, 2] = 2.0
+    time_bucket = numpy.zeros(7 * 24, dtype=numpy.int64)
+    time_bucket[24 + 8] = 1  # Tuesday 08:00 - 09:00
+    write_city_map(
+        tmp_path / "map",
+        legacy.zones,
+        legacy.distances,
+        legacy.times,
+        time_factor=time_factor,
+        time_bucket=time_bucket,
+    )
+    region = CyclicZoneGraph(str(tmp_path / "map"))
+    a = CyclicZoneGraphLocation(3, region)
+    b = CyclicZoneGraphLocation(4, region)
+    rush = datetime.datetime(2024, 1, 2, 8, 30)
+    assert a.to(b) == (34.0, 304.0)
+    assert region.distance(a, b, {"t": rush}) == (34.0, 608.0)
+    region.seek(rush)
+    assert a.to(b) == (34.0, 608.0)
+    assert list(region.distance_row(3)[1]) == [301.0, 303.0, 608.0]
+    region.seek(rush + datetime.timedelta(hours=1))
+    assert a.to(b) == (34.0, 304.0)
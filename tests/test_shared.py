@@ -0,0 +1,52 @@
+import multiprocessing
+
+import numpy
+import pytest
+
+from simulator.shared import *
+
+
+def worker(assets, started, done, results):
+    region = shared_region(assets)
+    demand = shared_demand(assets, region)
+    demand.seek(datetime.datetime(2023, 1, 1, 0, 5))
+    started.set()
+    # The worker reads the published block itself, not a copy of it
+    block = numpy.frombuffer(assets.block.buf, dtype=numpy.uint8)
+    arrays = [region.distances, region.times, demand.pickup_time, demand.columns["fare"]]
+    results.put(
+        (
+            region.distance_row(1)[0].tolist(),
+            demand.tick(3600)["pickup_location"].tolist(),
+            [numpy.shares_memory(array, block) for array in arrays],
+            [array.flags.writeable for array in arrays],
+        )
+    )
+    del block, arrays
+    done.wait()
+    assets.detach()
+
+
+@pytest.mark.parametrize("method", ["spawn", "fork"])
+def test_shared_scenario(city_map, demand_store, method):
+    region = CyclicZoneGraph(city_map)
+    demand = ColumnarDemand(demand_store, region)
+    context = multiprocessing.get_context(method)
+    assets = share_scenario(region, demand, context)
+    try:
+        started, done, results = context.Event(), context.Event(), context.Queue()
+        process = context.Process(target=worker, args=(assets, started, done, results))
+        process.start()
+        distances, pickups, shared, writeable = results.get(timeout=60)
+        assert distances == [11.0, 13.0, 14.0]
+        assert pickups == [2, 3, 4, 5]
+        assert all(shared) and not any(writeable)
+        assert assets.users == 1
+        done.set()
+        process.join(timeout=60)
+        assert assets.users == 0
+        # The block outlives the worker until the owner closes it
+        shared_memory.SharedMemory(name=assets.name).close()
+        assert not assets.attach()["region/distance"].flags.writeable
+    finally:
+        assets.close()
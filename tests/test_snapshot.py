@@ -0,0 +1,76 @@
+import numpy
+import pytest
+
+from simulator.simulator import *
+
+
+def test_pack_arrays():
+    blob = pack_arrays(
+        {"a": {"x": numpy.arange(3), "y": numpy.float32(2.5)}, "b": {}},
+        {"t": "2023-01-01T00:00:00"},
+    )
+    groups, meta = unpack_arrays(blob)
+    assert groups["a"]["x"].tolist() == [0, 1, 2]
+    assert groups["a"]["y"] == 2.5 and groups["a"]["y"].dtype == numpy.float32
+    assert groups["b"] == {} and meta == {"t": "2023-01-01T00:00:00"}
+    with pytest.raises(SnapshotFormatError):
+        unpack_arrays(b"pickle" + blob[6:])
+    with pytest.raises(SnapshotFormatError):
+        unpack_arrays(blob[:-8])
+
+
+@pytest.mark.parametrize("engine", ["tick", "event"])
+def test_simulator_snapshot(scenario, run, engine):
+    config = {**scenario, "engine": engine}
+    rng = numpy.random.default_rng(1)
+    actions = rng.random((40, 8, 2)) * [0.6, 100]
+
+    env = TaxiFleetSimulator(config)
+    env.reset(seed=0)
+    run(env, actions[:20])
+    snapshot = env.snapshot()
+    expected = run(env, actions[20:])
+
+    fork = TaxiFleetSimulator(config)
+    fork.reset(seed=1)
+    fork.restore(snapshot)
+    assert run(fork, actions[20:]) == expected
+    assert fork.snapshot() == env.snapshot()
+
+    env.restore(snapshot)
+    assert run(env, actions[20:]) == expected
+    env.close()
+    fork.close()
+
+
+def test_engines(scenario):
+    rng = numpy.random.default_rng(1)
+    actions = rng.random((60, 8, 2)) * [0.6, 100]
+    results = {}
+    for engine in ["tick", "event"]:
+        env = TaxiFleetSimulator({**scenario, "engine": engine})
+        env.reset(seed=0)
+        idle_time, waited = [], []
+        for action in actions:
+            env.step(action)
+            idle = env.fleet.status == VehicleStatus.IDLE.value
+            idle_time.extend(env.fleet.time_remaining[idle].tolist())
+            waited.extend(env.jobs.elapsed_time[env.jobs.slots(JobStatus.ARRIVED)])
+        results[engine] = env.jobs.total.copy()
+        # Every released job was assigned, rejected or is still open
+        released, assigned, rejected = results[engine][
+            [JobStatus.ARRIVED.value, JobStatus.ASSIGNED.value, JobStatus.REJECTED.value]
+        ]
+        assert released == assigned + rejected + len(env.jobs.slots(JobStatus.ARRIVED))
+        # Open jobs have waited one tick, and idle vehicles have no time left
+        assert len(waited) > 0 and set(waited) == {300.0}
+        assert len(idle_time) > 0 and max(idle_time) <= 0
+        if engine == "event":
+            assert set(idle_time) == {0.0}
+        env.close()
+    tick, event = results["tick"], results["event"]
+    # Both engines release the same jobs
+    assert event[JobStatus.ARRIVED.value] == tick[JobStatus.ARRIVED.value]
+    # Legs end within the tick in event mode, so vehicles serve more jobs
+    assert event[JobStatus.COMPLETE.value] >= tick[JobStatus.COMPLETE.value]
+    assert event[JobStatus.REJECTED.value] <= tick[JobStatus.REJECTED.value]
@@ -0,0 +1,54 @@
+import numpy
+import pytest
+
+from simulator.vector import *
+
+
+@pytest.fixture
+def config(scenario):
+    return {**scenario, "end t": "2023/01/01 00:15:00"}  # three ticks
+
+
+def test_vector_env(config):
+    env = TaxiFleetVectorEnv(config, 3)
+    envs = list(env.envs)
+    observations, infos = env.reset(seed=0)
+    assert observations.shape == (3, 8, 2)
+    assert env.observation_space.contains(observations.astype(numpy.float32))
+    assert infos["completed"].shape == (3,)
+    actions = numpy.zeros((3, 8, 2))
+    for _ in range(2):
+        observations, rewards, terminations, truncations, infos = env.step(actions)
+        assert observations.shape == (3, 8, 2) and rewards.shape == (3,)
+        assert not terminations.any() and not truncations.any()
+        assert "final_obs" not in infos
+    fleets = [copy.fleet for copy in env.envs]
+    observations, rewards, terminations, truncations, infos = env.step(actions)
+    # All copies ended their episode and were reset within the step
+    assert terminations.all() and not truncations.any()
+    assert infos["final_obs"].shape == (3, 8, 2)
+    assert env.envs == envs
+    assert all(copy.step_count == 0 for copy in env.envs)
+    assert all(copy.fleet is not fleet for copy, fleet in zip(env.envs, fleets))
+    assert numpy.array_equal(observations, env._get_obs())
+    assert all(copy.demand is env.demand for copy in env.envs)
+    env.close()
+
+
+def test_vector_env_adapter(config):
+    pytest.importorskip("stable_baselines3")
+    from scheduler.policies import VectorEnvAdapter
+
+    env = VectorEnvAdapter(TaxiFleetVectorEnv(config, 2))
+    assert env.num_envs == 2
+    assert env.reset().shape == (2, 8, 2)
+    actions = numpy.zeros((2, 8, 2))
+    for _ in range(2):
+        observations, rewards, dones, infos = env.step(actions)
+        assert not dones.any() and infos == [{}, {}]
+    observations, rewards, dones, infos = env.step(actions)
+    assert dones.all() and rewards.shape == (2,)
+    assert all(info["terminal_observation"].shape == (8, 2) for info in infos)
+    assert not any(info["TimeLimit.truncated"] for info in infos)
+    assert env.get_attr("step_count") == [0, 0]
+    env.close()